@@ -0,0 +1,66 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+"""Internals of the BYASE task plot, which are not part of its public API.
+
+The plot viewer draws coverage the way BYASE does, so it shares colors, display coords and paths
+with the BYASE task plot. BYASE is pinned to an exact version in setup.py, and every use of its
+internals goes through this module, so an upgrade of BYASE is checked here.
+"""
+
+from typing import Optional
+
+from byase.task.plot import TaskPlot, TaskFig, _nt_color
+from byase.task.plot import _COLOR_BLUE, _COLOR_ORANGE, _COLOR_GREEN, _COLOR_RED, _COLOR_GREY, _COLOR_BROWN
+
+
+COLOR_BLUE = _COLOR_BLUE
+COLOR_ORANGE = _COLOR_ORANGE
+COLOR_GREEN = _COLOR_GREEN
+COLOR_RED = _COLOR_RED
+COLOR_GREY = _COLOR_GREY
+COLOR_BROWN = _COLOR_BROWN
+
+
+def nt_color(nt: str) -> str:
+    """The color of a nucleotide."""
+    return _nt_color(nt)
+
+
+def patch_svg(svg_path: str):
+    """Patch an SVG file saved from a task figure, as BYASE does before showing it."""
+    TaskFig._apply_patch(svg_path)
+
+
+def coverage_path(task_plot: TaskPlot, allele_num: Optional[int], isoform_num: Optional[int]) -> str:
+    """The path of a coverage plot."""
+    return task_plot._coverage_path(allele_num=allele_num, isoform_num=isoform_num)
+
+
+def display_coord(task_plot: TaskPlot, pos: int) -> int:
+    """The display coord of a genomic position, where introns are shrunk."""
+    return task_plot._get_coord(pos)
+
+
+def coverage(task_plot: TaskPlot, allele_num: Optional[int], isoform_num: Optional[int]):
+    """The coverage of an allele and an isoform, loaded when the task is plotted.
+
+    Returns:
+        The coverage, with a genomic array of each kind of reads in `data`, and their names by `name`.
+    """
+    return task_plot.cov_dict[(allele_num, isoform_num)]
@@ -0,0 +1,112 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from multiprocessing.pool import ThreadPool
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from byase.message import MessageCenter
+
+from .stats import stats, rename_gene_level_col, rename_isoform_level_col
+from .result_store import read_stats_table
+
+
+_GENE_LEVEL_KEYS = ['Task ID', 'Gene ID']
+_ISOFORM_LEVEL_KEYS = ['Task ID', 'Isoform ID']
+
+
+def run_labels(result_dirs: List[str]) -> List[str]:
+    """Labels of runs, the names of result directories, made unique."""
+    names = [os.path.basename(os.path.normpath(path)) for path in result_dirs]
+    labels = []
+    for n, name in enumerate(names):
+        labels.append(name if names.count(name) == 1 else '{} ({})'.format(name, n + 1))
+    return labels
+
+
+def _run_section_start(columns: List[str]) -> int:
+    """The first column of per-run values, i.e. the first mean column."""
+    for n, col in enumerate(columns):
+        if 'Mean' in col:
+            return n
+    return len(columns)
+
+
+def _join_runs(labels: List[str], frames: List[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    """Join per-run tables on keys into a wide table, with per-run columns of values."""
+    keyed = [df.set_index(keys) for df in frames]
+
+    # The index of all keys, in the order of their first appearance.
+    index = keyed[0].index
+    for df in keyed[1:]:
+        index = index.append(df.index[~df.index.isin(index)])
+
+    parts = []
+    info_cols = [col for col in frames[0].columns[:_run_section_start(frames[0].columns.tolist())]
+                 if col not in keys]
+    info = pd.concat([df[info_cols] for df in keyed])
+    parts.append(info[~info.index.duplicated()].reindex(index))
+    for label, df in zip(labels, keyed):
+        values = df.iloc[:, _run_section_start(df.columns.tolist()):].reindex(index)
+        values.columns = ['{}: {}'.format(label, col) for col in values.columns]
+        parts.append(values)
+    return pd.concat(parts, axis=1).reset_index()
+
+
+def _stats_of_run(args) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Generate stats of a result directory and read them."""
+    stats_path = stats(args)
+    df_gene_level = read_stats_table(stats_path['gene-level path'], rename_gene_level_col)
+    df_isoform_level = read_stats_table(stats_path['isoform-level path'], rename_isoform_level_col)
+    return df_gene_level, df_isoform_level
+
+
+def compare_stats(args) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+    """Generate stats of result directories concurrently, and join them into wide comparison tables.
+
+    Returns:
+        Gene-level table, isoform-level table, and the count of isoform-level rows of each gene-level row.
+        Isoform-level rows are in the order of gene-level rows.
+    """
+    result_dirs = args['result_dirs']
+    n_process = args.get('process') or os.cpu_count() or 1
+    mc = args['mc']  # type: MessageCenter
+
+    labels = run_labels(result_dirs)
+    mc.log_debug('result_dirs: {}'.format(result_dirs))
+
+    # Each run computes stats with its share of processes.
+    n_run_process = max(1, n_process // len(result_dirs))
+    run_args = [{'result_dir': path, 'process': n_run_process, 'mc': mc} for path in result_dirs]
+    with ThreadPool(len(result_dirs)) as pool:
+        results = pool.map(_stats_of_run, run_args)
+
+    mc.handle_progress('Joining {} runs...'.format(len(result_dirs)))
+    df_gene_level = _join_runs(labels, [res[0] for res in results], _GENE_LEVEL_KEYS)
+    df_isoform_level = _join_runs(labels, [res[1] for res in results], _ISOFORM_LEVEL_KEYS)
+
+    # Align isoform-level rows to gene-level rows.
+    rank = pd.Series(np.arange(df_gene_level.shape[0]), index=df_gene_level['Task ID'].values)
+    rank = rank[~rank.index.duplicated()]
+    isoform_rank = df_isoform_level['Task ID'].map(rank).values
+    df_isoform_level = df_isoform_level.iloc[np.argsort(isoform_rank, kind='stable'), :].reset_index(drop=True)
+    isoform_counts = np.bincount(isoform_rank.astype(np.int64), minlength=df_gene_level.shape[0])
+    return df_gene_level, df_isoform_level, isoform_counts
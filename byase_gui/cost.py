@@ -0,0 +1,219 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import glob
+import time
+import heapq
+from collections import deque
+from typing import Tuple, Dict, List, Sequence, Optional
+
+import numpy as np
+import pandas as pd
+import psutil
+
+
+# Rough memory estimates of an inference process: the baseline of the compiled model,
+# and the growth with the cost of the task it is processing.
+_PROCESS_BASE_MEMORY = 512 * 1024 ** 2
+_MEMORY_PER_COST = 8 * 1024 ** 2
+
+# Fraction of the available memory that inference processes may use.
+_MEMORY_BUDGET = 0.8
+
+_DURATIONS_FILENAME_PATTERN = 'task_durations_{}.csv'
+
+# Durations of all runs of a task directory, whichever result directory they ran into.
+_TASK_DIR_DURATIONS_FILENAME = 'task_durations.csv'
+
+# Time window of the rolling throughput, in seconds.
+_THROUGHPUT_WINDOW = 15 * 60
+
+
+def task_costs(df_tasks: pd.DataFrame) -> np.ndarray:
+    """Relative costs of tasks, with the isoform and SNP counts of the task table as a proxy."""
+    isoforms = df_tasks['Isoforms'].values.astype(np.float64)
+    snps = df_tasks['SNPs'].values.astype(np.float64)
+    return isoforms * (snps + 1)
+
+
+def process_peak_memory(costs: np.ndarray) -> np.ndarray:
+    """Estimated peak memory of an inference process running tasks of the costs, in bytes."""
+    return _PROCESS_BASE_MEMORY + _MEMORY_PER_COST * costs
+
+
+def suggest_process_count(df_tasks: pd.DataFrame) -> Tuple[int, int]:
+    """Suggest the count of inference processes for the task table.
+
+    It uses at most one process per physical core, and no more processes than would fit in
+    the available memory if the largest tasks are running at the same time.
+
+    Returns:
+        The count of processes, and the expected peak memory in bytes.
+    """
+    n_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    budget = psutil.virtual_memory().available * _MEMORY_BUDGET
+
+    memory = np.sort(process_peak_memory(task_costs(df_tasks)))[::-1]
+    if memory.shape[0] == 0:
+        return 1, 0
+    peak = np.cumsum(memory[:n_cores])
+    n_process = max(1, int(np.searchsorted(peak, budget, side='right')))
+    return n_process, int(peak[n_process - 1])
+
+
+def _read_durations(path: str) -> pd.DataFrame:
+    """Read a durations file."""
+    return pd.read_csv(path, dtype={'Task ID': str})
+
+
+def load_durations(out_dir: str, task_dir: Optional[str] = None) -> Dict[str, float]:
+    """Load measured task durations in seconds of previous runs, the latest measurement wins.
+
+    Runs into the result directory are read from its own files. Runs of the task directory into
+    other result directories are read from the durations file of the task directory, which also
+    holds the latest measurements.
+    """
+    paths = sorted(glob.glob(os.path.join(out_dir, _DURATIONS_FILENAME_PATTERN.format('*'))))
+    if task_dir:
+        paths.append(os.path.join(task_dir, _TASK_DIR_DURATIONS_FILENAME))
+    durations = {}
+    for path in paths:
+        if os.path.exists(path):
+            df = _read_durations(path)
+            durations.update(zip(df['Task ID'].tolist(), df['Seconds'].tolist()))
+    return durations
+
+
+def store_durations(out_dir: str, df_tasks: pd.DataFrame, durations: Dict[str, float]) -> str:
+    """Store measured task durations in seconds of a run, with the isoform and SNP counts of tasks."""
+    path = os.path.join(out_dir, _DURATIONS_FILENAME_PATTERN.format(time.strftime('%Y%m%d-%H%M%S')))
+    df = df_tasks[df_tasks['Task ID'].isin(durations)][['Task ID', 'Isoforms', 'SNPs']].copy()
+    df['Seconds'] = df['Task ID'].map(durations).values
+    df.to_csv(path, index=False)
+    return path
+
+
+def store_task_dir_durations(task_dir: str, run_path: str) -> str:
+    """Merge the durations file of a run into the durations file of its task directory.
+
+    The measurements of the run replace earlier measurements of the same tasks.
+    """
+    path = os.path.join(task_dir, _TASK_DIR_DURATIONS_FILENAME)
+    df = _read_durations(run_path)
+    if os.path.exists(path):
+        df_old = _read_durations(path)
+        df = pd.concat([df_old[~df_old['Task ID'].isin(df['Task ID'])], df])
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def refined_task_costs(df_tasks: pd.DataFrame, durations: Dict[str, float]) -> np.ndarray:
+    """Costs of tasks in seconds, measured durations for known tasks, scaled proxy costs for the others.
+
+    Without measurements, the proxy costs are returned.
+    """
+    costs = task_costs(df_tasks)
+    measured = df_tasks['Task ID'].map(durations).values.astype(np.float64)
+    known = ~np.isnan(measured)
+    if not np.any(known) or costs[known].sum() == 0:
+        return costs
+    scale = measured[known].sum() / costs[known].sum()
+    return np.where(known, measured, costs * scale)
+
+
+def dispatch_order(df_tasks: pd.DataFrame, costs: np.ndarray) -> List[str]:
+    """Task IDs in longest-processing-time-first order."""
+    order = np.argsort(-costs, kind='stable')
+    return df_tasks['Task ID'].values[order].tolist()
+
+
+def makespan(durations: Sequence[float], n_process: int) -> float:
+    """Wall-clock time of tasks dispatched in order to the first idle of n processes."""
+    finish_times = [0.0] * max(1, n_process)
+    for duration in durations:
+        heapq.heapreplace(finish_times, finish_times[0] + duration)
+    return max(finish_times)
+
+
+class ThroughputEstimator:
+    """Rolling throughput and cost-weighted ETA of a run.
+
+    Attributes:
+        start_time: The start time of the run.
+        costs: Task ID to cost of the tasks to run.
+        remaining_cost: The cost of the tasks which are not finished.
+        completions: (Finish time, cost) of the tasks finished in the time window.
+    """
+
+    def __init__(self, costs: Dict[str, float]):
+        self.start_time = time.time()
+        self.costs = costs
+        self.remaining_cost = sum(costs.values())
+        self.completions = deque()
+
+    def task_finished(self, task_id: str):
+        """Record a finished task."""
+        now = time.time()
+        cost = self.costs.pop(task_id, 0.0)
+        self.remaining_cost -= cost
+        self.completions.append((now, cost))
+        while self.completions[0][0] < now - _THROUGHPUT_WINDOW:
+            self.completions.popleft()
+
+    def _elapsed(self) -> float:
+        """Elapsed time of the window."""
+        now = time.time()
+        return now - max(self.start_time, now - _THROUGHPUT_WINDOW)
+
+    def throughput(self) -> Optional[float]:
+        """Finished tasks per minute."""
+        if len(self.completions) == 0:
+            return None
+        return len(self.completions) / self._elapsed() * 60
+
+    def eta(self) -> Optional[float]:
+        """Estimated remaining time in seconds, from the cost of remaining tasks and the cost throughput."""
+        finished_cost = sum(cost for _, cost in self.completions)
+        if finished_cost <= 0:
+            return None
+        return max(0.0, self.remaining_cost) / (finished_cost / self._elapsed())
+
+
+def format_duration(seconds: float) -> str:
+    """Format duration for display."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days > 0:
+        return '{}d {}h'.format(days, hours)
+    if hours > 0:
+        return '{}h {}m'.format(hours, minutes)
+    return '{}m {}s'.format(minutes, seconds)
+
+
+def format_memory(n_bytes: int) -> str:
+    """Format memory size for display."""
+    size = float(n_bytes)
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024:
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024
+    return '{:.1f} TiB'.format(size)
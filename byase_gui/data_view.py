@@ -16,11 +16,21 @@
 # Author: Lili Dong
 #
 
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, Union, List
 
+import numpy as np
 import pandas as pd
 import wx
 
+from .result_store import ColumnStore, FrameTable, CHUNK_SIZE
+
+
+def _format_cell(cell) -> str:
+    """Format cell for display."""
+    if isinstance(cell, float):
+        return '{:.3f}'.format(cell)
+    return str(cell)
+
 
 class DataView(wx.ListCtrl):
     """Data view to display data frame.
@@ -35,8 +45,11 @@ class DataView(wx.ListCtrl):
         last_sorted_col_name: The name of the last sorted column.
     """
 
-    def __init__(self, parent, sortable: bool = True):
-        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+    def __init__(self, parent, sortable: bool = True, single_sel: bool = True):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL
+        if single_sel:
+            style |= wx.LC_SINGLE_SEL
+        super().__init__(parent, style=style)
 
         self.src_df = None  # type: Optional[pd.DataFrame]
         self.df = None  # type: Optional[pd.DataFrame]
@@ -52,18 +65,17 @@ class DataView(wx.ListCtrl):
             self.Bind(wx.EVT_LIST_COL_CLICK, self.on_col_click)
 
     def OnGetItemText(self, item, column):
-        cell = self.df.iloc[item, column]
-        if isinstance(cell, float):
-            cell = '{:.3f}'.format(cell)
-        else:
-            cell = str(cell)
-        return cell
+        return _format_cell(self.df.iloc[item, column])
+
+    def column_names(self) -> List[str]:
+        """The names of columns."""
+        return self.src_df.columns.tolist()
 
     def on_col_click(self, event):
         """When column header is clicked."""
         n_col = event.GetColumn()
         self.last_sorted_col_name = self.sort_col_name
-        self.sort_col_name = self.src_df.columns[n_col]
+        self.sort_col_name = self.column_names()[n_col]
 
         ascending = True
         if (self.last_sorted_col_name is not None) and (self.last_sorted_col_name == self.sort_col_name):
@@ -119,6 +131,15 @@ class DataView(wx.ListCtrl):
 
         self._update_display()
 
+    def selected_items(self) -> List[int]:
+        """The displayed rows which are selected."""
+        items = []
+        item = self.GetFirstSelected()
+        while item >= 0:
+            items.append(item)
+            item = self.GetNextSelected(item)
+        return items
+
     def set_sorter(self, col_name: str, key_func: Optional[Callable]):
         """Set sorter for specific column name."""
         self.sorter_mapper[col_name] = key_func
@@ -137,3 +158,163 @@ class DataView(wx.ListCtrl):
                 del self.filter_mapper[col_name]
 
         self._update_display()
+
+
+Table = Union[ColumnStore, FrameTable]
+
+
+class StoreDataView(DataView):
+    """Data view to display a table whose rows are paged in on demand.
+
+    The displayed rows are kept as an array of source row numbers, filters are applied over
+    column chunks and only the rows in the visible page are materialized.
+
+    Attributes:
+        table: The source table.
+        order: Source row numbers of the displayed rows.
+        page_start: The first displayed row of the cached page.
+        page: Formatted cells of the cached page.
+    """
+
+    def __init__(self, parent, sortable: bool = True):
+        super().__init__(parent, sortable)
+
+        self.table = None  # type: Optional[Table]
+        self.order = None  # type: Optional[np.ndarray]
+
+        self.page_start = 0
+        self.page = []  # type: List[List[str]]
+
+        self.Bind(wx.EVT_LIST_CACHE_HINT, self.on_cache_hint)
+
+    def OnGetItemText(self, item, column):
+        n = item - self.page_start
+        if 0 <= n < len(self.page):
+            return self.page[n][column]
+        return _format_cell(self.table.cell(int(self.order[item]), column))
+
+    def on_cache_hint(self, event: wx.ListEvent):
+        """Page in the rows which are going to be displayed."""
+        if self.table is None:
+            return
+        start, stop = event.GetCacheFrom(), event.GetCacheTo() + 1
+        if self.page_start <= start and stop <= self.page_start + len(self.page):
+            return
+        df = self.table.take(self.order[start:stop])
+        self.page_start = start
+        self.page = [[_format_cell(cell) for cell in row] for row in df.itertuples(index=False)]
+
+    def column_names(self) -> List[str]:
+        return self.table.columns
+
+    @property
+    def row_count(self) -> int:
+        """The count of displayed rows."""
+        return 0 if self.order is None else self.order.shape[0]
+
+    def source_row(self, n: int) -> int:
+        """The source row number of the n-th displayed row."""
+        return int(self.order[n])
+
+    def get_row(self, n: int) -> pd.Series:
+        """Get the n-th displayed row."""
+        return self.table.take([self.order[n]]).iloc[0, :]
+
+    def find_row(self, col_name: str, predicate: Callable) -> Optional[int]:
+        """Find the first displayed row whose cell in the column satisfies the predicate."""
+        data = self.table.column(col_name)
+        for start in range(0, self.row_count, CHUNK_SIZE):
+            for i, cell in enumerate(data[self.order[start:start + CHUNK_SIZE]]):
+                if predicate(cell):
+                    return start + i
+        return None
+
+    def _filter_mask(self) -> np.ndarray:
+        """Apply filters over column chunks."""
+        n_rows = self.table.n_rows
+        mask = np.ones(n_rows, dtype=bool)
+        for col_name, filter_func in self.filter_mapper.items():
+            for n_col, name in enumerate(self.table.columns):
+                if name != col_name:
+                    continue
+                data = self.table.column_at(n_col)
+                for start in range(0, n_rows, CHUNK_SIZE):
+                    chunk = data[start:start + CHUNK_SIZE]
+                    sel = filter_func(chunk)
+                    if np.ndim(sel) == 0:
+                        sel = [filter_func(cell) for cell in chunk]
+                    mask[start:start + CHUNK_SIZE] &= np.asarray(sel, dtype=bool)
+        return mask
+
+    def _sort_order(self, order: np.ndarray) -> np.ndarray:
+        """Sort the displayed rows."""
+        key_func = self.sorter_mapper.get(self.sort_col_name)
+        values = self.table.column(self.sort_col_name)[order]
+
+        if key_func is None and np.asarray(values).dtype.kind in 'biuf':
+            values = np.asarray(values, dtype=float)
+            nan = np.isnan(values)
+            idx = np.argsort(values[~nan], kind='stable')
+            if not self.sort_ascending:
+                idx = idx[::-1]
+            return np.concatenate([order[~nan][idx], order[nan]])
+
+        if key_func is None:
+            key_func = str
+        values = values.tolist()
+        idx = sorted(range(len(values)), key=lambda x: key_func(values[x]), reverse=not self.sort_ascending)
+        return order[idx]
+
+    def _update_display(self):
+        if self.table is None:
+            return
+
+        order = np.flatnonzero(self._filter_mask())
+        if self.sort_col_name is not None:
+            order = self._sort_order(order)
+
+        self.order = order
+        self.page_start = 0
+        self.page = []
+        self.SetItemCount(self.row_count)
+        self.Refresh()
+
+    def update_table(self, table: Optional[Table]):
+        """Update table."""
+        self.ClearAll()
+        self.sort_col_name = None
+        self.page_start = 0
+        self.page = []
+
+        if table is None:
+            self.table = None
+            self.order = None
+            return
+
+        self.table = table
+        for i, col in enumerate(self.table.columns):
+            self.InsertColumn(i, col)
+
+        self._update_display()
+
+    def replace_table(self, table: Table):
+        """Replace the table by a grown one, keeping sorting, filters and the selected row."""
+        if self.table is None or self.table.columns != table.columns:
+            self.update_table(table)
+            return
+
+        n = self.GetFirstSelected()
+        selected = self.source_row(n) if n >= 0 else None
+
+        self.table = table
+        self._update_display()
+
+        if selected is None:
+            return
+        rows = np.flatnonzero(self.order == selected)
+        if rows.shape[0] > 0 and rows[0] != n:
+            self.Select(n, on=0)
+            self.Select(int(rows[0]))
+
+    def update_df(self, df: Optional[pd.DataFrame]):
+        self.update_table(None if df is None else FrameTable(df))
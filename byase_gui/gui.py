@@ -16,6 +16,7 @@
 # Author: Lili Dong
 #
 
+import argparse
 import multiprocessing as mp
 
 import psutil
@@ -23,11 +24,15 @@ import wx
 
 from .message import QueueMessageCenter
 from .task import task
+from .remote import SocketMessageCenter, token_from_env
 from .log_pane import LogPane
 from .annotation_panel import AnnotationPanel
 from .inference_panel import InferencePanel
+from .shard_panel import ShardPanel
 from .result_panel import ResultPanel
+from .overview_panel import OverviewPanel
 from .plot_panel import PlotPanel
+from .plot_export_panel import PlotExportPanel
 
 
 class Frame(wx.Frame):
@@ -52,20 +57,39 @@ class Frame(wx.Frame):
         self.notebook = wx.Notebook(self.panel)
         annotation_panel = AnnotationPanel(self.notebook, mc, log_text_field)
         inference_panel = InferencePanel(self.notebook, mc, log_text_field)
+        shard_panel = ShardPanel(self.notebook, mc, log_text_field)
         result_panel = ResultPanel(self.notebook, mc, log_text_field)
+        overview_panel = OverviewPanel(self.notebook, mc, log_text_field)
         plot_panel = PlotPanel(self.notebook, mc, log_text_field)
+        plot_export_panel = PlotExportPanel(self.notebook, mc, log_text_field)
 
         result_panel.set_delegate(plot_panel)
-
-        annotation_panel.add_disabling_elements([inference_panel, result_panel, plot_panel])
-        inference_panel.add_disabling_elements([annotation_panel, result_panel, plot_panel])
-        result_panel.add_disabling_elements([annotation_panel, inference_panel, plot_panel])
-        plot_panel.add_disabling_elements([annotation_panel, inference_panel, result_panel])
+        plot_export_panel.set_delegate(result_panel)
+        overview_panel.set_delegate(result_panel)
+        inference_panel.set_delegate(result_panel)
+
+        annotation_panel.add_disabling_elements([inference_panel, shard_panel, result_panel, overview_panel,
+                                                 plot_panel, plot_export_panel])
+        inference_panel.add_disabling_elements([annotation_panel, shard_panel, overview_panel, plot_panel,
+                                                plot_export_panel] + result_panel.backend_elements())
+        shard_panel.add_disabling_elements([annotation_panel, inference_panel, result_panel, overview_panel,
+                                            plot_panel, plot_export_panel])
+        result_panel.add_disabling_elements([annotation_panel, inference_panel, shard_panel, overview_panel,
+                                             plot_panel, plot_export_panel])
+        overview_panel.add_disabling_elements([annotation_panel, inference_panel, shard_panel, result_panel,
+                                               plot_panel, plot_export_panel])
+        plot_panel.add_disabling_elements([annotation_panel, inference_panel, shard_panel, result_panel,
+                                           overview_panel, plot_export_panel])
+        plot_export_panel.add_disabling_elements([annotation_panel, inference_panel, shard_panel, result_panel,
+                                                  overview_panel, plot_panel])
 
         self.notebook.AddPage(annotation_panel, 'Generate Tasks')
         self.notebook.AddPage(inference_panel, 'Inference')
+        self.notebook.AddPage(shard_panel, 'Shards')
         self.notebook.AddPage(result_panel, 'Results')
+        self.notebook.AddPage(overview_panel, 'Overview')
         self.notebook.AddPage(plot_panel, 'Plot')
+        self.notebook.AddPage(plot_export_panel, 'Export Plots')
 
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(self.notebook, 3, wx.ALL | wx.EXPAND, 5)
@@ -81,6 +105,19 @@ class Frame(wx.Frame):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='A GUI tool for BYASE software.')
+    parser.add_argument('--worker', help='Run tasks on a byase-gui-worker at "host:port" or a Unix socket path.')
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        mc = SocketMessageCenter(args.worker, token_from_env())
+        app = wx.App()
+        frame = Frame(mc)
+        frame.Show()
+        app.MainLoop()
+        mc.close()
+        return
+
     mc = QueueMessageCenter()
 
     work_process = mp.Process(target=task, args=(mc, ))
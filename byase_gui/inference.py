@@ -0,0 +1,198 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import time
+from queue import Empty
+from multiprocessing import Queue, Pool
+from typing import List, Optional, Tuple, Callable
+
+import pysam
+
+from byase.message import MessageCenter
+from byase.annotation import AnnotationDB
+from byase.task import BAMParam
+from byase.result import ResultRecord
+from byase.inference import InferenceTool, InferenceParam
+
+from .stats import records_stats
+from .shard import record_shard
+
+
+_LIVE_STATS_INTERVAL = 5
+
+
+def _bam_index_paths(bam_path: str) -> List[str]:
+    """Paths of the existing indexes of a BAM file."""
+    paths = [bam_path + '.bai', os.path.splitext(bam_path)[0] + '.bai', bam_path + '.csi']
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _build_bam_index(args: Tuple[str, str]) -> str:
+    """Build the index of a BAM file at the index path, in CSI format if the path ends with ".csi"."""
+    bam_path, index_path = args
+    pysam.index('-c' if index_path.endswith('.csi') else '-b', '-o', index_path, bam_path)
+    return index_path
+
+
+def ensure_bam_indexes(bam_paths: List[str], n_process: int, mc: MessageCenter):
+    """Check that every index of every BAM file is newer than the BAM file, and build missing or stale indexes
+    concurrently.
+
+    A stale index is rebuilt under its own name and in its own format, since htslib may load any of them.
+    """
+    jobs = []
+    for bam_path in bam_paths:
+        index_paths = _bam_index_paths(bam_path)
+        if len(index_paths) == 0:
+            mc.log_info('BAM index is missing: {}'.format(bam_path))
+            jobs.append((bam_path, bam_path + '.bai'))
+        for index_path in index_paths:
+            if os.path.getmtime(index_path) < os.path.getmtime(bam_path):
+                mc.log_warning('BAM index is older than the BAM file: {}'.format(index_path))
+                jobs.append((bam_path, index_path))
+    if len(jobs) == 0:
+        return
+
+    mc.handle_progress('Building {} BAM indexes...'.format(len(jobs)))
+    with Pool(max(1, min(n_process, len(jobs)))) as pool:
+        for n, index_path in enumerate(pool.imap_unordered(_build_bam_index, jobs)):
+            mc.handle_progress('Built BAM index {} of {}: {}'.format(n + 1, len(jobs), os.path.basename(index_path)))
+
+
+class _LiveStatsQueue:
+    """Records queue, which collects the result records taken from it and sends their stats in batches.
+
+    While waiting for the next item, stats of collected records are sent once the interval has passed
+    since the last batch, so no record waits longer than the interval for another record to arrive.
+
+    Attributes:
+        queue: The records queue.
+        send: Callback to send stats of records.
+        records: Records taken from the queue, whose stats are not sent yet.
+        last_sent: The time of the last batch.
+    """
+
+    def __init__(self, queue: Queue, send: Callable[[List[ResultRecord]], None]):
+        self.queue = queue
+        self.send = send
+        self.records = []  # type: List[ResultRecord]
+        self.last_sent = time.time()
+
+    def get(self):
+        """Get an item from the records queue."""
+        while True:
+            timeout = None
+            if len(self.records) > 0:
+                timeout = self.last_sent + _LIVE_STATS_INTERVAL - time.time()
+                if timeout <= 0:
+                    self.flush()
+                    timeout = None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                continue
+            break
+        if isinstance(item, ResultRecord):
+            self.records.append(item)
+        return item
+
+    def flush(self):
+        """Send stats of the collected records."""
+        if len(self.records) > 0:
+            self.send(self.records)
+            self.records = []
+        self.last_sent = time.time()
+
+
+class GUIInferenceTool(InferenceTool):
+    """Inference tool with live stats of finished tasks.
+
+    Attributes:
+        live_stats: If stats of finished tasks are sent while inference is running.
+        order: Task IDs in the order to dispatch, tasks not in it are dispatched last in database order.
+        task_ids: Task IDs to run, None for all tasks. Finished tasks are skipped.
+    """
+
+    def __init__(self, out_dir: str, n_process: int, param: Optional[InferenceParam], mc: MessageCenter,
+                 live_stats: bool = False, order: Optional[List[str]] = None,
+                 task_ids: Optional[List[str]] = None):
+        super().__init__(out_dir, n_process, param, mc)
+        record_shard(self.anno_path, self.out_dir)
+        self.live_stats = live_stats
+        self.order = order
+        self.task_ids = task_ids
+
+    def run(self, target_count: Optional[int], target_task_ids: Optional[List[str]] = None):
+        ensure_bam_indexes(self.bam_param.paths, self.n_process, self.mc)
+        super().run(target_count, target_task_ids)
+
+    def _extract_task_ids(self, target_count: Optional[int]):
+        if self.task_ids is None:
+            task_ids = super()._extract_task_ids(target_count)
+        else:
+            # Results are append-only, tasks of the subset which are finished cannot be run again.
+            subset = set(self.task_ids)
+            task_ids = [task_id for task_id in super()._extract_task_ids(None) if task_id in subset]
+            if len(task_ids) < len(subset):
+                self.mc.log_warning('{} of {} selected tasks are already finished, or not in the task directory, '
+                                    'and are skipped.'.format(len(subset) - len(task_ids), len(subset)))
+            if target_count is not None:
+                task_ids = task_ids[:target_count]
+        if self.order is None:
+            return task_ids
+        rank = {task_id: n for n, task_id in enumerate(self.order)}
+        return sorted(task_ids, key=lambda x: rank.get(x, len(rank)))
+
+    def _send_live_stats(self, records: List[ResultRecord]):
+        """Send stats of finished task records."""
+        with AnnotationDB(self.anno_path) as anno_db:
+            df_gene_level, df_isoform_level = records_stats(anno_db, records)
+        self.mc.handle_data(('live stats', (df_gene_level, df_isoform_level)))
+
+    def _store_tmp_result_records(self, records_queue: Queue):
+        """Store tmp result records, and send live stats of finished tasks in batches."""
+        if not self.live_stats:
+            super()._store_tmp_result_records(records_queue)
+            return
+        live_stats_queue = _LiveStatsQueue(records_queue, self._send_live_stats)
+        super()._store_tmp_result_records(live_stats_queue)
+        live_stats_queue.flush()
+
+
+def inference(args):
+    """Inference."""
+    anno_path = args['task']
+
+    bam_param = BAMParam(bam_paths=args['bam'], read_len=args['read_len'], paired_end=args['pe'],
+                         insert_size_mean=args['insert_size_mean'], insert_size_std=args['insert_size_std'])
+    param = InferenceParam(anno_path=anno_path, bam_param=bam_param,
+                           mcmc_samples_count=args.get('n_mcmc', 500), tune_samples_count=args.get('tune', 500))
+
+    inference_tool = GUIInferenceTool(out_dir=args['out_dir'], n_process=args['process'], param=param,
+                                      mc=args['mc'], live_stats=args.get('live_stats', False),
+                                      order=args.get('order'), task_ids=args.get('task_ids'))
+    inference_tool.run(args['count'])
+
+
+def inference_resume(args):
+    """Inference resume."""
+    inference_tool = GUIInferenceTool(out_dir=args['out_dir'], n_process=args['process'], param=None,
+                                      mc=args['mc'], live_stats=args.get('live_stats', False),
+                                      order=args.get('order'), task_ids=args.get('task_ids'))
+    inference_tool.run(args['count'])
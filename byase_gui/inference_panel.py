@@ -17,27 +17,147 @@
 #
 
 import os
-from typing import List, Optional
+import time
+from typing import List, Dict, Set, Optional
 
+import numpy as np
+import pandas as pd
 import wx
 from wx.lib.intctrl import IntCtrl
 
 from .message import QueueMessageCenter
 from .long_running import LongRunningTaskIndicatorPanel, LongRunningTaskProgressPanel
 from .data_view import DataView
+from .preflight import BAMLayout
+from .result_dir import is_resumable, annotation_path, finished_task_ids
+from .cost import suggest_process_count, format_memory, load_durations, store_durations, refined_task_costs, \
+    store_task_dir_durations, dispatch_order, makespan, ThroughputEstimator, format_duration
+
+
+TASK_STATUSES = ['Waiting', 'Processing', 'Done']
 
 
 class TaskDataView(DataView):
-    """Task data view."""
+    """Task data view.
+
+    Task statuses are kept as codes of source rows and repainted in batches. The view is not sorted,
+    and can be filtered by a search text.
+
+    Attributes:
+        row_of_task: Task ID to source row number.
+        status_col: The position of the status column.
+        status_codes: Status code of each source row, the index of the status in TASK_STATUSES.
+        search_text: Only tasks whose ID or gene name contain the text are displayed.
+        display_rows: Source row numbers of the displayed rows.
+        display_pos: Displayed row number of each source row, -1 if it is filtered out.
+        changed_rows: Source rows whose status changed since the last repaint.
+        last_changed_row: The source row whose status changed last.
+        follow: Scroll to the last changed row on repaint.
+    """
+
+    def __init__(self, parent, sortable: bool = True, single_sel: bool = True):
+        super().__init__(parent, sortable, single_sel)
+
+        self.row_of_task = {}  # type: Dict[str, int]
+        self.status_col = None  # type: Optional[int]
+        self.status_codes = np.zeros(0, dtype=np.int8)
+
+        self.search_text = ''
+        self.display_rows = np.zeros(0, dtype=np.int64)
+        self.display_pos = np.zeros(0, dtype=np.int64)
+
+        self.changed_rows = set()
+        self.last_changed_row = None  # type: Optional[int]
+        self.follow = True
+
+    def OnGetItemText(self, item, column):
+        if column == self.status_col:
+            return TASK_STATUSES[self.status_codes[self.display_rows[item]]]
+        return super().OnGetItemText(item, column)
+
+    def _update_display(self):
+        super()._update_display()
+        if self.df is None:
+            self.display_rows = np.zeros(0, dtype=np.int64)
+            self.display_pos = np.zeros(0, dtype=np.int64)
+            return
+
+        if self.search_text != '':
+            text = self.search_text
+            sel = self.df['Task ID'].str.contains(text, regex=False, na=False) | \
+                self.df['Gene Name'].str.contains(text, regex=False, na=False)
+            self.df = self.df[sel.values]
+            self.SetItemCount(self.df.shape[0])
+            self.Refresh()
+
+        # Source data frame of tasks has a range index.
+        self.display_rows = self.df.index.values.astype(np.int64)
+        self.display_pos = np.full(self.src_df.shape[0], -1, dtype=np.int64)
+        self.display_pos[self.display_rows] = np.arange(self.display_rows.shape[0])
+
+    def set_search_text(self, text: str):
+        """Only display tasks whose ID or gene name contain the text."""
+        self.search_text = text
+        self._update_display()
+
+    def filtered(self) -> bool:
+        """If some tasks are filtered out."""
+        return self.df is not None and self.df.shape[0] < self.src_df.shape[0]
+
+    def selected_task_ids(self) -> List[str]:
+        """Task IDs of selected tasks."""
+        task_ids = self.df['Task ID'].values
+        return [task_ids[item] for item in self.selected_items()]
+
+    def displayed_task_ids(self) -> List[str]:
+        """Task IDs of displayed tasks."""
+        return self.df['Task ID'].tolist()
+
+    def update_df(self, df: Optional[pd.DataFrame]):
+        self.changed_rows = set()
+        self.last_changed_row = None
+        if df is None:
+            self.row_of_task = {}
+            self.status_col = None
+            self.status_codes = np.zeros(0, dtype=np.int8)
+        else:
+            self.row_of_task = {task_id: n for n, task_id in enumerate(df['Task ID'].tolist())}
+            self.status_col = df.columns.tolist().index('Status')
+            codes = {status: n for n, status in enumerate(TASK_STATUSES)}
+            self.status_codes = np.array([codes.get(status, 0) for status in df['Status'].tolist()], dtype=np.int8)
+        super().update_df(df)
+
+    def set_done_tasks(self, task_ids: Set[str]):
+        """Mark the tasks as done, and the others as waiting."""
+        done = TASK_STATUSES.index('Done')
+        self.status_codes[:] = TASK_STATUSES.index('Waiting')
+        for task_id in task_ids:
+            n = self.row_of_task.get(task_id)
+            if n is not None:
+                self.status_codes[n] = done
+        self.Refresh()
 
     def set_task_status(self, task_id: str, status: str):
-        """Set task status."""
-        for i in range(self.df.shape[0]):
-            if self.df.loc[i, 'Task ID'] == task_id:
-                self.df.loc[i, 'Status'] = status
-                self.RefreshItem(i)
-                self.EnsureVisible(i)
-                break
+        """Set task status, which is repainted by flush_status_changes."""
+        n = self.row_of_task.get(task_id)
+        if n is None:
+            return
+        self.status_codes[n] = TASK_STATUSES.index(status)
+        self.changed_rows.add(n)
+        self.last_changed_row = n
+
+    def flush_status_changes(self):
+        """Repaint rows whose status changed, and scroll to the last changed row if following."""
+        if len(self.changed_rows) == 0:
+            return
+        items = self.display_pos[list(self.changed_rows)]
+        items = items[items >= 0]
+        if items.shape[0] > 0:
+            self.RefreshItems(int(items.min()), int(items.max()))
+        last_item = self.display_pos[self.last_changed_row]
+        if self.follow and last_item >= 0:
+            self.EnsureVisible(int(last_item))
+        self.changed_rows = set()
 
 
 class _ConfigPanelDelegate:
@@ -58,6 +178,8 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
     Attributes:
         task_dir_input: Task directory input.
         task_data_view: Annotation data view.
+        task_search_input: Task search input, to filter tasks by ID or gene name.
+        subset_label: The label for the count of tasks to run.
         delegate: Delegate.
         bam_paths: Paths of BAMs.
         bams_input: BAM files input.
@@ -67,7 +189,12 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
         pe_input: Paired-end input.
         insert_size_mean_input: Insert-size mean input.
         insert_size_std_input: Insert-size std input.
-        resume_checkbox: Resume mode checkbox.
+        parallel_input: The count of inference processes.
+        auto_parallel_checkbox: Auto parallel checkbox, to choose the count of processes from the hardware and tasks.
+        peak_memory_label: The label for the expected peak memory.
+        preflight_pending: The BAM pre-flight is the task to run, instead of loading tasks.
+        resume_checkbox: Resume mode checkbox, to run the remaining tasks of the output directory.
+        finished_task_ids: IDs of tasks which have results in the output directory.
     """
 
     def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
@@ -79,10 +206,19 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
         task_dir_label = wx.StaticText(self.config_sub_panel, label='Task Directory:')
         self.task_dir_input = wx.DirPickerCtrl(self.config_sub_panel)
         self.task_dir_input.Bind(wx.EVT_DIRPICKER_CHANGED, self.on_select_task_dir)
-        self.task_data_view = TaskDataView(self, sortable=False)
+        self.task_data_view = TaskDataView(self, sortable=False, single_sel=False)
+        self.task_data_view.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_task_selection_changed)
+        self.task_data_view.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_task_selection_changed)
+        task_search_label = wx.StaticText(self.config_sub_panel, label='Filter:')
+        self.task_search_input = wx.TextCtrl(self.config_sub_panel)
+        self.task_search_input.SetToolTip('Filter tasks by ID or gene name. Only the selected tasks, '
+                                          'or else the filtered tasks, are run.')
+        self.task_search_input.Bind(wx.EVT_TEXT, self.on_task_search_text_changed)
+        self.subset_label = wx.StaticText(self.config_sub_panel)
 
         # BAMs.
         self.bam_paths = None
+        self.preflight_pending = False
         bams_label = wx.StaticText(self.config_sub_panel, label='BAM Files:')
         self.bams_input = wx.TextCtrl(self.config_sub_panel, style=wx.TE_READONLY)
         self.select_bams_button = wx.Button(self.config_sub_panel, label='Browse')
@@ -103,14 +239,24 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
 
         # Settings.
         parallel_label = wx.StaticText(self.config_sub_panel, label='Parallel Process:')
-        self.parallel_input = wx.SpinCtrl(self.config_sub_panel, min=1)
+        cpu_count = os.cpu_count() or 1
+        self.parallel_input = wx.SpinCtrl(self.config_sub_panel, min=1, max=cpu_count)
+        self.auto_parallel_checkbox = wx.CheckBox(self.config_sub_panel, label='Auto')
+        self.auto_parallel_checkbox.SetToolTip('Choose the count of processes from physical cores, '
+                                               'available memory and the loaded tasks.')
+        self.auto_parallel_checkbox.Bind(wx.EVT_CHECKBOX, self.on_auto_parallel_checked)
+        self.peak_memory_label = wx.StaticText(self.config_sub_panel)
 
         self.resume_checkbox = wx.CheckBox(self.config_sub_panel, label='Resume Mode')
-        self.resume_checkbox.Hide()
+        self.resume_checkbox.SetToolTip('Run the remaining tasks of the output directory, with its parameters.')
+        self.resume_checkbox.Bind(wx.EVT_CHECKBOX, self.on_resume_checked)
+        self.finished_task_ids = set()  # type: Set[str]
 
         config_sizer = wx.GridBagSizer(hgap=5, vgap=5)
         setting_sizer = wx.BoxSizer(wx.HORIZONTAL)
         setting_sizer.Add(self.parallel_input, 0)
+        setting_sizer.Add(self.auto_parallel_checkbox, 0, wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
+        setting_sizer.Add(self.peak_memory_label, 0, wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
         setting_sizer.AddStretchSpacer(1)
         setting_sizer.Add(self.resume_checkbox, 0, wx.ALIGN_CENTER_VERTICAL)
         config_sizer.Add(parallel_label, pos=(0, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
@@ -135,6 +281,9 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
         task_sizer = wx.BoxSizer(wx.HORIZONTAL)
         task_sizer.Add(self.task_dir_input, 1, wx.EXPAND)
         task_sizer.AddStretchSpacer(1)
+        task_sizer.Add(task_search_label, 0, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 5)
+        task_sizer.Add(self.task_search_input, 1, wx.RIGHT | wx.EXPAND, 5)
+        task_sizer.Add(self.subset_label, 0, wx.ALIGN_CENTER_VERTICAL)
         config_sizer.Add(task_dir_label, pos=(5, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
         config_sizer.Add(task_sizer, pos=(5, 1), flag=wx.EXPAND)
         config_sizer.AddGrowableCol(1)
@@ -150,10 +299,19 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
 
         self.delegate = None  # type: Optional[_ConfigPanelDelegate]
 
+        self.add_disabling_elements([self.config_sub_panel])
+
     def loading_widget(self):
         return self.task_data_view
 
     def provide_tool(self):
+        if self.preflight_pending:
+            tool = 'bam-preflight'
+            params = {
+                'bam': self.bam_paths
+            }
+            return tool, params
+
         tool = 'load-task'
         params = {
             'task_dir': self.task_dir_input.GetPath()
@@ -161,9 +319,18 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
         return tool, params
 
     def handle_data(self, data):
+        if isinstance(data, tuple):
+            key, val = data
+            if key == 'bam layout':
+                self.set_bam_layout(val)
+            return
+
         self.task_data_view.update_df(data)
         for n_col in [2, 3]:
             self.task_data_view.SetColumnWidth(n_col, wx.LIST_AUTOSIZE)
+        self.update_auto_parallel()
+        self.update_subset_label()
+        self.task_data_view.set_done_tasks(self.finished_task_ids)
 
     def set_delegate(self, delegate: _ConfigPanelDelegate):
         self.delegate = delegate
@@ -171,14 +338,90 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
     def on_select_task_dir(self, event):
         """Select task directory callback."""
         assert event
+        self.load_tasks()
+
+    def load_tasks(self):
+        """Load tasks of the task directory."""
         self.task_data_view.update_df(None)
+        self.update_subset_label()
         self.delegate.tasks_start_loading()
         self.start_task()
 
     def handle_task_finished(self):
         super().handle_task_finished()
+        self.preflight_pending = False
         self.delegate.tasks_loaded()
 
+    def set_finished_tasks(self, task_ids: Set[str]):
+        """Set tasks which have results in the output directory."""
+        self.finished_task_ids = task_ids
+        if self.task_data_view.df is not None:
+            self.task_data_view.set_done_tasks(task_ids)
+
+    def on_resume_checked(self, event):
+        """Resume checked callback."""
+        assert event
+        self.update_resume_mode()
+
+    def update_resume_mode(self):
+        """In resume mode, parameters are loaded from the output directory."""
+        resume = self.resume_checkbox.IsChecked()
+        for e in [self.task_dir_input, self.select_bams_button, self.read_len_input, self.se_input, self.pe_input]:
+            e.Enabled = not resume
+        pe = self.pe_input.GetValue()
+        self.insert_size_mean_input.Enabled = pe and not resume
+        self.insert_size_std_input.Enabled = pe and not resume
+
+    def on_task_search_text_changed(self, event):
+        """Task search text changed callback."""
+        assert event
+        self.task_data_view.set_search_text(self.task_search_input.GetValue())
+        self.update_subset_label()
+
+    def on_task_selection_changed(self, event):
+        """Task selected or deselected callback."""
+        assert event
+        self.update_subset_label()
+
+    def subset_task_ids(self) -> Optional[List[str]]:
+        """Task IDs to run, the selected tasks, or else the filtered tasks, None for all tasks."""
+        task_ids = self.task_data_view.selected_task_ids()
+        if len(task_ids) > 0:
+            return task_ids
+        if self.task_data_view.filtered():
+            return self.task_data_view.displayed_task_ids()
+        return None
+
+    def update_subset_label(self):
+        """Update the label for the count of tasks to run."""
+        if self.task_data_view.df is None:
+            self.subset_label.SetLabel('')
+            return
+        task_ids = self.subset_task_ids()
+        if task_ids is None:
+            self.subset_label.SetLabel('All tasks')
+        else:
+            self.subset_label.SetLabel('{} tasks'.format(len(task_ids)))
+        self.config_sub_panel.Layout()
+
+    def on_auto_parallel_checked(self, event):
+        """Auto parallel checked callback."""
+        assert event
+        auto = self.auto_parallel_checkbox.IsChecked()
+        self.parallel_input.Enabled = not auto
+        if not auto:
+            self.peak_memory_label.SetLabel('')
+        self.update_auto_parallel()
+
+    def update_auto_parallel(self):
+        """Choose the count of processes for the loaded tasks in auto mode."""
+        if not self.auto_parallel_checkbox.IsChecked() or self.task_data_view.df is None:
+            return
+        n_process, peak_memory = suggest_process_count(self.task_data_view.src_df)
+        self.parallel_input.SetValue(n_process)
+        self.peak_memory_label.SetLabel('Expected peak memory: {}'.format(format_memory(peak_memory)))
+        self.config_sub_panel.Layout()
+
     def on_select_bams(self, event):
         """Select BAMs callback."""
         assert event
@@ -195,12 +438,46 @@ class _ConfigPanel(LongRunningTaskIndicatorPanel):
         bam_names = [os.path.basename(path) for path in self.bam_paths]
         self.bams_input.SetValue('; '.join(bam_names))
 
+        # Sample the BAM files to fill in read layout and insert size.
+        self.preflight_pending = True
+        self.delegate.tasks_start_loading()
+        self.start_task()
+        self.handle_progress_msg('Sampling BAM files...')
+
+    def set_bam_layout(self, layout: BAMLayout):
+        """Fill in read layout and insert size estimated from BAM files."""
+        self.read_len_input.SetValue(layout.read_len)
+        self.pe_input.SetValue(layout.paired_end)
+        self.se_input.SetValue(not layout.paired_end)
+        if layout.insert_size_mean is not None:
+            self.insert_size_mean_input.SetValue('{:.1f}'.format(layout.insert_size_mean))
+            self.insert_size_std_input.SetValue('{:.1f}'.format(layout.insert_size_std))
+        self.update_resume_mode()
+
     def on_seq_type_changed(self, event):
         """Sequence type changed callback."""
         assert event
-        pe = self.pe_input.GetValue()
-        self.insert_size_mean_input.Enabled = pe
-        self.insert_size_std_input.Enabled = pe
+        self.update_resume_mode()
+
+
+class InferencePanelDelegate:
+    """Inference panel delegate."""
+
+    def live_results_enabled(self) -> bool:
+        """If results of finished tasks should be sent while inference is running."""
+        return False
+
+    def inference_started(self, out_dir: str):
+        """Inference started."""
+        pass
+
+    def live_results_received(self, df_gene_level: pd.DataFrame, df_isoform_level: pd.DataFrame):
+        """Received results of finished tasks."""
+        pass
+
+    def inference_finished(self):
+        """Inference finished."""
+        pass
 
 
 class InferencePanel(LongRunningTaskProgressPanel, _ConfigPanelDelegate):
@@ -208,6 +485,15 @@ class InferencePanel(LongRunningTaskProgressPanel, _ConfigPanelDelegate):
 
     Attributes:
         config_panel: Annotation panel.
+        follow_check: Follow checkbox, to scroll to the task whose status changed last.
+        delegate: The delegate object.
+        progress_offset: The count of tasks of the running inference which were finished before.
+        n_process: The count of processes of the running inference.
+        dispatch_order: Task IDs in the order to dispatch of the running inference.
+        task_start_times: Start time of the running tasks.
+        task_durations: Measured durations in seconds of the finished tasks.
+        throughput: Throughput and ETA estimator of the running inference.
+        eta_label: The label for the throughput and ETA.
     """
 
     def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
@@ -220,12 +506,21 @@ class InferencePanel(LongRunningTaskProgressPanel, _ConfigPanelDelegate):
         # Output.
         out_label = wx.StaticText(self, label='Output Directory:')
         self.out_dir_picker = wx.DirPickerCtrl(self)
+        self.out_dir_picker.Bind(wx.EVT_DIRPICKER_CHANGED, self.on_out_dir_changed)
+
+        self.follow_check = wx.CheckBox(self, label='Follow')
+        self.follow_check.SetValue(True)
+        self.follow_check.SetToolTip('Scroll to the task whose status changed last.')
+        self.follow_check.Bind(wx.EVT_CHECKBOX, self.on_follow_checked)
+
+        self.eta_label = wx.StaticText(self, style=wx.ALIGN_RIGHT)
 
         # Output row.
         output_sizer = wx.BoxSizer(wx.HORIZONTAL)
         output_sizer.Add(out_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         output_sizer.Add(self.out_dir_picker, 1, wx.ALL, 5)
         output_sizer.AddStretchSpacer(1)
+        output_sizer.Add(self.follow_check, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         output_sizer.Add(self.start_button, 0, wx.ALL | wx.EXPAND, 5)
         output_sizer.Add(self.stop_button, 0, wx.ALL | wx.EXPAND, 5)
 
@@ -234,21 +529,86 @@ class InferencePanel(LongRunningTaskProgressPanel, _ConfigPanelDelegate):
         sizer.Add(wx.StaticLine(self), 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 5)
         sizer.Add(output_sizer, 0, wx.ALL | wx.EXPAND, 0)
         sizer.Add(self.progress_bar, 0, wx.ALL | wx.EXPAND, 5)
-        sizer.Add(self.progress_label, 0, wx.ALL | wx.EXPAND, 5)
+        progress_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        progress_sizer.Add(self.progress_label, 1, wx.ALL | wx.EXPAND, 0)
+        progress_sizer.Add(self.eta_label, 0, wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
+        sizer.Add(progress_sizer, 0, wx.ALL | wx.EXPAND, 5)
 
         self.SetSizerAndFit(sizer)
 
         self.add_disabling_elements([self.config_panel.config_sub_panel, self.out_dir_picker])
 
+        self.delegate = None  # type: Optional[InferencePanelDelegate]
+
+        self.progress_offset = 0
+        self.n_process = 1
+        self.dispatch_order = []  # type: List[str]
+        self.task_start_times = {}  # type: Dict[str, float]
+        self.task_durations = {}  # type: Dict[str, float]
+        self.throughput = None  # type: Optional[ThroughputEstimator]
+
+    def set_delegate(self, delegate: InferencePanelDelegate):
+        """Set delegate."""
+        self.delegate = delegate
+
+    def on_follow_checked(self, event):
+        """Follow checked callback."""
+        assert event
+        self.config_panel.task_data_view.follow = self.follow_check.IsChecked()
+
+    def on_out_dir_changed(self, event):
+        """Output directory changed callback."""
+        assert event
+        n_finished = self.scan_out_dir()
+        if n_finished is not None:
+            self.handle_progress_msg('{} tasks are finished in the output directory.'.format(n_finished))
+
+    def scan_out_dir(self) -> Optional[int]:
+        """Scan the output directory for finished tasks, and switch to resume mode if it holds an inference.
+
+        Returns:
+            The count of finished tasks, None if the directory holds no inference.
+        """
+        config_panel = self.config_panel
+        out_dir = self.out_dir_picker.GetPath()
+        resumable = os.path.isdir(out_dir) and is_resumable(out_dir)
+        config_panel.resume_checkbox.SetValue(resumable)
+        config_panel.update_resume_mode()
+        if not resumable:
+            config_panel.set_finished_tasks(set())
+            return None
+
+        task_ids = set(finished_task_ids(out_dir))
+        config_panel.set_finished_tasks(task_ids)
+
+        # Load tasks of the inference.
+        anno_path = annotation_path(out_dir)
+        if anno_path is not None and os.path.normpath(config_panel.task_dir_input.GetPath()) != anno_path:
+            config_panel.task_dir_input.SetPath(anno_path)
+            config_panel.load_tasks()
+        return len(task_ids)
+
+    def on_timer(self, event):
+        super().on_timer(event)
+        self.config_panel.task_data_view.flush_status_changes()
+
+    def start_task(self):
+        if self.delegate is not None:
+            self.delegate.inference_started(self.out_dir_picker.GetPath())
+        super().start_task()
+
     def provide_tool(self):
         config_panel = self.config_panel
+        config_panel.update_auto_parallel()
         resume_mode = config_panel.resume_checkbox.GetValue()
+        live_stats = self.delegate is not None and self.delegate.live_results_enabled()
         if resume_mode:
             tool = 'resume'
             params = {
                 'out_dir': self.out_dir_picker.GetPath(),
                 'process': config_panel.parallel_input.GetValue(),
-                'count': None
+                'count': None,
+                'live_stats': live_stats
             }
         else:
             tool = 'inference'
@@ -262,29 +622,101 @@ class InferencePanel(LongRunningTaskProgressPanel, _ConfigPanelDelegate):
                 'insert_size_std': float(config_panel.insert_size_std_input.GetValue()) if pe else None,
                 'out_dir': self.out_dir_picker.GetPath(),
                 'process': config_panel.parallel_input.GetValue(),
-                'count': None
+                'count': None,
+                'live_stats': live_stats
             }
 
-        self.progress_bar.SetRange(config_panel.task_data_view.df.shape[0])
+        # Dispatch the longest tasks first, with costs refined by durations measured in previous runs.
+        df_tasks = config_panel.task_data_view.src_df
+        costs = refined_task_costs(df_tasks, load_durations(self.out_dir_picker.GetPath(),
+                                                            config_panel.task_dir_input.GetPath()))
+        self.dispatch_order = dispatch_order(df_tasks, costs)
+        params['order'] = self.dispatch_order
+
+        # Only run the selected or filtered tasks.
+        task_ids = config_panel.subset_task_ids()
+        params['task_ids'] = task_ids
+
+        self.n_process = params['process']
+        self.task_start_times = {}
+        self.task_durations = {}
+
+        run_task_ids = set(df_tasks['Task ID'].tolist() if task_ids is None else task_ids)
+        finished = config_panel.finished_task_ids if resume_mode else set()
+        task_costs = dict(zip(df_tasks['Task ID'].tolist(), costs.tolist()))
+        self.throughput = ThroughputEstimator({task_id: task_costs[task_id] for task_id in run_task_ids - finished
+                                               if task_id in task_costs})
+        self.eta_label.SetLabel('')
+
+        # Progress starts from the finished tasks.
+        self.progress_offset = len(run_task_ids & finished)
+        self.progress_bar.SetRange(len(run_task_ids))
+        self.progress_bar.SetValue(self.progress_offset)
 
         return tool, params
 
     def handle_progress(self, progress):
         super().handle_progress(progress)
         assert isinstance(progress, int)
-        self.progress_bar.SetValue(progress)
+        self.progress_bar.SetValue(self.progress_offset + progress)
 
     def handle_data(self, data):
         process_type, task_id = data
+        if process_type == 'live stats':
+            if self.delegate is not None:
+                self.delegate.live_results_received(*data[1])
+            return
         if process_type == 'process_start':
             status = 'Processing'
+            self.task_start_times[task_id] = time.time()
         else:
             assert process_type == 'process_end'
             status = 'Done'
+            if task_id in self.task_start_times:
+                self.task_durations[task_id] = time.time() - self.task_start_times.pop(task_id)
+            self.throughput.task_finished(task_id)
+            self.update_eta_label()
         self.config_panel.task_data_view.set_task_status(task_id, status)
 
+    def handle_task_finished(self):
+        super().handle_task_finished()
+        self._report_durations()
+        self.scan_out_dir()
+        if self.delegate is not None:
+            self.delegate.inference_finished()
+
+    def update_eta_label(self):
+        """Update the label for the throughput and ETA."""
+        throughput = self.throughput.throughput()
+        eta = self.throughput.eta()
+        if throughput is None or eta is None:
+            return
+        self.eta_label.SetLabel('{:.2f} tasks/min, ETA {}'.format(throughput, format_duration(eta)))
+        self.Layout()
+
+    def _report_durations(self):
+        """Store measured task durations, and report the wall-clock time saved by the dispatch order."""
+        if len(self.task_durations) == 0:
+            return
+        df_tasks = self.config_panel.task_data_view.src_df
+        run_path = store_durations(self.out_dir_picker.GetPath(), df_tasks, self.task_durations)
+        try:
+            store_task_dir_durations(self.config_panel.task_dir_input.GetPath(), run_path)
+        except OSError as e:
+            self.log_text_field.AppendText('Fail to store task durations in the task directory: {}\n'.format(e))
+
+        # Replay the measured durations in database order and in the dispatch order.
+        database_order = [self.task_durations[task_id] for task_id in df_tasks['Task ID'].tolist()
+                          if task_id in self.task_durations]
+        cost_order = [self.task_durations[task_id] for task_id in self.dispatch_order
+                      if task_id in self.task_durations]
+        saved = makespan(database_order, self.n_process) - makespan(cost_order, self.n_process)
+        self.log_text_field.AppendText('Cost-ordered dispatch saved about {:.0f} seconds of wall-clock time '
+                                       'over database order ({} tasks, {} processes).\n'.format(
+                                           saved, len(cost_order), self.n_process))
+
     def tasks_start_loading(self):
         self.start_button.Enabled = False
 
     def tasks_loaded(self):
-        self.start_button.Enabled = True
+        self.start_button.Enabled = self.config_panel.task_data_view.df is not None
@@ -16,6 +16,7 @@
 # Author: Lili Dong
 #
 
+import queue
 import multiprocessing as mp
 from typing import Tuple, Optional
 from enum import Enum
@@ -62,6 +63,7 @@ class QueueMessageCenter(MessageCenter):
     Attributes:
         _instruction_queue: The queue to receive instructions.
         _input_queue: The queue to transport input.
+        _background_input_queue: The queue to transport input of low-priority background work.
         _output_queue: The queue to transport output messages and data.
     """
 
@@ -69,6 +71,7 @@ class QueueMessageCenter(MessageCenter):
         super().__init__(level, log_path)
         self._instruction_queue = mp.Queue()
         self._input_queue = mp.Queue()
+        self._background_input_queue = mp.Queue()
         self._output_queue = mp.Queue()
 
     def _handle_log(self, log):
@@ -100,6 +103,27 @@ class QueueMessageCenter(MessageCenter):
         item = self._input_queue.get()  # type: InputItem
         return item.tool, item.params
 
+    def poll_input(self, timeout: float) -> Optional[Tuple[str, dict]]:
+        """Receive input tool and params, None if no input within the timeout."""
+        try:
+            item = self._input_queue.get(timeout=timeout)  # type: InputItem
+        except queue.Empty:
+            return None
+        return item.tool, item.params
+
+    def send_background_input(self, tool: str, params: dict):
+        """Send input of background work, which replaces background work not started yet or running."""
+        self._background_input_queue.put(InputItem(tool=tool, params=params))
+
+    def receive_background_input(self) -> Optional[Tuple[str, dict]]:
+        """Receive the latest input of background work."""
+        item = None
+        while not self._background_input_queue.empty():
+            item = self._background_input_queue.get()  # type: InputItem
+        if item is None:
+            return None
+        return item.tool, item.params
+
     def receive_output(self) -> Optional[OutputItem]:
         """Receive output."""
         if self._output_queue.empty():
@@ -107,6 +131,13 @@ class QueueMessageCenter(MessageCenter):
         item = self._output_queue.get()
         return item
 
+    def poll_output(self, timeout: float) -> Optional[OutputItem]:
+        """Receive output, None if no output within the timeout."""
+        try:
+            return self._output_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
     def send_instruction(self, instruction: Instruction):
         self._instruction_queue.put(instruction)
 
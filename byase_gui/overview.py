@@ -0,0 +1,162 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from typing import List, Tuple, Callable, Union
+
+import numpy as np
+
+from .result_store import ColumnStore, FrameTable, CHUNK_SIZE
+
+
+_CACHE_FILENAME = 'overview-{}.npz'
+
+
+class Histogram2D:
+    """2-D histogram of the difference mean and the HPD width of an allele pair.
+
+    Attributes:
+        mean_col: The name of the difference mean column.
+        hpd_col: The name of the HPD width column.
+        mean_edges: Bin edges of means.
+        hpd_edges: Bin edges of HPD widths.
+        counts: Gene counts of bins, indexed by mean bin and HPD bin.
+    """
+
+    def __init__(self, mean_col: str, hpd_col: str, mean_edges: np.ndarray, hpd_edges: np.ndarray,
+                 counts: np.ndarray):
+        self.mean_col = mean_col
+        self.hpd_col = hpd_col
+        self.mean_edges = mean_edges
+        self.hpd_edges = hpd_edges
+        self.counts = counts
+
+    @property
+    def label(self) -> str:
+        """The label of the allele pair, as the mean column without "Mean"."""
+        return self.mean_col[:-len('Mean')].strip()
+
+    @property
+    def bins(self) -> int:
+        """The count of bins of each axis."""
+        return self.counts.shape[0]
+
+
+def overview_pairs(columns: List[str]) -> List[Tuple[int, int]]:
+    """Positions of difference mean columns, paired with the HPD width columns of the same allele pair.
+
+    The HPD width column is matched by the label of the allele pair. Renamed HPD width columns drop
+    the label, then the one written right after the mean column is taken. Pairs without an HPD width
+    column are left out.
+    """
+    pairs = []
+    for n, col in enumerate(columns):
+        if '&' not in col or not col.endswith('Mean'):
+            continue
+        label = col[:-len('Mean')].strip()
+        hpd_cols = [m for m, hpd_col in enumerate(columns) if 'HPD' in hpd_col and hpd_col.startswith(label)]
+        if len(hpd_cols) == 0 and n + 1 < len(columns) and columns[n + 1].startswith('95% HPD'):
+            hpd_cols = [n + 1]
+        if len(hpd_cols) > 0:
+            pairs.append((n, hpd_cols[0]))
+    return pairs
+
+
+def _finite_range(data) -> Tuple[float, float]:
+    """The range of finite values, over chunks."""
+    lo, hi = np.inf, -np.inf
+    for start in range(0, data.shape[0], CHUNK_SIZE):
+        chunk = np.asarray(data[start:start + CHUNK_SIZE], dtype=float)
+        chunk = chunk[np.isfinite(chunk)]
+        if chunk.shape[0] > 0:
+            lo, hi = min(lo, chunk.min()), max(hi, chunk.max())
+    if lo > hi:
+        return 0.0, 1.0
+    if lo == hi:
+        return lo, lo + 1.0
+    return float(lo), float(hi)
+
+
+def _bin_index(edges: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Bins of values, the last bin includes its upper edge, as `bin_filter` selects them."""
+    return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, edges.shape[0] - 2)
+
+
+def histogram2d(table: Union[ColumnStore, FrameTable], mean_col: int, hpd_col: int, bins: int) -> Histogram2D:
+    """Count genes into bins of the difference mean and the HPD width, over column chunks.
+
+    Genes missing either value are not counted.
+    """
+    mean_data = table.column_at(mean_col)
+    hpd_data = table.column_at(hpd_col)
+    mean_edges = np.linspace(*_finite_range(mean_data), bins + 1)
+    hpd_edges = np.linspace(*_finite_range(hpd_data), bins + 1)
+
+    counts = np.zeros(bins * bins, dtype=np.int64)
+    for start in range(0, table.n_rows, CHUNK_SIZE):
+        mean = np.asarray(mean_data[start:start + CHUNK_SIZE], dtype=float)
+        hpd = np.asarray(hpd_data[start:start + CHUNK_SIZE], dtype=float)
+        valid = np.isfinite(mean) & np.isfinite(hpd)
+        idx = _bin_index(mean_edges, mean[valid]) * bins + _bin_index(hpd_edges, hpd[valid])
+        counts += np.bincount(idx, minlength=bins * bins)
+
+    return Histogram2D(table.columns[mean_col], table.columns[hpd_col], mean_edges, hpd_edges,
+                       counts.reshape(bins, bins))
+
+
+def overview_histograms(table: Union[ColumnStore, FrameTable], bins: int) -> List[Histogram2D]:
+    """Histograms of all allele pairs."""
+    return [histogram2d(table, mean_col, hpd_col, bins) for mean_col, hpd_col in overview_pairs(table.columns)]
+
+
+def bin_filter(edges: np.ndarray, start: int, stop: int) -> Callable:
+    """Filter of the values in bins from start to stop exclusive, over column chunks."""
+    lo = edges[start]
+    hi = edges[stop]
+    if stop == edges.shape[0] - 1:
+        return lambda x: (x >= lo) & (x <= hi)
+    return lambda x: (x >= lo) & (x < hi)
+
+
+def load_overview(args) -> List[Histogram2D]:
+    """Histograms of an on-disk gene-level table, cached in the directory of the table.
+
+    The directory is rebuilt whenever the stats change, which drops the cache with it.
+    """
+    store_dir = args['store_dir']
+    bins = args['bins']
+    table = ColumnStore(store_dir)
+    cache_path = os.path.join(store_dir, _CACHE_FILENAME.format(bins))
+    pairs = overview_pairs(table.columns)
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return [Histogram2D(table.columns[mean_col], table.columns[hpd_col], cached['mean_edges_{}'.format(n)],
+                                cached['hpd_edges_{}'.format(n)], cached['counts_{}'.format(n)])
+                    for n, (mean_col, hpd_col) in enumerate(pairs)]
+
+    histograms = overview_histograms(table, bins)
+    arrays = {}
+    for n, histogram in enumerate(histograms):
+        arrays['mean_edges_{}'.format(n)] = histogram.mean_edges
+        arrays['hpd_edges_{}'.format(n)] = histogram.hpd_edges
+        arrays['counts_{}'.format(n)] = histogram.counts
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, cache_path)
+    return histograms
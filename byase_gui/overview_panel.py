@@ -0,0 +1,390 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+from typing import Optional, List, Tuple, Dict, Callable, Union
+
+import numpy as np
+import wx
+
+from .message import QueueMessageCenter
+from .long_running import LongRunningTaskIndicatorPanel
+from .result_store import ColumnStore, FrameTable
+from .overview import Histogram2D, overview_histograms, bin_filter
+
+
+_BINS_CHOICES = [16, 32, 64, 128]
+_DEFAULT_BINS = 64
+
+# Margins of the plot area, left, top, right, bottom.
+_MARGINS = (60, 10, 10, 40)
+
+_SELECTION_COLOR = wx.Colour(220, 40, 40)
+
+
+def _bin_color(count: int, max_count: int) -> wx.Colour:
+    """Color of a bin, from light to dark blue by log count."""
+    t = np.log1p(count) / np.log1p(max_count)
+    return wx.Colour(int(230 - 200 * t), int(240 - 150 * t), int(255 - 95 * t))
+
+
+class OverviewPanelDelegate:
+    """Overview panel delegate, which provides the results and applies filters of brushed bins."""
+
+    def overview_table(self) -> Tuple[Optional[Union[ColumnStore, FrameTable]], Optional[str]]:
+        """The gene-level table of the loaded results, and its on-disk directory if it is stored."""
+        pass
+
+    def filter_bins(self, filters: Dict[str, Optional[Callable]]):
+        """Apply filters of brushed bins by column name, None removes the filter of a column."""
+        pass
+
+
+class HistogramView(wx.Panel):
+    """View of a 2-D histogram, where bins are brushed by dragging.
+
+    Drawing costs the count of bins, whatever the count of genes.
+
+    Attributes:
+        histogram: The histogram.
+        selection: The brushed bins, start and stop of mean bins and HPD bins.
+        drag_start: The bin where dragging started.
+        on_brushed: Callback when bins are brushed.
+        on_hover: Callback with the text of the bin under the mouse.
+    """
+
+    def __init__(self, parent, on_brushed: Callable, on_hover: Callable[[str], None]):
+        super().__init__(parent, style=wx.FULL_REPAINT_ON_RESIZE)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.SetMinSize((400, 300))
+
+        self.histogram = None  # type: Optional[Histogram2D]
+        self.selection = None  # type: Optional[Tuple[int, int, int, int]]
+        self.drag_start = None  # type: Optional[Tuple[int, int]]
+        self.on_brushed = on_brushed
+        self.on_hover = on_hover
+
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LEFT_UP, self.on_left_up)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+
+    def set_histogram(self, histogram: Optional[Histogram2D]):
+        """Set histogram, the selection is cleared."""
+        self.histogram = histogram
+        self.selection = None
+        self.drag_start = None
+        self.Refresh()
+
+    def _plot_rect(self) -> wx.Rect:
+        """The plot area."""
+        w, h = self.GetClientSize()
+        left, top, right, bottom = _MARGINS
+        return wx.Rect(left, top, max(1, w - left - right), max(1, h - top - bottom))
+
+    def _bin_at(self, pos: wx.Point, clip: bool) -> Optional[Tuple[int, int]]:
+        """The mean bin and HPD bin at a position, None if outside the plot area unless clipped."""
+        rect = self._plot_rect()
+        bins = self.histogram.bins
+        i = (pos.x - rect.x) * bins // rect.width
+        j = (rect.y + rect.height - pos.y) * bins // rect.height
+        if not clip and not (0 <= i < bins and 0 <= j < bins):
+            return None
+        return min(max(i, 0), bins - 1), min(max(j, 0), bins - 1)
+
+    def on_paint(self, event):
+        """Paint callback."""
+        assert event
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        rect = self._plot_rect()
+        dc.SetPen(wx.Pen(wx.Colour(160, 160, 160)))
+        dc.SetBrush(wx.WHITE_BRUSH)
+        dc.DrawRectangle(rect)
+        if self.histogram is None:
+            return
+
+        # Bins, the HPD width grows upwards.
+        bins = self.histogram.bins
+        counts = self.histogram.counts
+        max_count = max(1, int(counts.max()))
+        xs = [rect.x + rect.width * n // bins for n in range(bins + 1)]
+        ys = [rect.y + rect.height - rect.height * n // bins for n in range(bins + 1)]
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        for i, j in zip(*np.nonzero(counts)):
+            dc.SetBrush(wx.Brush(_bin_color(counts[i, j], max_count)))
+            dc.DrawRectangle(xs[i], ys[j + 1], xs[i + 1] - xs[i], ys[j] - ys[j + 1])
+
+        # Axes.
+        dc.SetTextForeground(self.GetForegroundColour())
+        for n in [0, bins // 2, bins]:
+            text = '{:.2f}'.format(self.histogram.mean_edges[n])
+            tw, th = dc.GetTextExtent(text)
+            dc.DrawText(text, min(max(xs[n] - tw // 2, 0), self.GetClientSize()[0] - tw), rect.y + rect.height + 2)
+            text = '{:.2f}'.format(self.histogram.hpd_edges[n])
+            tw, th = dc.GetTextExtent(text)
+            dc.DrawText(text, rect.x - tw - 4, min(max(ys[n] - th // 2, 0), rect.y + rect.height - th))
+        text = 'Difference {} Mean'.format(self.histogram.label)
+        tw, th = dc.GetTextExtent(text)
+        dc.DrawText(text, rect.x + (rect.width - tw) // 2, rect.y + rect.height + th + 4)
+        text = self.histogram.hpd_col
+        tw, th = dc.GetTextExtent(text)
+        dc.DrawRotatedText(text, 2, rect.y + (rect.height + tw) // 2, 90)
+
+        if self.selection is not None:
+            i0, i1, j0, j1 = self.selection
+            dc.SetPen(wx.Pen(_SELECTION_COLOR, 2))
+            dc.SetBrush(wx.TRANSPARENT_BRUSH)
+            dc.DrawRectangle(xs[i0], ys[j1], xs[i1] - xs[i0], ys[j0] - ys[j1])
+
+    def _update_selection(self, pos: wx.Point):
+        """Select bins between the drag start and the position."""
+        i, j = self._bin_at(pos, clip=True)
+        si, sj = self.drag_start
+        self.selection = (min(i, si), max(i, si) + 1, min(j, sj), max(j, sj) + 1)
+        self.Refresh()
+
+    def on_left_down(self, event: wx.MouseEvent):
+        """Start brushing."""
+        if self.histogram is None:
+            return
+        self.drag_start = self._bin_at(event.GetPosition(), clip=False)
+        if self.drag_start is None:
+            return
+        self.CaptureMouse()
+        self._update_selection(event.GetPosition())
+
+    def on_motion(self, event: wx.MouseEvent):
+        """Extend brushing while dragging, or show the bin under the mouse."""
+        if self.histogram is None:
+            return
+        if self.drag_start is not None and event.Dragging():
+            self._update_selection(event.GetPosition())
+            return
+        n = self._bin_at(event.GetPosition(), clip=False)
+        if n is None:
+            self.on_hover('')
+            return
+        i, j = n
+        h = self.histogram
+        self.on_hover('Mean [{:.3f}, {:.3f}], HPD width [{:.3f}, {:.3f}]: {} genes'.format(
+            h.mean_edges[i], h.mean_edges[i + 1], h.hpd_edges[j], h.hpd_edges[j + 1], h.counts[i, j]))
+
+    def on_left_up(self, event: wx.MouseEvent):
+        """Finish brushing."""
+        assert event
+        if self.drag_start is None:
+            return
+        if self.HasCapture():
+            self.ReleaseMouse()
+        self.drag_start = None
+        self.on_brushed()
+
+
+class OverviewPanel(LongRunningTaskIndicatorPanel):
+    """Panel of the distribution of difference means and HPD widths over all genes.
+
+    Genes are counted into 2-D bins, so the cost of display depends on the count of bins rather than genes.
+    Histograms of stored results are computed by the backend and cached next to the result store.
+
+    Attributes:
+        loading_panel: Loading panel.
+        pair_input: Allele pair input.
+        bins_input: The count of bins input.
+        clear_button: Clear brushed bins button.
+        info_label: The label of the bin under the mouse, or the status.
+        status_text: The count of genes, or the brushed bins.
+        histogram_view: Histogram view.
+        histograms: Histograms of allele pairs.
+        source: The table which histograms are computed from, its fingerprint, and the count of its rows and bins.
+        pending_source: The source whose histograms are being computed by the backend.
+        store_dir: The directory of the stored table whose histograms are computed by the backend.
+        brushed_cols: Columns filtered by brushed bins.
+        delegate: The delegate object.
+    """
+
+    def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
+        super().__init__(parent, mc, log_text_field)
+
+        self.histograms = []  # type: List[Histogram2D]
+        self.source = None  # type: Optional[tuple]
+        self.pending_source = None  # type: Optional[tuple]
+        self.store_dir = None  # type: Optional[str]
+        self.brushed_cols = []  # type: List[str]
+        self.status_text = ''
+        self.delegate = None  # type: Optional[OverviewPanelDelegate]
+
+        self.loading_panel = wx.Panel(self)
+
+        pair_label = wx.StaticText(self.loading_panel, label='Alleles:')
+        self.pair_input = wx.Choice(self.loading_panel)
+        self.pair_input.Bind(wx.EVT_CHOICE, self.on_pair_changed)
+
+        bins_label = wx.StaticText(self.loading_panel, label='Bins:')
+        self.bins_input = wx.Choice(self.loading_panel, choices=[str(bins) for bins in _BINS_CHOICES])
+        self.bins_input.SetSelection(_BINS_CHOICES.index(_DEFAULT_BINS))
+        self.bins_input.Bind(wx.EVT_CHOICE, self.on_bins_changed)
+
+        self.clear_button = wx.Button(self.loading_panel, label='Clear Filter')
+        self.clear_button.SetToolTip('Remove the filters of brushed bins from the results.')
+        self.clear_button.Bind(wx.EVT_BUTTON, self.on_clear_button)
+        self.clear_button.Enabled = False
+
+        self.histogram_view = HistogramView(self.loading_panel, self.on_brushed, self.on_hover)
+        self.info_label = wx.StaticText(self.loading_panel)
+
+        control_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        control_sizer.Add(pair_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        control_sizer.Add(self.pair_input, 0, wx.ALL, 5)
+        control_sizer.Add(bins_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        control_sizer.Add(self.bins_input, 0, wx.ALL, 5)
+        control_sizer.AddStretchSpacer(1)
+        control_sizer.Add(self.clear_button, 0, wx.ALL, 5)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(control_sizer, 0, wx.ALL | wx.EXPAND, 0)
+        sizer.Add(self.histogram_view, 1, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(self.info_label, 0, wx.ALL | wx.EXPAND, 5)
+        self.loading_panel.SetSizerAndFit(sizer)
+
+        loading_sizer = self.create_loading_sizer()
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(loading_sizer, 1, wx.ALL | wx.EXPAND, 0)
+        self.SetSizerAndFit(sizer)
+
+        self.Bind(wx.EVT_SHOW, self.on_show)
+
+    def loading_widget(self):
+        return self.loading_panel
+
+    def set_delegate(self, delegate: OverviewPanelDelegate):
+        """Set delegate."""
+        self.delegate = delegate
+
+    @property
+    def bins(self) -> int:
+        """The selected count of bins."""
+        return _BINS_CHOICES[self.bins_input.GetSelection()]
+
+    def on_show(self, event: wx.ShowEvent):
+        """Shown callback, histograms follow the loaded results."""
+        event.Skip()
+        if event.IsShown():
+            self.update_histograms()
+
+    def update_histograms(self):
+        """Compute histograms if the loaded results or the bins changed."""
+        if self.delegate is None or not self.IsEnabled():
+            return
+        table, store_dir = self.delegate.overview_table()
+        # Stats rebuilt into the same store directory change the fingerprint of the store.
+        fingerprint = table.source if isinstance(table, ColumnStore) else None
+        source = None if table is None else (store_dir or id(table), fingerprint, table.n_rows, self.bins)
+        if source == self.source:
+            return
+
+        if table is None:
+            self.source = source
+            self.set_histograms([])
+        elif store_dir is not None:
+            # The source is set once the histograms arrive, so it is computed again if the backend failed.
+            self.pending_source = source
+            self.store_dir = store_dir
+            self.start_task()
+        else:
+            # Live or compared results are in memory, binning them is as cheap as passing them to the backend.
+            self.source = source
+            self.set_histograms(overview_histograms(table, self.bins))
+
+    def provide_tool(self):
+        tool = 'overview'
+        params = {
+            'store_dir': self.store_dir,
+            'bins': self.bins
+        }
+        return tool, params
+
+    def handle_data(self, data):
+        key, val = data
+        if key == 'overview':
+            self.source = self.pending_source
+            self.set_histograms(val)
+
+    def set_histograms(self, histograms: List[Histogram2D]):
+        """Set histograms of allele pairs, and show the selected pair."""
+        selected = self.pair_input.GetStringSelection()
+        self.histograms = histograms
+        labels = [histogram.label for histogram in histograms]
+        self.pair_input.Set(labels)
+        if len(labels) > 0:
+            self.pair_input.SetSelection(labels.index(selected) if selected in labels else 0)
+        self.show_histogram()
+
+    def show_histogram(self):
+        """Show the histogram of the selected pair."""
+        n = self.pair_input.GetSelection()
+        self.histogram_view.set_histogram(self.histograms[n] if n != wx.NOT_FOUND else None)
+        if n == wx.NOT_FOUND:
+            self.set_status('No difference means and HPD widths are loaded.')
+        else:
+            total = int(self.histograms[n].counts.sum())
+            self.set_status('{} genes. Drag over bins to filter the results.'.format(total))
+
+    def set_status(self, text: str):
+        """Set the status, which is shown unless the mouse is over a bin."""
+        self.status_text = text
+        self.info_label.SetLabel(text)
+
+    def on_pair_changed(self, event):
+        """Allele pair changed callback."""
+        assert event
+        self.show_histogram()
+
+    def on_bins_changed(self, event):
+        """Bins changed callback."""
+        assert event
+        self.update_histograms()
+
+    def on_hover(self, text: str):
+        """Show the bin under the mouse."""
+        if self.histogram_view.drag_start is None:
+            self.info_label.SetLabel(text or self.status_text)
+
+    def on_brushed(self):
+        """Filter the results by the brushed bins."""
+        histogram = self.histogram_view.histogram
+        i0, i1, j0, j1 = self.histogram_view.selection
+        filters = {col: None for col in self.brushed_cols}
+        filters[histogram.mean_col] = bin_filter(histogram.mean_edges, i0, i1)
+        filters[histogram.hpd_col] = bin_filter(histogram.hpd_edges, j0, j1)
+        self.delegate.filter_bins(filters)
+        self.brushed_cols = [histogram.mean_col, histogram.hpd_col]
+        self.clear_button.Enabled = True
+        self.set_status('Results are filtered by Mean [{:.3f}, {:.3f}], HPD width [{:.3f}, {:.3f}]: '
+                        '{} genes.'.format(histogram.mean_edges[i0], histogram.mean_edges[i1],
+                                           histogram.hpd_edges[j0], histogram.hpd_edges[j1],
+                                           int(histogram.counts[i0:i1, j0:j1].sum())))
+
+    def on_clear_button(self, event):
+        """Clear filter button callback."""
+        assert event
+        self.delegate.filter_bins({col: None for col in self.brushed_cols})
+        self.brushed_cols = []
+        self.clear_button.Enabled = False
+        self.show_histogram()
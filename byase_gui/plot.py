@@ -0,0 +1,253 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import json
+from typing import Optional, List, Tuple
+
+import numpy as np
+import HTSeq
+import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+
+from byase.task.plot import TaskPlot, TaskPlotType, TaskFig
+
+from . import byase_plot
+
+
+PAYLOAD_FILENAME = 'plot.json'
+
+# Bins of coverage levels, the viewer picks the coarsest level with at least one bin per pixel.
+_COVERAGE_LEVELS = [256, 512, 1024, 2048, 4096]
+
+# The level written to the coverage path of the standalone HTML, about the original size of the figure.
+_DEFAULT_COVERAGE_LEVEL = 1024
+
+VIEWER_PATH = '{}/html/plot_viewer.html'.format(os.path.dirname(__file__))
+
+
+def bin_coverage(dense: np.ndarray, x_start: int, bins: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Min/max binned coverage of display coords from x_start, the bins are at most the coords.
+
+    Returns:
+        The bin edges, and the min and max coverage of each bin.
+    """
+    idx = np.linspace(0, dense.shape[0], bins + 1).astype(np.int64)
+    edges = idx + x_start - 0.5
+    return edges, np.minimum.reduceat(dense, idx[:-1]), np.maximum.reduceat(dense, idx[:-1])
+
+
+class _LevelsFig(TaskFig):
+    """Task figure saved once for each coverage level, with the coverage swapped in between."""
+
+    def __init__(self, fig_size):
+        super().__init__(fig_size, out_path='')
+
+    def save(self, out_path: str):
+        """Save the figure as it is drawn now."""
+        self.fig.savefig(out_path)
+        byase_plot.patch_svg(out_path)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fig.clear()
+        plt.close(self.fig)
+
+
+class ViewerTaskPlot(TaskPlot):
+    """Task plot for the plot viewer.
+
+    Besides the standalone HTML, the layout of the plots is written as a JSON payload, which the
+    viewer page renders without loading a new page. Rows and cells carry the same classes as
+    in the standalone HTML, so they are toggled by the same `update_plots` items.
+
+    Coverage is min/max binned into a pyramid of levels, so the size of a coverage plot is bounded
+    by the bins rather than the length of the gene.
+    """
+
+    @property
+    def payload_path(self) -> str:
+        """Path of the JSON payload."""
+        return os.path.join(self.out_dir, PAYLOAD_FILENAME)
+
+    def _generate_html(self):
+        super()._generate_html()
+
+        def _cell(_cls: str, _img_path: str):
+            return {'cls': _cls, 'src': os.path.basename(_img_path)}
+
+        def _cov_cell(_cls: str, _allele_num: Optional[int], _isoform_num: Optional[int]):
+            _cell_dict = _cell(_cls, byase_plot.coverage_path(self, _allele_num, _isoform_num))
+            _cell_dict['levels'] = [[bins, os.path.basename(path)]
+                                    for bins, path in self._coverage_levels(_allele_num, _isoform_num)]
+            return _cell_dict
+
+        assert self.plot_type is TaskPlotType.ASE
+        rows = []
+        for isoform_num in [None] + list(range(self.isoforms_count)):
+            cells = []
+            for allele_num in range(self.ploidy):
+                var = self.get_var_expression(allele_num=allele_num, iso_num=isoform_num)
+                cells.append(_cell('hist hist_{}'.format(allele_num), self._histogram_path(var)))
+                cells.append(_cov_cell('cov cov_{}'.format(allele_num), allele_num, isoform_num))
+
+            for i, j in self.delta_iterator(self.ploidy):
+                var = self.get_var_diff_expression(allele_num1=i, allele_num2=j, iso_num=isoform_num)
+                cells.append(_cell('diff diff_{}_{}'.format(i, j), self._histogram_path(var)))
+
+            rows.append({'cls': 'g' if isoform_num is None else 'i{}'.format(isoform_num), 'cells': cells})
+
+        with open(self.payload_path, 'w') as out:
+            json.dump({'rows': rows}, out, separators=(',', ':'))
+
+    def _x_lim(self) -> Tuple[int, int]:
+        """The range of display coords."""
+        iv = self.segment.iv
+        return byase_plot.display_coord(self, iv.start), byase_plot.display_coord(self, iv.end - 1)
+
+    def _coverage_levels(self, allele_num: Optional[int], isoform_num: Optional[int]) -> List[Tuple[int, str]]:
+        """Bins and paths of the coverage levels, the finest level holds one bin per display coord."""
+        x_start, x_end = self._x_lim()
+        n_coords = x_end - x_start + 1
+        base_path = byase_plot.coverage_path(self, allele_num, isoform_num)
+        levels = []
+        for bins in _COVERAGE_LEVELS:
+            bins = min(bins, n_coords)
+            if bins == _DEFAULT_COVERAGE_LEVEL or (bins == n_coords and n_coords < _DEFAULT_COVERAGE_LEVEL):
+                path = base_path
+            else:
+                path = '{}.L{}.svg'.format(os.path.splitext(base_path)[0], bins)
+            levels.append((bins, path))
+            if bins == n_coords:
+                break
+        return levels
+
+    def _dense_coverage(self, ga: HTSeq.GenomicArray) -> np.ndarray:
+        """Coverage of each display coord."""
+        x_start, x_end = self._x_lim()
+        dense = np.zeros(x_end - x_start + 1, dtype=np.int64)
+        for iv, v in ga.steps():
+            if v != 0:
+                s = byase_plot.display_coord(self, iv.start)
+                e = byase_plot.display_coord(self, iv.end - 1)
+                dense[s - x_start:e - x_start + 1] = v
+        return dense
+
+    def _plot_coverage(self, allele_num: Optional[int], isoform_num: Optional[int], y_lim: int):
+        """Plot coverage at each level.
+
+        The figure is drawn once, and only the coverage is swapped for each level before it is saved.
+        """
+        x_start, _ = self._x_lim()
+        dense = [self._dense_coverage(ga) for ga in byase_plot.coverage(self, allele_num, isoform_num).data]
+        with _LevelsFig(fig_size=(9, 3)) as levels_fig:
+            ax, colors, alphas = self._draw_coverage_frame(levels_fig.fig, allele_num, isoform_num, y_lim)
+            collections = []
+            for bins, out_path in self._coverage_levels(allele_num, isoform_num):
+                for collection in collections:
+                    collection.remove()
+                binned = [bin_coverage(coverage, x_start, bins) for coverage in dense]
+                collections = self._fill_binned_coverage(ax, allele_num, isoform_num, binned, colors, alphas)
+                if ax.get_legend() is None:
+                    ax.legend(loc='upper right', ncol=len(binned) + 1)
+                levels_fig.save(out_path)
+
+    def _draw_coverage_frame(self, fig, allele_num: Optional[int], isoform_num: Optional[int], y_lim: int) \
+            -> Tuple[Axes, List[str], List[float]]:
+        """Draw the isoform track and the coverage axes, which are shared by all levels.
+
+        Returns:
+            The coverage axes, and the colors and alphas of coverage.
+        """
+        x_start, x_end = self._x_lim()
+        x_lim = (x_start - 0.5, x_end + 0.5)
+
+        # Plot isoform.
+        ax = fig.add_axes([0.05, 0.05, 0.9, 0.1])
+        ax.set_axis_off()
+
+        if isoform_num is None:
+            exons = self.segment.get_all_exons()
+            snps = self.snps
+        else:
+            exons = self.segment.isoforms[isoform_num].exons
+            snps = self.isoform_snps(isoform_num=isoform_num)
+        exons = sorted(exons, key=lambda _iv: _iv.start)
+
+        prev_exon_end = None
+        for exon in exons:
+            s = byase_plot.display_coord(self, exon.start)
+            e = byase_plot.display_coord(self, exon.end - 1)
+            ax.add_patch(Rectangle((s, 0), e - s, 1, color=byase_plot.COLOR_GREY, linewidth=0, alpha=0.2))
+            if prev_exon_end is not None:
+                ax.add_line(Line2D([prev_exon_end, s], [0.5, 0.5], linestyle=':', color='C4', alpha=0.2))
+            prev_exon_end = e
+
+        if allele_num is not None:
+            for snp in snps:
+                x = byase_plot.display_coord(self, snp.pos)
+                ax.add_line(Line2D([x, x], [0, 1], color=byase_plot.nt_color(snp.alleles[allele_num]), alpha=0.6))
+
+        ax.set_xlim(x_lim)
+
+        # Plot coverage.
+        ax = fig.add_axes([0.05, 0.2, 0.9, 0.7])
+
+        if isoform_num is None:
+            title = self.segment.gene_name
+            colors = [byase_plot.COLOR_BLUE, byase_plot.COLOR_BROWN]
+            alphas = [0.8, 0.35]
+        elif allele_num is None:
+            title = '{} - {}'.format(self.segment.gene_name, self.segment.isoforms[isoform_num].name)
+            colors = [byase_plot.COLOR_GREEN, byase_plot.COLOR_BROWN]
+            alphas = [0.5, 0.35]
+        else:
+            title = self.segment.isoforms[isoform_num].name
+            colors = [byase_plot.COLOR_BLUE, byase_plot.COLOR_ORANGE, byase_plot.COLOR_GREEN, byase_plot.COLOR_RED]
+            alphas = [0.8, 0.65, 0.5, 0.35]
+        colors.append(byase_plot.COLOR_GREY)
+        alphas.append(0.2)
+
+        ax.set_xlim(x_lim)
+        ax.set_xticks([])
+        ax.set_ylim(0, y_lim)
+
+        ax.set_title(title, loc='left', fontsize=11)
+        return ax, colors, alphas
+
+    def _fill_binned_coverage(self, ax: Axes, allele_num: Optional[int], isoform_num: Optional[int], binned: list,
+                              colors: List[str], alphas: List[float]) -> list:
+        """Fill min/max binned coverage, the area up to the min is solid, and up to the max is lighter.
+
+        Returns:
+            The filled collections.
+        """
+        cov = byase_plot.coverage(self, allele_num, isoform_num)
+        collections = []
+        for i, (edges, cov_min, cov_max) in enumerate(binned):
+            # Steps over bins, with the value of a bin repeated at both of its edges.
+            x = np.repeat(edges, 2)[1:-1]
+            y_min = np.repeat(cov_min, 2)
+            y_max = np.repeat(cov_max, 2)
+            zorder = len(binned) - i
+            collections.append(ax.fill_between(x, 0, y_min, lw=0, color=colors[i], alpha=alphas[i], zorder=zorder,
+                                               label=cov.name(i)))
+            collections.append(ax.fill_between(x, y_min, y_max, lw=0, color=colors[i], alpha=alphas[i] * 0.5,
+                                               zorder=zorder))
+        return collections
@@ -0,0 +1,202 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from typing import Optional
+
+from byase.message import MessageCenter, ERROR
+from byase.annotation import AnnotationDB
+from byase.inference import InferenceTool
+from byase.result import ResultDB
+from byase.task.result import TaskResult
+from byase.task.plot import TaskPlotType, TaskPlotError
+
+from .result_dir import param_path, record_offsets
+from .plot import ViewerTaskPlot, PAYLOAD_FILENAME
+
+
+# Total size of cached plots, the least recently used plots are evicted beyond it.
+_CACHE_SIZE_LIMIT = 1024 ** 3
+
+# Temporary directories of plots being built are left behind when prefetching is cancelled,
+# and removed when older than the age in seconds.
+_TMP_MAX_AGE = 60 * 60
+
+_TMP_PREFIX = '.tmp-'
+
+
+def default_cache_dir() -> str:
+    """The plot cache directory of the user."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'byase-gui', 'plots')
+
+
+def _dir_size(path: str) -> int:
+    """Total size of files in a directory."""
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class PlotCache:
+    """On-disk LRU cache of task plots.
+
+    An entry is a directory of the plot payload, the standalone HTML and their images, named by the hash of the result
+    directory, the task ID and the fingerprint of the task result. The modification time of
+    an entry is its last use.
+
+    Attributes:
+        cache_dir: The cache directory.
+        size_limit: Total size of cached plots in bytes.
+    """
+
+    def __init__(self, cache_dir: str, size_limit: int = _CACHE_SIZE_LIMIT):
+        self.cache_dir = cache_dir
+        self.size_limit = size_limit
+
+    @staticmethod
+    def key(result_dir: str, task_id: str) -> Optional[str]:
+        """The cache key of a task plot, None if the task has no result.
+
+        The result database is append-only, so the offset of the task record changes whenever
+        the task is inferred again; the params file is rewritten whenever the directory is reused
+        for a fresh inference.
+        """
+        offset = record_offsets(result_dir).get(task_id)
+        if offset is None:
+            return None
+        fingerprint = '{}:{}'.format(offset, os.stat(param_path(result_dir)).st_mtime_ns)
+        key = '\0'.join([os.path.realpath(result_dir), task_id, fingerprint])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        """The directory of an entry."""
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """The cached plot payload path, None if missing."""
+        payload_path = os.path.join(self._entry_dir(key), PAYLOAD_FILENAME)
+        if not os.path.exists(payload_path):
+            return None
+        try:
+            os.utime(self._entry_dir(key))
+        except OSError:
+            return None
+        return payload_path
+
+    def store(self, key: str, plot_dir: str) -> str:
+        """Move a plot directory into the cache, and evict the least recently used entries."""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.rename(plot_dir, entry_dir)
+        os.utime(entry_dir)
+        self.evict(keep=key)
+        return os.path.join(entry_dir, PAYLOAD_FILENAME)
+
+    def tmp_dir(self) -> str:
+        """A temporary directory in the cache, to build a plot in."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return tempfile.mkdtemp(prefix=_TMP_PREFIX, dir=self.cache_dir)
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove the least recently used entries beyond the size limit."""
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            if not entry.name.startswith(_TMP_PREFIX):
+                entries.append((entry.stat().st_mtime, entry.name, _dir_size(entry.path)))
+            elif entry.stat().st_mtime < now - _TMP_MAX_AGE:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.size_limit:
+                break
+            if name == keep:
+                continue
+            # Moved aside first, so an interrupted removal never leaves a partial entry.
+            doomed = os.path.join(self.cache_dir, _TMP_PREFIX + name)
+            try:
+                os.rename(os.path.join(self.cache_dir, name), doomed)
+            except OSError:
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+
+
+def plot_task(args) -> str:
+    """Plot task through the plot cache, and return the path of the plot payload.
+
+    The cache directory defaults to the one of the user running the backend, which may be
+    on another host than the GUI.
+    """
+    result_dir = args['result_dir']
+    task_id = args['task_id']
+    mc = args['mc']  # type: MessageCenter
+
+    cache = PlotCache(args.get('cache_dir') or default_cache_dir())
+    key = PlotCache.key(result_dir, task_id)
+    if key is None:
+        raise TaskPlotError(task_id, 'The task has no result.')
+    payload_path = cache.lookup(key)
+    if payload_path is not None:
+        return payload_path
+
+    inference_tool = InferenceTool(result_dir, n_process=1, param=None, mc=mc)
+
+    with AnnotationDB(inference_tool.param.anno_path) as anno_db:
+        task = anno_db.get_task(task_id)
+
+    with ResultDB(inference_tool.result_path) as result_db:
+        record = result_db.load_record(task_id)
+
+    if not record.success:
+        raise TaskPlotError(task_id, 'The inference for the task failed.')
+
+    task_result = TaskResult(task, record.trace)
+
+    plot_dir = cache.tmp_dir()
+    try:
+        task_plot = ViewerTaskPlot(task, inference_tool.bam_param,
+                                   task_result.trace, record.trace_stats,
+                                   plot_dir, TaskPlotType.ASE, mc)
+        task_plot.plot()
+        return cache.store(key, plot_dir)
+    finally:
+        if os.path.exists(plot_dir):
+            shutil.rmtree(plot_dir, ignore_errors=True)
+
+
+def prefetch_plots(args):
+    """Plot tasks into the plot cache ahead of requests, at the lowest CPU priority.
+
+    Failures are ignored, the plot is built again when it is requested.
+    """
+    if hasattr(os, 'nice'):
+        os.nice(19)
+    mc = MessageCenter(level=ERROR)
+    for task_id in args['task_ids']:
+        try:
+            plot_task({'result_dir': args['result_dir'], 'task_id': task_id, 'cache_dir': args.get('cache_dir'),
+                       'mc': mc})
+        except Exception:
+            continue
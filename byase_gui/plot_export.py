@@ -0,0 +1,205 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import re
+import html
+import json
+import shutil
+from multiprocessing import Pool
+from typing import Optional, List, Tuple
+
+from byase.message import MessageCenter, ERROR
+
+from .message import QueueMessageCenter
+from .plot_cache import plot_task, default_cache_dir
+
+
+PLOT_FILENAME = 'plot.html'
+INDEX_FILENAME = 'index.html'
+
+_TMP_PREFIX = '.tmp-'
+
+_CSS = """<style>
+    body {
+        margin: 0;
+        font-family: sans-serif;
+    }
+    table {
+        border-collapse: collapse;
+    }
+    img {
+        vertical-align: bottom;
+    }
+    li {
+        margin: 4px;
+    }
+</style>
+"""
+
+
+class PlotExportError(Exception):
+    """Plot export exception."""
+    pass
+
+
+def _safe_name(name: str) -> str:
+    """A file name for a task ID."""
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+def _visible(cls: str, items: set) -> bool:
+    """If a cell is visible, which is when any of its classes is an item, as in `update_plots`."""
+    return any(c in items for c in cls.split())
+
+
+def write_static_plot(payload_path: str, out_dir: str, title: str, items: List[str], isoforms: bool, zoom: str):
+    """Write the visible plots of a payload as a static HTML page, with the images it shows.
+
+    Args:
+        payload_path: The plot payload.
+        out_dir: The output directory, which should exist.
+        title: The title of the page.
+        items: Classes of the visible cells, as the items of `update_plots`.
+        isoforms: If isoform rows are visible besides the gene row.
+        zoom: Width of images, empty for the original size.
+    """
+    src_dir = os.path.dirname(payload_path)
+    with open(payload_path) as f:
+        payload = json.load(f)
+
+    items = set(items)
+    img_style = ' style="width:{}"'.format(zoom) if zoom else ''
+    page = '<!DOCTYPE HTML>\n<html>\n<head>\n<meta charset="utf-8">\n'
+    page += '<title>{}</title>\n'.format(html.escape(title))
+    page += _CSS
+    page += '</head>\n<body>\n<table border="0" cellspacing="0" cellpadding="0">\n'
+    for row in payload['rows']:
+        if row['cls'] != 'g' and not isoforms:
+            continue
+        cells = [cell for cell in row['cells'] if _visible(cell['cls'], items)]
+        if len(cells) == 0:
+            continue
+        page += '<tr class="{}">\n'.format(row['cls'])
+        for cell in cells:
+            shutil.copyfile(os.path.join(src_dir, cell['src']), os.path.join(out_dir, cell['src']))
+            page += '<td class="{}"><img src="{}"{}/></td>\n'.format(cell['cls'], cell['src'], img_style)
+        page += '</tr>\n'
+    page += '</table>\n</body>\n</html>\n'
+
+    with open(os.path.join(out_dir, PLOT_FILENAME), 'w') as out:
+        out.write(page)
+
+
+def _export_plot(args: Tuple[dict, str, str]) -> Tuple[str, str, Optional[str]]:
+    """Export the plot of a task, in a process of the pool.
+
+    The plot is built into the plot cache, or reused from it, and copied to a temporary
+    directory which replaces the directory of the task at once, so a cancelled export
+    never leaves a partial plot behind.
+
+    Returns:
+        The task ID, the gene name, and the error message if failed.
+    """
+    params, task_id, gene_name = args
+    mc = MessageCenter(level=ERROR)
+    task_dir = os.path.join(params['out_dir'], _safe_name(task_id))
+    tmp_dir = os.path.join(params['out_dir'], _TMP_PREFIX + _safe_name(task_id))
+    try:
+        # The cache entry may be evicted by another process of the pool before it is copied.
+        for attempt in range(2):
+            payload_path = plot_task({'result_dir': params['result_dir'], 'task_id': task_id,
+                                      'cache_dir': params['cache_dir'], 'mc': mc})
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            try:
+                write_static_plot(payload_path, tmp_dir, '{} ({})'.format(gene_name, task_id),
+                                  params['items'], params['isoforms'], params['zoom'])
+            except FileNotFoundError:
+                if attempt == 1:
+                    raise
+            else:
+                break
+        shutil.rmtree(task_dir, ignore_errors=True)
+        os.rename(tmp_dir, task_dir)
+    except Exception as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return task_id, gene_name, str(e) or type(e).__name__
+    return task_id, gene_name, None
+
+
+def _remove_tmp_dirs(out_dir: str):
+    """Remove temporary directories of plots, which are left behind when the export is stopped."""
+    for entry in os.scandir(out_dir):
+        if entry.name.startswith(_TMP_PREFIX) and entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _write_index(out_dir: str, exported: List[Tuple[str, str]]):
+    """Write the index page of exported plots, in the order of tasks."""
+    page = '<!DOCTYPE HTML>\n<html>\n<head>\n<meta charset="utf-8">\n<title>BYASE Plots</title>\n'
+    page += _CSS
+    page += '</head>\n<body>\n<ol>\n'
+    for task_id, gene_name in exported:
+        page += '<li><a href="{}/{}">{}</a> ({})</li>\n'.format(
+            _safe_name(task_id), PLOT_FILENAME, html.escape(gene_name), html.escape(task_id))
+    page += '</ol>\n</body>\n</html>\n'
+    with open(os.path.join(out_dir, INDEX_FILENAME), 'w') as out:
+        out.write(page)
+
+
+def export_plots(args):
+    """Export plots of tasks as static HTML pages in a process pool, reusing the plot cache.
+
+    Each task is written to a directory named by its task ID in the output directory, and an
+    index page links the exported tasks.
+
+    Stopping the export kills the processes of the pool, which may leave temporary directories
+    behind, so they are removed when an export starts and when it ends.
+    """
+    mc = args['mc']  # type: QueueMessageCenter
+    task_ids = args['task_ids']  # type: List[str]
+    gene_names = args['gene_names']  # type: List[str]
+    out_dir = args['out_dir']
+
+    if args['result_dir'] is None or len(task_ids) == 0:
+        raise PlotExportError('No tasks to export, please load results of a result directory first.')
+    if not out_dir:
+        raise PlotExportError('Please select the output directory.')
+    os.makedirs(out_dir, exist_ok=True)
+    _remove_tmp_dirs(out_dir)
+
+    params = {key: args[key] for key in ['result_dir', 'out_dir', 'items', 'isoforms', 'zoom']}
+    params['cache_dir'] = args.get('cache_dir') or default_cache_dir()
+    jobs = [(params, task_id, gene_name) for task_id, gene_name in zip(task_ids, gene_names)]
+
+    mc.handle_progress('Exporting plots of {} tasks...'.format(len(jobs)), progress=0)
+    failed = set()
+    try:
+        with Pool(max(1, min(args['process'], len(jobs)))) as pool:
+            for n, (task_id, gene_name, error) in enumerate(pool.imap_unordered(_export_plot, jobs)):
+                if error is not None:
+                    failed.add(task_id)
+                    mc.log_warning('Fail to export the plot of task [{}] {}: {}'.format(task_id, gene_name, error))
+                mc.handle_progress('Exported {} of {} plots...'.format(n + 1, len(jobs)), progress=n + 1)
+    finally:
+        _remove_tmp_dirs(out_dir)
+
+    _write_index(out_dir, [(task_id, gene_name) for task_id, gene_name in zip(task_ids, gene_names)
+                           if task_id not in failed])
+    mc.log_info('Exported {} plots to {}, {} failed.'.format(len(jobs) - len(failed), out_dir, len(failed)))
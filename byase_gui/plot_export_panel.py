@@ -0,0 +1,275 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from typing import Optional, List, Tuple
+
+import wx
+
+from .message import QueueMessageCenter
+from .long_running import LongRunningTaskProgressPanel
+
+
+class PlotExportPanelDelegate:
+    """Plot export panel delegate, which provides the tasks to export."""
+
+    def export_tasks(self, genes: Optional[List[str]]) -> Tuple[Optional[str], List[str], List[str]]:
+        """The tasks to export.
+
+        Args:
+            genes: Gene names or task IDs to export, None to export the rows of the current results view.
+
+        Returns:
+            The result directory, None if no single result directory is loaded, and the task IDs and gene names.
+        """
+        pass
+
+    def export_ploidy(self) -> Optional[int]:
+        """The ploidy of the loaded results, None if no results are loaded."""
+        pass
+
+
+class PlotExportPanel(LongRunningTaskProgressPanel):
+    """Panel to export plots of many tasks as static HTML pages.
+
+    Attributes:
+        source_box: Source of the tasks, the current results view or a gene list.
+        genes_input: Gene names or task IDs input, one per line.
+        plot_allele_1_input: Plot allele 1 input.
+        plot_allele_2_check: Plot allele 2 checkbox.
+        plot_allele_2_input: Plot allele 2 input.
+        plot_expr_check: Plot expression checkbox.
+        plot_cov_check: Plot coverages checkbox.
+        plot_diff_check: Plot difference checkbox.
+        plot_isoforms_check: Plot isoforms checkbox.
+        zoom_fit_width_input: Zoom to fit width input.
+        process_input: The count of processes input.
+        out_dir_picker: Output directory picker.
+        delegate: The delegate object.
+    """
+
+    def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
+        super().__init__(parent, True, mc, log_text_field)
+
+        self.delegate = None  # type: Optional[PlotExportPanelDelegate]
+
+        self.source_box = wx.RadioBox(self, label='Tasks', choices=['Current Results View', 'Gene List'])
+        self.source_box.SetToolTip('Rows of the Results tab with its filters and sort order, or the listed genes.')
+        self.source_box.Bind(wx.EVT_RADIOBOX, self.on_source_changed)
+
+        genes_label = wx.StaticText(self, label='Gene Names or Task IDs (one per line):')
+        self.genes_input = wx.TextCtrl(self, style=wx.TE_MULTILINE)
+
+        # Plot options.
+        alleles_label = wx.StaticText(self, label='Alleles:')
+        self.plot_allele_1_input = wx.ComboBox(self)
+        self.plot_allele_1_input.SetEditable(False)
+        self.plot_allele_1_input.Bind(wx.EVT_COMBOBOX, self.on_plot_allele_1_input_changed)
+        self.plot_allele_2_check = wx.CheckBox(self, label='vs')
+        self.plot_allele_2_check.Bind(wx.EVT_CHECKBOX, self.on_plot_allele_2_checked)
+        self.plot_allele_2_input = wx.ComboBox(self)
+        self.plot_allele_2_input.SetEditable(False)
+
+        self.plot_expr_check = wx.CheckBox(self, label='Show Expression')
+        self.plot_cov_check = wx.CheckBox(self, label='Show Coverages')
+        self.plot_diff_check = wx.CheckBox(self, label='Show Difference')
+        self.plot_isoforms_check = wx.CheckBox(self, label='Show Isoforms')
+        for ctrl in [self.plot_expr_check, self.plot_cov_check, self.plot_diff_check, self.plot_isoforms_check]:
+            ctrl.SetValue(True)
+
+        zoom_label = wx.StaticText(self, label='Zoom:')
+        zoom_original_size_input = wx.RadioButton(self, label='Original Size', style=wx.RB_GROUP)
+        self.zoom_fit_width_input = wx.RadioButton(self, label='Fit Page Width')
+        self.zoom_fit_width_input.SetValue(True)
+
+        process_label = wx.StaticText(self, label='Processes:')
+        cpu_count = os.cpu_count() or 1
+        self.process_input = wx.SpinCtrl(self, min=1, max=cpu_count, initial=cpu_count)
+
+        out_dir_label = wx.StaticText(self, label='Output Directory:')
+        self.out_dir_picker = wx.DirPickerCtrl(self)
+
+        self.set_ploidy(2)
+        self.update_source()
+
+        # Options sizer.
+        allele_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        allele_sizer.Add(self.plot_allele_1_input, 0, wx.RIGHT, 5)
+        allele_sizer.Add(self.plot_allele_2_check, 0, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 5)
+        allele_sizer.Add(self.plot_allele_2_input, 0, wx.ALL, 0)
+
+        show_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        for ctrl in [self.plot_cov_check, self.plot_expr_check, self.plot_diff_check, self.plot_isoforms_check]:
+            show_sizer.Add(ctrl, 0, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 10)
+
+        zoom_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        zoom_sizer.Add(zoom_original_size_input, 0, wx.RIGHT, 10)
+        zoom_sizer.Add(self.zoom_fit_width_input, 0, wx.ALL, 0)
+
+        options_sizer = wx.GridBagSizer(hgap=5, vgap=5)
+        options_sizer.Add(alleles_label, pos=(0, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        options_sizer.Add(allele_sizer, pos=(0, 1))
+        options_sizer.Add(show_sizer, pos=(1, 1))
+        options_sizer.Add(zoom_label, pos=(2, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        options_sizer.Add(zoom_sizer, pos=(2, 1))
+        options_sizer.Add(process_label, pos=(3, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        options_sizer.Add(self.process_input, pos=(3, 1))
+        options_sizer.Add(out_dir_label, pos=(4, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        options_sizer.Add(self.out_dir_picker, pos=(4, 1), flag=wx.EXPAND)
+        options_sizer.AddGrowableCol(1)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        button_sizer.AddStretchSpacer(1)
+        button_sizer.Add(self.start_button, 0, wx.ALL | wx.EXPAND, 5)
+        button_sizer.Add(self.stop_button, 0, wx.ALL | wx.EXPAND, 5)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.source_box, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(genes_label, 0, wx.LEFT | wx.RIGHT | wx.TOP, 5)
+        sizer.Add(self.genes_input, 1, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(wx.StaticLine(self), 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 5)
+        sizer.Add(options_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(button_sizer, 0, wx.ALL | wx.EXPAND, 0)
+        sizer.Add(self.progress_bar, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(self.progress_label, 0, wx.ALL | wx.EXPAND, 5)
+        self.SetSizerAndFit(sizer)
+
+        self.add_disabling_elements([self.source_box, self.genes_input, self.plot_allele_1_input,
+                                     self.plot_allele_2_check, self.plot_allele_2_input, self.plot_expr_check,
+                                     self.plot_cov_check, self.plot_diff_check, self.plot_isoforms_check,
+                                     zoom_original_size_input, self.zoom_fit_width_input, self.process_input,
+                                     self.out_dir_picker])
+
+        self.Bind(wx.EVT_SHOW, self.on_show)
+
+    def set_delegate(self, delegate: PlotExportPanelDelegate):
+        """Set delegate."""
+        self.delegate = delegate
+
+    def set_ploidy(self, ploidy: int):
+        """Set allele choices of the ploidy, keeping the selection if possible."""
+        allele_1 = self.plot_allele_1_input.GetValue()
+        allele_2 = self.plot_allele_2_input.GetValue()
+        choices = ['Allele {}'.format(i + 1) for i in range(ploidy)]
+        self.plot_allele_1_input.Set(choices + ['All alleles'])
+        self.plot_allele_2_input.Set(choices)
+        if allele_1 not in choices:
+            allele_1 = 'All alleles'
+        self.plot_allele_1_input.SetValue(allele_1)
+        self.plot_allele_2_input.SetValue(allele_2 if allele_2 in choices else choices[min(1, ploidy - 1)])
+        self.update_allele_2()
+
+    @property
+    def gene_list(self) -> bool:
+        """If the gene list source is selected."""
+        return self.source_box.GetSelection() == 1
+
+    def update_source(self):
+        """Enable the gene list input for the gene list source only."""
+        self.genes_input.Enabled = self.gene_list
+
+    def update_allele_2(self):
+        """Enable the allele 2 inputs when a single allele 1 is selected."""
+        single_allele = self.plot_allele_1_input.GetValue() != 'All alleles'
+        self.plot_allele_2_check.Enabled = single_allele
+        self.plot_allele_2_input.Enabled = single_allele and self.plot_allele_2_check.IsChecked()
+
+    def on_show(self, event: wx.ShowEvent):
+        """Shown callback, the allele choices follow the loaded results."""
+        event.Skip()
+        if event.IsShown() and self.delegate is not None and self.start_button.Enabled:
+            ploidy = self.delegate.export_ploidy()
+            if ploidy is not None:
+                self.set_ploidy(ploidy)
+
+    def on_source_changed(self, event):
+        """Source selector callback."""
+        assert event
+        self.update_source()
+
+    def on_plot_allele_1_input_changed(self, event):
+        """Plot allele 1 changed callback."""
+        assert event
+        self.update_allele_2()
+
+    def on_plot_allele_2_checked(self, event):
+        """Plot allele 2 checked callback."""
+        assert event
+        self.update_allele_2()
+
+    def _plot_items(self) -> List[str]:
+        """The classes of visible cells, as `PlotPanel` displays them."""
+        plot_expr = self.plot_expr_check.IsChecked()
+        plot_cov = self.plot_cov_check.IsChecked()
+        plot_diff = self.plot_diff_check.IsChecked()
+
+        items = []
+        if self.plot_allele_1_input.GetValue() == 'All alleles':
+            if plot_expr:
+                items.append('hist')
+            if plot_cov:
+                items.append('cov')
+            if plot_diff:
+                items.append('diff')
+            return items
+
+        allele_1 = int(self.plot_allele_1_input.GetValue().split(' ')[-1]) - 1
+        if plot_expr:
+            items.append('hist_{}'.format(allele_1))
+        if plot_cov:
+            items.append('cov_{}'.format(allele_1))
+        if self.plot_allele_2_check.IsChecked():
+            allele_2 = int(self.plot_allele_2_input.GetValue().split(' ')[-1]) - 1
+            if plot_expr:
+                items.append('hist_{}'.format(allele_2))
+            if plot_cov:
+                items.append('cov_{}'.format(allele_2))
+            if plot_diff:
+                items.append('diff_{}_{}'.format(allele_1, allele_2))
+        return items
+
+    def provide_tool(self):
+        genes = None
+        if self.gene_list:
+            genes = [line.strip() for line in self.genes_input.GetValue().splitlines() if line.strip()]
+        result_dir, task_ids, gene_names = None, [], []
+        if self.delegate is not None:
+            result_dir, task_ids, gene_names = self.delegate.export_tasks(genes)
+        self.progress_bar.SetRange(max(1, len(task_ids)))
+
+        tool = 'export-plots'
+        params = {
+            'result_dir': result_dir,
+            'task_ids': task_ids,
+            'gene_names': gene_names,
+            'out_dir': self.out_dir_picker.GetPath(),
+            'process': self.process_input.GetValue(),
+            'items': self._plot_items(),
+            'isoforms': self.plot_isoforms_check.IsChecked(),
+            'zoom': '100%' if self.zoom_fit_width_input.GetValue() else ''
+        }
+        return tool, params
+
+    def handle_progress(self, progress):
+        super().handle_progress(progress)
+        self.progress_bar.SetValue(progress)
+
+    def handle_task_finished(self):
+        super().handle_task_finished()
+        self.update_source()
+        self.update_allele_2()
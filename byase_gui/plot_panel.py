@@ -16,16 +16,29 @@
 # Author: Lili Dong
 #
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
+import os
+import json
+import time
 
+import numpy as np
 import pandas as pd
 import wx
 from wx.html2 import WebView
-from wx.lib.mixins.listctrl import CheckListCtrlMixin
 
 from .message import QueueMessageCenter
 from .long_running import LongRunningTaskIndicatorPanel
 from .result_panel import ResultPanelDelegate
+from .plot_cache import PlotCache, default_cache_dir
+from .plot import VIEWER_PATH
+from .data_view import _format_cell
+
+
+# Delay in ms to coalesce changes of plot controls.
+_UPDATE_PLOTS_DELAY = 50
+
+_CHECK_IMAGE_SIZE = (16, 16)
+_COLUMN_PADDING = 16
 
 
 class TaskDetailDataViewDelegate:
@@ -35,103 +48,139 @@ class TaskDetailDataViewDelegate:
         pass
 
 
-class TaskDetailDataView(wx.ListCtrl, CheckListCtrlMixin):
-    """Task detail data view.
+class TaskDetailDataView(wx.ListCtrl):
+    """Task detail data view, in virtual mode with a check box in the first column.
 
     Attributes:
         df: The data frame.
+        texts: Formatted texts of each column.
+        checked: Check status of each row.
+        last_check: The row and status of the last clicked check box, to check a range with shift.
+        delegate: The delegate object.
     """
 
     def __init__(self, parent):
-        wx.ListCtrl.__init__(self, parent, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
-        CheckListCtrlMixin.__init__(self)
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
 
         self.df = None  # type: Optional[pd.DataFrame]
+        self.texts = []  # type: List[List[str]]
+        self.checked = np.zeros(0, dtype=bool)
+        self.last_check = None  # type: Optional[Tuple[int, bool]]
         self.delegate = None  # type: Optional[TaskDetailDataViewDelegate]
 
+        image_list = wx.ImageList(*_CHECK_IMAGE_SIZE)
+        for flag in [0, wx.CONTROL_CHECKED]:
+            image_list.Add(self._create_check_bitmap(flag))
+        self.AssignImageList(image_list, wx.IMAGE_LIST_SMALL)
+
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LIST_KEY_DOWN, self.on_key_down)
+
+    def _create_check_bitmap(self, flag: int) -> wx.Bitmap:
+        """Create a bitmap of the native check box."""
+        bmp = wx.Bitmap(*_CHECK_IMAGE_SIZE)
+        dc = wx.MemoryDC(bmp)
+        dc.SetBackground(wx.WHITE_BRUSH)
+        dc.Clear()
+        wx.RendererNative.Get().DrawCheckBox(self, dc, (0, 0, *_CHECK_IMAGE_SIZE), flag)
+        dc.SelectObject(wx.NullBitmap)
+        return bmp
+
     def set_delegate(self, delegate: ResultPanelDelegate):
         """Set delegate."""
         self.delegate = delegate
 
-    def OnCheckItem(self, index, flag):
-        super().OnCheckItem(index, flag)
+    def OnGetItemText(self, item, column):
+        return self.texts[column][item]
+
+    def OnGetItemImage(self, item):
+        return 1 if self.checked[item] else 0
+
+    def on_left_down(self, event: wx.MouseEvent):
+        """Toggle the check box under the mouse, or a range of them with shift."""
+        index, flags = self.HitTest(event.GetPosition())
+        if index < 0 or not flags & wx.LIST_HITTEST_ONITEMICON:
+            event.Skip()
+            return
+        self.toggle_row(index)
+
+    def on_key_down(self, event: wx.ListEvent):
+        """Toggle the check box of the focused row with space, or a range of them with shift."""
+        index = self.GetFocusedItem()
+        if event.GetKeyCode() != wx.WXK_SPACE or index < 0:
+            event.Skip()
+            return
+        self.toggle_row(index)
+
+    def toggle_row(self, index: int):
+        """Toggle the check box of a row, or the rows from the last toggled one with shift."""
+        checked = not self.checked[index]
+        start, stop = index, index
+        if self.last_check is not None and wx.GetKeyState(wx.WXK_SHIFT):
+            last_index, last_checked = self.last_check
+            if last_checked == checked and last_index < self.checked.shape[0]:
+                start, stop = min(index, last_index), max(index, last_index)
+        self.last_check = (index, checked)
+        self.check_rows(start, stop, checked)
+
+    def check_rows(self, start: int, stop: int, checked: bool):
+        """Set check status of rows from start to stop inclusive, and notify the delegate once."""
+        rows = self.checked[start:stop + 1]
+        if np.all(rows == checked):
+            return
+        rows[:] = checked
+        self.RefreshItems(start, stop)
         if self.delegate is not None:
             self.delegate.plot_check_changed()
 
     def get_checked_items(self):
         """Get checked plot items."""
-        df = self.df
-        idxes = df.index
-        items = []
-        for i, idx in enumerate(idxes):
-            if self.IsChecked(i):
-                items.append(idx)
-        return items
+        return self.df.index[self.checked].tolist()
 
     def update_df(self, df: Optional[pd.DataFrame]):
-        """Update data frame."""
+        """Update data frame, all rows are checked."""
+        self.ClearAll()
         self.df = df
-        self.update_display(None)
+        self.last_check = None
+        if df is None:
+            self.texts = []
+            self.checked = np.zeros(0, dtype=bool)
+            self.SetItemCount(0)
+            return
 
-        for n_col in [1, 2]:
-            self.SetColumnWidth(n_col, wx.LIST_AUTOSIZE)
-        for n_col in range(3, df.shape[1]):
-            self.SetColumnWidth(n_col, wx.LIST_AUTOSIZE_USEHEADER)
+        self.texts = [[_format_cell(val) for val in df.iloc[:, n_col].tolist()] for n_col in range(df.shape[1])]
+        self.checked = np.ones(df.shape[0], dtype=bool)
 
-    def update_display(self, checked_items: Optional[List[int]]):
-        """Update display."""
-        self.ClearAll()
-        if self.df is None:
-            return
-        delegate = self.delegate
-        self.delegate = None
-
-        df = self.df
-        cols = df.columns.tolist()
-        for i, col in enumerate(cols):
-            self.InsertColumn(i, col)
-        n_row, n_col = df.shape
-        for i in range(n_row):
-            data = []
-            for j in range(n_col):
-                val = df.iloc[i, j]
-                if isinstance(val, float):
-                    val = '{:.3f}'.format(val)
-                else:
-                    val = str(val)
-                data.append(val)
-            self.Append(data)
-            if checked_items is None or df.index[i] in checked_items:
-                self.CheckItem(i)
-        for i, col in enumerate(cols):
-            self.SetColumnWidth(i, wx.LIST_AUTOSIZE)
-        self.delegate = delegate
+        for n_col, col in enumerate(df.columns.tolist()):
+            self.InsertColumn(n_col, col)
+        self.SetItemCount(df.shape[0])
+
+        # Fit columns to the longest texts, without measuring every row.
+        for n_col, col in enumerate(df.columns.tolist()):
+            longest = max(self.texts[n_col] + [str(col)], key=len)
+            width = self.GetTextExtent(longest)[0] + _COLUMN_PADDING
+            if n_col == 0:
+                width += _CHECK_IMAGE_SIZE[0]
+            self.SetColumnWidth(n_col, width)
 
     def all_checked_status_is_same(self) -> Optional[bool]:
         """If all checked status are the same.
         Returns:
             If all status are the same, return the status (checked / unchecked), else return None.
         """
-        all_checked = None
-        df = self.df
-        n_row = df.shape[0]
-        for i in range(n_row):
-            checked = self.IsChecked(i)
-            if all_checked is None:
-                all_checked = checked
-            elif all_checked != checked:
-                all_checked = None
-                break
-        return all_checked
+        if self.checked.shape[0] == 0:
+            return None
+        if np.all(self.checked):
+            return True
+        if not np.any(self.checked):
+            return False
+        return None
 
     def set_check_all(self, checked: bool):
-        """Set check all / none."""
-        if self.df is None:
+        """Set check all / none, the delegate is notified once."""
+        if self.df is None or self.df.shape[0] == 0:
             return
-        df = self.df
-        n_row = df.shape[0]
-        for i in range(n_row):
-            self.CheckItem(i, checked)
+        self.check_rows(0, self.df.shape[0] - 1, checked)
 
 
 def _create_web_view(parent):
@@ -163,7 +212,14 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         zoom_fit_width_input: Zoom to fit width input.
 
         plot_view: Plot view.
-        reloading_without_cache: If the plot view is reloading without cache.
+        viewer_ready: If the viewer page is loaded into the plot view.
+        update_plots_timer: The debounce timer of plot updates.
+        shown_zoom: The zoom sent to the page.
+        shown_items: The items sent to the page, None if the page should be updated in full.
+        pending_payload_path: Plot payload to show once the viewer page is loaded.
+        shown_seq: The sequence number of the plots sent to the page.
+        show_start_time: The time the plots being loaded were sent to the page.
+        plot_cache: The on-disk plot cache of a local backend, looked up before starting a plot job.
     """
 
     def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
@@ -171,6 +227,7 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
 
         self.result_dir = None
         self.task_id = None
+        self.plot_cache = PlotCache(default_cache_dir())
 
         # loading panel.
         self.loading_panel = wx.Panel(self)
@@ -212,7 +269,15 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         # Plot view.
         self.plot_view = _create_web_view(self.loading_panel)
         self.plot_view.Bind(wx.html2.EVT_WEBVIEW_LOADED, self.on_plot_view_loaded)
-        self.reloading_without_cache = False
+        self.plot_view.Bind(wx.html2.EVT_WEBVIEW_TITLE_CHANGED, self.on_plot_view_title_changed)
+        self.viewer_ready = False
+        self.update_plots_timer = None  # type: Optional[wx.CallLater]
+        self.shown_zoom = None  # type: Optional[str]
+        self.shown_items = None  # type: Optional[List[str]]
+        self.pending_payload_path = None  # type: Optional[str]
+        self.shown_seq = 0
+        self.show_start_time = None  # type: Optional[float]
+        self.plot_view.LoadURL('file://' + VIEWER_PATH)
 
         # Plot control sizer.
         plot_control_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -256,9 +321,21 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         self.result_dir = result_dir
         self.task_id = task_id
 
-        self.start_task()
-        self.plot_view.LoadURL('about:blank')
-        self.reloading_without_cache = False
+        # A cached plot is shown right away, without a backend job.
+        payload_path = None
+        try:
+            key = PlotCache.key(result_dir, task_id)
+            if key is not None:
+                payload_path = self.plot_cache.lookup(key)
+        except Exception as e:
+            self.log_text_field.AppendText('Fail to look up the plot cache: {}\n'.format(e))
+
+        self.pending_payload_path = None
+        if payload_path is None:
+            self.start_task()
+            if self.viewer_ready:
+                self.plot_view.RunScript('clear_task();')
+                self.shown_items = None
 
         self.task_label.SetLabel('Task ID: {}'.format(task_id))
         self.task_data_view.update_df(task_detail)
@@ -276,6 +353,16 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         self.plot_allele_2_input.Enabled = False
         self.toggle_select_all_check.SetValue(True)
 
+        if payload_path is not None:
+            self.show_plot(payload_path)
+
+    def prefetch_plots(self, result_dir: Optional[str], task_ids: List[str]):
+        params = {
+            'result_dir': result_dir,
+            'task_ids': task_ids
+        }
+        self.mc.send_background_input('prefetch-plots', params)
+
     def provide_tool(self):
         tool = 'plot'
         params = {
@@ -284,24 +371,48 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         }
         return tool, params
 
-    def handle_task_finished(self):
-        super().handle_task_finished()
-
     def handle_data(self, data):
         if isinstance(data, tuple):
             key, val = data
-            if key == 'html path':
-                self.plot_view.LoadURL('file://' + val)
+            if key == 'plot payload':
+                self.show_plot(val)
+
+    def show_plot(self, payload_path: str):
+        """Show the plots of a payload in the viewer page.
+
+        The modification time of the payload is added to image URLs, so rebuilt images are never
+        served from the cache of the web view.
+        """
+        if not self.viewer_ready:
+            self.pending_payload_path = payload_path
+            return
+
+        self.show_start_time = time.time()
+        self.shown_seq += 1
+        with open(payload_path) as f:
+            payload = f.read()
+        base = 'file://{}/'.format(os.path.dirname(payload_path))
+        version = os.stat(payload_path).st_mtime_ns
+        script = 'show_task({}, {}, {}, {});'.format(json.dumps(base), version, payload, self.shown_seq)
+        self.plot_view.RunScript(script + self._update_plots_script())
+
+    def on_plot_view_title_changed(self, event):
+        """Plot web view title changed callback, the page reports through its title that all images are loaded."""
+        if self.show_start_time is None or event.GetString() != 'loaded {}'.format(self.shown_seq):
+            return
+        elapsed = time.time() - self.show_start_time
+        self.show_start_time = None
+        self.log_text_field.AppendText('Plot of task {} loaded in {:.0f} ms.\n'.format(self.task_id, elapsed * 1000))
 
     def on_plot_view_loaded(self, event):
-        """Plot web view loaded callback."""
+        """Plot web view loaded callback, the viewer page is loaded once."""
         assert event
-        if not self.reloading_without_cache:
-            self.reloading_without_cache = True
-            self.plot_view.Reload(wx.html2.WEBVIEW_RELOAD_NO_CACHE)
-        else:
-            self.reloading_without_cache = False
-            self.update_plots()
+        if self.viewer_ready:
+            return
+        self.viewer_ready = True
+        if self.pending_payload_path is not None:
+            self.show_plot(self.pending_payload_path)
+            self.pending_payload_path = None
 
     def on_toggle_select_all_checked(self, event):
         """Toggle select all checked callback."""
@@ -345,10 +456,36 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
         self.update_plots()
 
     def update_plots(self):
-        """Update plots."""
-        if self.task_data_view.df is None:
+        """Update plots, changes within the debounce delay are sent to the page at once."""
+        if self.update_plots_timer is not None and self.update_plots_timer.IsRunning():
+            self.update_plots_timer.Restart(_UPDATE_PLOTS_DELAY)
+        else:
+            self.update_plots_timer = wx.CallLater(_UPDATE_PLOTS_DELAY, self._flush_plot_updates)
+
+    def _flush_plot_updates(self):
+        """Send the added and removed items to the page, or all items if the zoom changed."""
+        if self.task_data_view.df is None or not self.viewer_ready:
             return
+        zoom, items = self._plot_items()
+        if self.shown_items is None or zoom != self.shown_zoom:
+            self.plot_view.RunScript(self._update_plots_script())
+            return
+
+        added = [item for item in items if item not in self.shown_items]
+        removed = [item for item in self.shown_items if item not in items]
+        if len(added) == 0 and len(removed) == 0:
+            return
+        self.shown_items = items
+        self.plot_view.RunScript('toggle_plots({}, {});'.format(json.dumps(added), json.dumps(removed)))
+
+    def _update_plots_script(self) -> str:
+        """The script to display all the checked items with the zoom."""
+        zoom, items = self._plot_items()
+        self.shown_zoom, self.shown_items = zoom, items
+        return 'update_plots({}, {});'.format(json.dumps(zoom), json.dumps(items))
 
+    def _plot_items(self) -> Tuple[str, List[str]]:
+        """The zoom and the items to display."""
         if self.zoom_original_size_input.GetValue() is True:
             zoom = ''
         elif self.zoom_fit_width_input.GetValue() is True:
@@ -384,6 +521,4 @@ class PlotPanel(LongRunningTaskIndicatorPanel, ResultPanelDelegate, TaskDetailDa
                 if plot_diff:
                     items.append('diff_{}_{}'.format(allele_1, allele_2))
 
-        items = ['"{}"'.format(item) for item in items]
-        script = 'update_plots("{}", [{}]);'.format(zoom, ', '.join(items))
-        self.plot_view.RunScript(script)
+        return zoom, [str(item) for item in items]
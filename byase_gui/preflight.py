@@ -0,0 +1,146 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from collections import Counter
+from multiprocessing import Pool
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+import HTSeq
+
+from byase.message import MessageCenter
+
+
+# Bounds of the sample of each BAM file, reading stops at whichever comes first.
+_MAX_SAMPLE_READS = 200000
+_MAX_SAMPLE_PAIRS = 20000
+
+
+class BAMSample(NamedTuple):
+    """Sample of a BAM file."""
+    path: str
+    reads_count: int
+    paired_count: int
+    read_lens: Counter
+    insert_sizes: List[int]
+
+
+class BAMLayout(NamedTuple):
+    """Read layout and insert-size parameters estimated from BAM files."""
+    read_len: int
+    paired_end: bool
+    insert_size_mean: Optional[float]
+    insert_size_std: Optional[float]
+    reads_count: int
+    pairs_count: int
+
+
+def _sample_bam(path: str) -> BAMSample:
+    """Stream the beginning of a BAM file, and collect read lengths and insert sizes."""
+    reads_count = 0
+    paired_count = 0
+    read_lens = Counter()
+    insert_sizes = []
+    for aln in HTSeq.BAM_Reader(path):
+        if not aln.aligned or aln.not_primary_alignment or aln.supplementary:
+            continue
+        if aln.pcr_or_optical_duplicate or aln.failed_platform_qc:
+            continue
+
+        reads_count += 1
+        read_lens[len(aln.read.seq)] += 1
+
+        if aln.paired_end:
+            paired_count += 1
+            # Insert sizes of unspliced proper pairs, counted once per pair.
+            if aln.pe_which == 'first' and aln.proper_pair and aln.mate_aligned and aln.inferred_insert_size != 0 \
+                    and all(op.type != 'N' for op in aln.cigar):
+                insert_sizes.append(abs(aln.inferred_insert_size))
+
+        if reads_count >= _MAX_SAMPLE_READS or len(insert_sizes) >= _MAX_SAMPLE_PAIRS:
+            break
+    return BAMSample(path, reads_count, paired_count, read_lens, insert_sizes)
+
+
+def _trim_insert_sizes(insert_sizes: np.ndarray) -> np.ndarray:
+    """Remove outliers, e.g. pairs whose mates are spliced, by the median absolute deviation."""
+    if insert_sizes.shape[0] == 0:
+        return insert_sizes
+    median = np.median(insert_sizes)
+    mad = np.median(np.abs(insert_sizes - median)) * 1.4826
+    if mad == 0:
+        return insert_sizes[insert_sizes == median]
+    return insert_sizes[np.abs(insert_sizes - median) <= 3 * mad]
+
+
+def estimate_layout(samples: List[BAMSample], mc: MessageCenter) -> BAMLayout:
+    """Estimate read layout and insert-size parameters from samples of BAM files."""
+    for sample in samples:
+        if sample.reads_count == 0:
+            raise ValueError('No aligned reads found in BAM file: {}'.format(sample.path))
+
+    read_lens = Counter()
+    for sample in samples:
+        read_lens.update(sample.read_lens)
+    read_len = read_lens.most_common(1)[0][0]
+    if len(read_lens) > 1:
+        mc.log_warning('Reads have different lengths, the most common length {} is used.'.format(read_len))
+
+    paired = [sample.paired_count > sample.reads_count / 2 for sample in samples]
+    paired_end = sum(paired) > len(paired) / 2
+    if len(set(paired)) > 1:
+        mc.log_warning('BAM files are mixed single-end and paired-end, {} is used.'.format(
+            'paired-end' if paired_end else 'single-end'))
+
+    insert_size_mean, insert_size_std = None, None
+    insert_sizes = np.array([n for sample in samples for n in sample.insert_sizes], dtype=np.float64)
+    insert_sizes = _trim_insert_sizes(insert_sizes)
+    if paired_end:
+        if insert_sizes.shape[0] == 0:
+            mc.log_warning('No proper pairs found to estimate insert size.')
+        else:
+            insert_size_mean = float(np.mean(insert_sizes))
+            insert_size_std = float(np.std(insert_sizes))
+
+    return BAMLayout(read_len=read_len, paired_end=paired_end,
+                     insert_size_mean=insert_size_mean, insert_size_std=insert_size_std,
+                     reads_count=sum(sample.reads_count for sample in samples), pairs_count=insert_sizes.shape[0])
+
+
+def bam_preflight(args) -> BAMLayout:
+    """Sample BAM files in parallel, one process per file, and estimate read layout."""
+    bam_paths = args['bam']
+    mc = args['mc']  # type: MessageCenter
+
+    mc.log_debug('bam_paths: {}'.format(bam_paths))
+    mc.handle_progress('Sampling {} BAM files...'.format(len(bam_paths)))
+
+    n_process = max(1, min(len(bam_paths), os.cpu_count() or 1))
+    samples = []
+    with Pool(n_process) as pool:
+        for sample in pool.imap(_sample_bam, bam_paths):
+            samples.append(sample)
+            mc.handle_progress('Sampled {} of {} BAM files...'.format(len(samples), len(bam_paths)))
+
+    layout = estimate_layout(samples, mc)
+    mc.log_info('Estimated from {} reads: read length {}, {}{}.'.format(
+        layout.reads_count, layout.read_len, 'paired-end' if layout.paired_end else 'single-end',
+        '' if layout.insert_size_mean is None else ', insert size {:.1f} ± {:.1f} ({} pairs)'.format(
+            layout.insert_size_mean, layout.insert_size_std, layout.pairs_count)))
+    return layout
@@ -0,0 +1,231 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import sys
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Tuple, Union
+
+import psutil
+
+from byase.message import INFO
+
+from .message import QueueMessageCenter, MessageCenterError, InputItem, OutputItem, Instruction
+from .task import task
+
+
+# Bump when the items passed between GUI and worker change.
+PROTOCOL_VERSION = 2
+
+_HELLO = 'byase-gui'
+_TOKEN_ENV = 'BYASE_GUI_TOKEN'
+
+
+class ProtocolError(MessageCenterError):
+    """When the peer speaks another protocol."""
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class _BackgroundInputItem(InputItem):
+    """Input of background work, passed to the worker."""
+    pass
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Parse a 'host:port' TCP address, or a Unix socket path."""
+    if os.sep in address or ':' not in address:
+        return address
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def token_from_env() -> bytes:
+    """The shared token of GUI and worker."""
+    token = os.environ.get(_TOKEN_ENV)
+    if not token:
+        raise MessageCenterError('The shared token should be set in the {} environment variable.'.format(_TOKEN_ENV))
+    return token.encode()
+
+
+class SocketMessageCenter(QueueMessageCenter):
+    """Message center of the GUI, whose backend is a worker connected through a socket.
+
+    Input and instructions are sent to the worker, output of the worker is received by a thread,
+    and put to the local output queue, together with messages of the GUI itself.
+
+    Attributes:
+        _conn: The connection to the worker.
+        _send_lock: Lock of sending through the connection.
+        _running: If the worker is running a task.
+    """
+
+    def __init__(self, address: str, token: bytes, level=INFO, log_path=None):
+        super().__init__(level, log_path)
+        self._output_queue = queue.Queue()
+        self._send_lock = threading.Lock()
+        self._running = False
+
+        self._conn = Client(parse_address(address), authkey=token)  # type: Connection
+        self._conn.send((_HELLO, PROTOCOL_VERSION))
+        reply = self._conn.recv()
+        if reply != (_HELLO, PROTOCOL_VERSION):
+            self._conn.close()
+            raise ProtocolError('The worker speaks protocol {}, but {} is expected.'.format(reply, PROTOCOL_VERSION))
+
+        threading.Thread(target=self._receive_loop, daemon=True).start()
+
+    def _send(self, item):
+        """Send an item to the worker."""
+        with self._send_lock:
+            self._conn.send(item)
+
+    def _receive_loop(self):
+        """Receive output of the worker."""
+        try:
+            while True:
+                item = self._conn.recv()  # type: OutputItem
+                if item.task_finished:
+                    self._running = False
+                self._output_queue.put(item)
+        except (EOFError, OSError):
+            self._output_queue.put(OutputItem(log='Lost connection to the worker.'))
+            if self._running:
+                self._output_queue.put(OutputItem(progress_msg='Error occurred!', task_finished=True))
+
+    def send_input(self, tool: str, params: dict):
+        self._running = True
+        try:
+            self._send(InputItem(tool=tool, params=params))
+        except OSError as e:
+            self._running = False
+            self.log_error(e)
+            self._output_queue.put(OutputItem(task_finished=True))
+
+    def send_background_input(self, tool: str, params: dict):
+        try:
+            self._send(_BackgroundInputItem(tool=tool, params=params))
+        except OSError as e:
+            self.log_error(e)
+
+    def receive_output(self):
+        try:
+            return self._output_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def send_instruction(self, instruction: Instruction):
+        try:
+            self._send(instruction)
+        except OSError as e:
+            self.log_error(e)
+
+    def receive_input(self):
+        raise MessageCenterError('The GUI does not run tasks.')
+
+    def poll_input(self, timeout: float):
+        raise MessageCenterError('The GUI does not run tasks.')
+
+    def receive_background_input(self):
+        raise MessageCenterError('The GUI does not run tasks.')
+
+    def receive_instruction(self):
+        raise MessageCenterError('The GUI does not run tasks.')
+
+    def close(self):
+        """Close the connection, the worker stops the backend."""
+        self._conn.close()
+
+
+def _forward_input(conn: Connection, mc: QueueMessageCenter):
+    """Forward input, background input and instructions of the GUI to the backend."""
+    try:
+        while True:
+            item = conn.recv()
+            if isinstance(item, _BackgroundInputItem):
+                mc.send_background_input(item.tool, item.params)
+            elif isinstance(item, InputItem):
+                mc.send_input(item.tool, item.params)
+            elif isinstance(item, Instruction):
+                mc.send_instruction(item)
+    except (EOFError, OSError):
+        pass
+
+
+def _serve(conn: Connection):
+    """Serve a GUI connection with a backend process, until the GUI disconnects."""
+    hello = conn.recv()
+    conn.send((_HELLO, PROTOCOL_VERSION))
+    if hello != (_HELLO, PROTOCOL_VERSION):
+        print('Refused a GUI speaking protocol {}.'.format(hello), file=sys.stderr)
+        return
+
+    mc = QueueMessageCenter()
+    backend = mp.Process(target=task, args=(mc, ))
+    backend.start()
+
+    forwarder = threading.Thread(target=_forward_input, args=(conn, mc), daemon=True)
+    forwarder.start()
+    try:
+        while forwarder.is_alive():
+            item = mc.poll_output(0.5)
+            if item is None:
+                continue
+            conn.send(item)
+    except OSError:
+        pass
+    finally:
+        for child in psutil.Process(backend.pid).children(recursive=True):
+            child.kill()
+        backend.terminate()
+        backend.join()
+
+
+def serve(address: str, token: bytes):
+    """Serve GUIs one at a time."""
+    with Listener(parse_address(address), authkey=token) as listener:
+        # The bound address, with the port chosen by the system if port 0 is given.
+        bound = listener.address
+        if isinstance(bound, tuple):
+            bound = '{}:{}'.format(*bound)
+        print('Listening on {}.'.format(bound), file=sys.stderr, flush=True)
+        while True:
+            try:
+                conn = listener.accept()
+            except (mp.AuthenticationError, OSError) as e:
+                print('Refused a connection: {}'.format(e), file=sys.stderr)
+                continue
+            print('Accepted a GUI from {}.'.format(listener.last_accepted), file=sys.stderr)
+            with conn:
+                _serve(conn)
+            print('The GUI disconnected.', file=sys.stderr)
+
+
+def worker_main():
+    """Entry point of the worker, which runs the backend for a GUI on another host."""
+    parser = argparse.ArgumentParser(
+        description='BYASE-GUI worker. Paths of the GUI are used as they are, so GUI and worker should share '
+                    'a file system. The shared token is read from the {} environment variable.'.format(_TOKEN_ENV))
+    parser.add_argument('--listen', default='127.0.0.1:6789', help='"host:port" or a Unix socket path.')
+    args = parser.parse_args()
+
+    serve(args.listen, token_from_env())
@@ -0,0 +1,124 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from typing import List, Optional, Dict, Tuple
+
+from byase.db import DB
+
+
+_PARAM_FILENAME = 'param.tab'
+_RESULT_FILENAME = 'result.db'
+
+# Record offsets of result databases by real path, with the size and mtime of the index they are read from.
+_offsets_cache = {}  # type: Dict[str, Tuple[int, int, Dict[str, int]]]
+
+
+def file_fingerprint(path: str) -> List[int]:
+    """File fingerprint, (size, mtime in ns)."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def param_path(out_dir: str) -> str:
+    """The path of inference params in a result directory."""
+    return os.path.join(out_dir, _PARAM_FILENAME)
+
+
+def result_path(out_dir: str) -> str:
+    """The path of results in a result directory."""
+    return os.path.join(out_dir, _RESULT_FILENAME)
+
+
+def is_resumable(out_dir: str) -> bool:
+    """If the directory holds a started inference, which can be resumed."""
+    return os.path.isfile(param_path(out_dir)) and os.path.isfile(result_path(out_dir))
+
+
+def read_params(out_dir: str) -> Dict[str, str]:
+    """Inference params of a result directory as written, without checking the paths in them.
+
+    Paths are relative to the result directory.
+    """
+    params = {}
+    with open(param_path(out_dir)) as f:
+        for line in f:
+            k, v = line.strip('\n').split('\t')
+            params[k] = v
+    return params
+
+
+def write_params(out_dir: str, params: Dict[str, str]):
+    """Write inference params of a result directory, in the format of `read_params`."""
+    with open(param_path(out_dir), 'w') as f:
+        for k, v in params.items():
+            f.write('{}\t{}\n'.format(k, v))
+
+
+def annotation_path(out_dir: str) -> Optional[str]:
+    """The path of the annotation used by the inference in a result directory."""
+    v = read_params(out_dir).get('Annotation')
+    if v is None:
+        return None
+    return os.path.normpath(os.path.join(out_dir, v))
+
+
+def finished_task_ids(out_dir: str) -> List[str]:
+    """IDs of tasks which have results, read from the index of the result database only."""
+    with DB(result_path(out_dir)) as db:
+        return db.get_all_item_ids()
+
+
+def result_identity(out_dir: str) -> List[int]:
+    """Identity of the result database of a result directory, (inode of result.db, inode of its index,
+    mtime in ns of the params).
+
+    Records are only appended to a result database, which keeps its identity. A database which is
+    replaced, or a directory reused for a fresh inference, whose params are written anew, gets another.
+    """
+    path = result_path(out_dir)
+    return [os.stat(path).st_ino, os.stat(path + '.idx').st_ino, os.stat(param_path(out_dir)).st_mtime_ns]
+
+
+def read_record_offsets(db_path: str) -> Dict[str, int]:
+    """Offsets of task records in a result database.
+
+    A task has at most one record in a result database, which is never rewritten, so together
+    with the identity of the database the offset of a record identifies the task result.
+    """
+    with DB(db_path) as db:
+        # The index is scanned twice, to list the IDs and to fill the index cache on the first lookup.
+        return {task_id: db.find_item_offset(task_id) for task_id in db.get_all_item_ids()}
+
+
+def record_offsets(out_dir: str) -> Dict[str, int]:
+    """Offsets of task records in the result database of a result directory.
+
+    Offsets are cached per process until the index of the database changes, so looking up tasks
+    one by one does not rescan the index every time.
+    """
+    path = result_path(out_dir)
+    # Stat the index before reading it, so records appended meanwhile invalidate the cache.
+    st = os.stat(path + '.idx')
+    key = os.path.realpath(path)
+    cached = _offsets_cache.get(key)
+    if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+        return cached[2]
+    offsets = read_record_offsets(path)
+    _offsets_cache[key] = (st.st_size, st.st_mtime_ns, offsets)
+    return offsets
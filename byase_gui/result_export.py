@@ -0,0 +1,182 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import threading
+from typing import Optional, List, Tuple, Callable, Union
+
+import numpy as np
+import pandas as pd
+
+from .result_store import ColumnStore, FrameTable
+
+
+# Format name to file extension.
+EXPORT_FORMATS = [('CSV', '.csv'), ('TSV', '.tsv'), ('Parquet', '.parquet')]
+
+# Rows written at a time, small enough for the GUI thread to stay responsive between chunks.
+_EXPORT_CHUNK_SIZE = 8192
+
+Table = Union[ColumnStore, FrameTable]
+
+
+class ExportCancelledError(Exception):
+    """When the export is cancelled."""
+    pass
+
+
+class _DelimitedWriter:
+    """Chunked writer of delimited text files.
+
+    Attributes:
+        sep: The delimiter.
+        file: The output file.
+        header: If the header is not written yet.
+    """
+
+    def __init__(self, path: str, sep: str):
+        self.sep = sep
+        self.file = open(path, 'w', newline='')
+        self.header = True
+
+    def write(self, df: pd.DataFrame):
+        """Write a chunk."""
+        df.to_csv(self.file, sep=self.sep, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Chunked writer of Parquet files, every chunk is a row group.
+
+    Attributes:
+        pa: The pyarrow module, which is only needed by Parquet files.
+        path: The output path.
+        writer: The Parquet writer, opened with the schema of the first chunk.
+        schema: The schema of the first chunk.
+    """
+
+    def __init__(self, path: str):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, df: pd.DataFrame):
+        """Write a chunk."""
+        if self.writer is None:
+            table = self.pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = table.schema
+            self.writer = self.pa.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            # Columns of a chunk may be all missing, keep the types of the first chunk.
+            table = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        """Close the file."""
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _open_writer(path: str, fmt: str):
+    """Open a chunked writer of a format."""
+    if fmt == 'CSV':
+        return _DelimitedWriter(path, ',')
+    if fmt == 'TSV':
+        return _DelimitedWriter(path, '\t')
+    assert fmt == 'Parquet'
+    return _ParquetWriter(path)
+
+
+def isoform_export_path(path: str) -> str:
+    """The path of isoform-level rows exported along with the gene-level rows."""
+    root, ext = os.path.splitext(path)
+    return '{}_isoforms{}'.format(root, ext)
+
+
+def _isoform_rows(start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    """Isoform-level rows of gene-level rows, concatenated in the order of gene-level rows."""
+    counts = stop - start
+    offsets = np.cumsum(counts) - counts
+    return np.arange(int(counts.sum())) - np.repeat(offsets, counts) + np.repeat(start, counts)
+
+
+def export_results(table: Table, rows: np.ndarray, path: str, fmt: str,
+                   isoforms: Optional[Tuple[Table, np.ndarray, np.ndarray]] = None,
+                   on_progress: Optional[Callable[[int], None]] = None,
+                   cancel_event: Optional[threading.Event] = None) -> List[str]:
+    """Export rows of a table in the given order, chunk by chunk.
+
+    Only a chunk of rows is materialized at a time. Files are written under temporary names
+    and renamed once complete, so a cancelled or failed export leaves nothing behind.
+
+    Args:
+        table: The gene-level table.
+        rows: Source rows to export, in order.
+        path: The output path.
+        fmt: The format, one of `EXPORT_FORMATS`.
+        isoforms: The isoform-level table, and the first and end isoform-level rows of each
+            gene-level row, to export isoform rows of the exported genes to `isoform_export_path`.
+        on_progress: Called with the count of exported gene-level rows after each chunk.
+        cancel_event: The export is cancelled once the event is set.
+
+    Returns:
+        The paths of the exported files.
+    """
+    paths = [path] if isoforms is None else [path, isoform_export_path(path)]
+    tmp_paths = ['{}.part'.format(p) for p in paths]
+    writers = []
+    try:
+        for tmp_path in tmp_paths:
+            writers.append(_open_writer(tmp_path, fmt))
+        for start in range(0, rows.shape[0], _EXPORT_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelledError('The export is cancelled.')
+            chunk = rows[start:start + _EXPORT_CHUNK_SIZE]
+            writers[0].write(table.take(chunk))
+            if isoforms is not None:
+                isoform_table, isoform_start, isoform_stop = isoforms
+                writers[1].write(isoform_table.take(_isoform_rows(isoform_start[chunk], isoform_stop[chunk])))
+            if on_progress is not None:
+                on_progress(start + chunk.shape[0])
+        if rows.shape[0] == 0:
+            # Still write the header, or the schema.
+            writers[0].write(table.take(rows))
+            if isoforms is not None:
+                writers[1].write(isoforms[0].take(rows))
+        for writer in writers:
+            writer.close()
+        for tmp_path, final_path in zip(tmp_paths, paths):
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        for writer in writers:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    return paths
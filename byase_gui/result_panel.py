@@ -16,14 +16,26 @@
 # Author: Lili Dong
 #
 
-from typing import Optional
+import os
+import threading
+from typing import Optional, Union, List, Tuple, Dict, Callable
 
+import numpy as np
 import pandas as pd
 import wx
 
 from .message import QueueMessageCenter
 from .long_running import LongRunningTaskIndicatorPanel
-from .data_view import DataView
+from .data_view import DataView, StoreDataView
+from .result_store import ResultStore, FrameResult, ColumnStore, FrameTable, CHUNK_SIZE
+from .inference_panel import InferencePanelDelegate
+from .plot_export_panel import PlotExportPanelDelegate
+from .overview_panel import OverviewPanelDelegate
+from .result_export import EXPORT_FORMATS, ExportCancelledError, export_results
+
+
+# Count of the next rows whose plots are prefetched.
+_PREFETCH_AHEAD = 3
 
 
 class ResultPanelDelegate:
@@ -33,6 +45,10 @@ class ResultPanelDelegate:
         """Notify to plot task."""
         pass
 
+    def prefetch_plots(self, result_dir: Optional[str], task_ids: List[str]):
+        """Notify to plot tasks in the background ahead of requests, an empty list cancels prefetching."""
+        pass
+
 
 def _id_key_func(x: str):
     """ID key function."""
@@ -70,47 +86,50 @@ def _get_chr_key(chr_str: str):
     return chrom
 
 
-def _get_detail_result(df_gene_level: pd.DataFrame, df_isoform_level: pd.DataFrame, n: int):
-    """Get detail result of the n-th task."""
-    row = df_gene_level.iloc[n, :]
-    task_id = row['Task ID']
-
-    def _find_diff_section_start(_df):
-        for _i, _col in enumerate(_df.columns):
+def _get_detail_result(row: pd.Series, df_isoform_level: pd.DataFrame):
+    """Get detail result of a task from its gene-level row and isoform-level rows."""
+    def _find_diff_section_start(_cols):
+        for _i, _col in enumerate(_cols):
             if 'Mean' in _col:
                 return _i
 
     # Get gene-level result.
-    diff_section_start = _find_diff_section_start(df_gene_level)
+    diff_section_start = _find_diff_section_start(row.index)
     cols = ['Number', 'ID', 'Name', 'SNPs']
     d = ['Gene', row['Gene ID'], row['Gene Name'], row['SNPs']]
-    for i in range(diff_section_start, len(df_gene_level.columns)):
-        cols.append(df_gene_level.columns[i])
-        d.append(row[i])
+    for i in range(diff_section_start, len(row.index)):
+        cols.append(row.index[i])
+        d.append(row.iloc[i])
     df = pd.DataFrame([d], columns=cols)
 
     # Merge isoform-level results.
-    diff_section_start = _find_diff_section_start(df_isoform_level)
-    d = df_isoform_level[df_isoform_level['Task ID'] == task_id]
+    d = df_isoform_level
+    diff_section_start = _find_diff_section_start(d.columns)
     col_idx = [list(d.columns).index(col) for col in ['Isoform Number', 'Isoform ID', 'Isoform Name', 'SNP Count']]
-    col_idx += list(range(diff_section_start, df_isoform_level.shape[1]))
+    col_idx += list(range(diff_section_start, d.shape[1]))
     d = d.iloc[:, col_idx]
     df = pd.DataFrame([df.iloc[0, :].tolist()] + [d.iloc[i, :].tolist() for i in range(d.shape[0])], columns=df.columns)
     df.index = ['g'] + ['i{}'.format(i) for i in range(df.shape[0] - 1)]
     return df
 
 
-class ResultPanel(LongRunningTaskIndicatorPanel):
+class ResultPanel(LongRunningTaskIndicatorPanel, InferencePanelDelegate, PlotExportPanelDelegate,
+                  OverviewPanelDelegate):
     """Result panel.
 
     Attributes:
         res_dir_picker: Result directory picker.
         res_load_button: Results loading button.
+        compare_button: Button to load and compare several result directories.
+        compare_dirs: Result directories being compared, None if a single result directory is loaded.
+        stats_process_input: The count of processes to compute stats.
+        live_check: Live results checkbox, to display results of finished tasks while inference is running.
 
         results_data_view: Results data view.
         search_gene_input: Search gene input.
 
-        df_isoform_level: Isoform-level results data frame.
+        result_store: On-disk result store, or in-memory result of finished tasks in live mode.
+        inference_running: Inference is running.
         detail_data_view: Detail data view.
 
         filter_mean_check: Filter by mean checkbox.
@@ -118,7 +137,13 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         filter_hpd_check: Filter by HPD checkbox.
         filter_hpd_input: Filter by HPD input.
 
+        export_button: Button to export the displayed results.
+        export_isoforms_check: Checkbox to also export isoform-level rows of the displayed results.
+        export_cancel_event: The event to cancel the running export.
+        export_progress_dialog: Progress dialog of the running export.
+
         detail_label: Detail label.
+        prefetch_check: Checkbox to also prefetch plots of the next rows.
         plot_button: Plot button.
 
         delegate: The delegate object.
@@ -135,8 +160,20 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         self.res_load_button = wx.Button(self, label='Load')
         self.res_load_button.Bind(wx.EVT_BUTTON, self.on_load_button)
 
+        self.compare_button = wx.Button(self, label='Compare...')
+        self.compare_button.SetToolTip('Load several result directories and compare them side by side.')
+        self.compare_button.Bind(wx.EVT_BUTTON, self.on_compare_button)
+        self.compare_dirs = None  # type: Optional[List[str]]
+
+        stats_process_label = wx.StaticText(self, label='Processes:')
+        cpu_count = os.cpu_count() or 1
+        self.stats_process_input = wx.SpinCtrl(self, min=1, max=cpu_count, initial=cpu_count)
+
+        self.live_check = wx.CheckBox(self, label='Live')
+        self.live_check.SetToolTip('Display results of finished tasks while inference is running.')
+
         # Results data view.
-        self.results_data_view = DataView(self)
+        self.results_data_view = StoreDataView(self)
         self.results_data_view.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_results_item_selected)
         self.results_data_view.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_results_item_deselected)
 
@@ -144,7 +181,8 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         self.results_data_view.set_sorter('Location', _location_key_func)
 
         # Detail data view.
-        self.df_isoform_level = None
+        self.result_store = None  # type: Optional[Union[ResultStore, FrameResult]]
+        self.inference_running = False
         self.detail_data_view = DataView(self, sortable=False)
 
         # Data view control row.
@@ -163,9 +201,21 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         self.filter_hpd_input.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_filter_hpd_input_changed)
         self.filter_hpd_input.Enabled = False
 
+        # Export.
+        self.export_button = wx.Button(self, label='Export...')
+        self.export_button.SetToolTip('Export the displayed results, with their filters and sort order.')
+        self.export_button.Bind(wx.EVT_BUTTON, self.on_export_button)
+        self.export_isoforms_check = wx.CheckBox(self, label='With Isoforms')
+        self.export_isoforms_check.SetToolTip('Also export isoform-level results of the displayed genes.')
+        self.export_cancel_event = None  # type: Optional[threading.Event]
+        self.export_progress_dialog = None  # type: Optional[wx.ProgressDialog]
+
         # Detail row.
         self.detail_label = wx.StaticText(self)
         self.set_detail_label(None)
+        self.prefetch_check = wx.CheckBox(self, label='Prefetch Next Rows')
+        self.prefetch_check.SetToolTip('Also plot the next {} rows in the background.'.format(_PREFETCH_AHEAD))
+        self.prefetch_check.SetValue(True)
         self.plot_button = wx.Button(self, label='Plot')
         self.plot_button.Enabled = False
         self.plot_button.Bind(wx.EVT_BUTTON, self.on_plot_button)
@@ -177,6 +227,10 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         load_sizer.Add(res_dir_label, 0, wx.TOP | wx.BOTTOM | wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
         load_sizer.Add(self.res_dir_picker, 1, wx.ALL, 5)
         load_sizer.Add(self.res_load_button, 0, wx.ALL | wx.EXPAND, 5)
+        load_sizer.Add(self.compare_button, 0, wx.ALL | wx.EXPAND, 5)
+        load_sizer.Add(stats_process_label, 0, wx.TOP | wx.BOTTOM | wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
+        load_sizer.Add(self.stats_process_input, 0, wx.ALL, 5)
+        load_sizer.Add(self.live_check, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         load_sizer.AddStretchSpacer(1)
         load_sizer.Add(search_gene_id_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         load_sizer.Add(self.search_gene_input, 1, wx.ALL | wx.EXPAND, 5)
@@ -186,8 +240,10 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
 
         # Data view control sizer.
         ctrl_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        ctrl_sizer.Add(filter_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        ctrl_sizer.Add(self.export_button, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        ctrl_sizer.Add(self.export_isoforms_check, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         ctrl_sizer.AddStretchSpacer(1)
+        ctrl_sizer.Add(filter_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         ctrl_sizer.Add(self.filter_mean_check, 0, wx.TOP | wx.BOTTOM | wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
         ctrl_sizer.Add(self.filter_mean_input, 0, wx.TOP | wx.BOTTOM | wx.RIGHT | wx.EXPAND, 5)
         ctrl_sizer.Add(self.filter_hpd_check, 0, wx.TOP | wx.BOTTOM | wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 5)
@@ -197,6 +253,7 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         detail_sizer = wx.BoxSizer(wx.HORIZONTAL)
         detail_sizer.Add(self.detail_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         detail_sizer.AddStretchSpacer(1)
+        detail_sizer.Add(self.prefetch_check, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         detail_sizer.Add(self.plot_button, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
 
         sizer = wx.BoxSizer(wx.VERTICAL)
@@ -209,11 +266,17 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
 
         self.SetSizerAndFit(sizer)
 
-        self.add_disabling_elements([self.search_gene_input])
+        self.add_disabling_elements([self.search_gene_input, self.compare_button, self.stats_process_input,
+                                     self.live_check])
 
     def loading_widget(self):
         return self.results_data_view
 
+    def backend_elements(self) -> List[wx.Window]:
+        """Elements which start backend tasks, and should be disabled while other tasks are running."""
+        return [self.res_dir_picker, self.res_load_button, self.compare_button, self.stats_process_input,
+                self.live_check, self.plot_button]
+
     def set_delegate(self, delegate: ResultPanelDelegate):
         """Set delegate."""
         self.delegate = delegate
@@ -226,24 +289,74 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         self.detail_label.SetLabel(label)
 
     def provide_tool(self):
+        if self.compare_dirs is not None:
+            tool = 'compare-stats'
+            params = {
+                'result_dirs': self.compare_dirs,
+                'process': self.stats_process_input.GetValue()
+            }
+            return tool, params
+
         tool = 'stats'
         params = {
-            'result_dir': self.res_dir_picker.GetPath()
+            'result_dir': self.res_dir_picker.GetPath(),
+            'process': self.stats_process_input.GetValue()
         }
         return tool, params
 
     def handle_data(self, data):
-        df_gene_level, df_isoform_level = data
-        self.df_isoform_level = df_isoform_level
-
-        df = df_gene_level.rename(columns={'Isoform Count': 'Isoforms', 'SNP Count': 'SNPs'})
+        key, val = data
+        if key == 'result store':
+            self.result_store = ResultStore(val)
+        elif key == 'compare result':
+            self.result_store = FrameResult(*val)
+        else:
+            return
+        self._show_results()
 
-        self.results_data_view.update_df(df)
+    def _show_results(self):
+        """Show gene-level results."""
+        table = self.result_store.gene_level
+        self.results_data_view.update_table(table)
         for n_col in [2, 3]:
             self.results_data_view.SetColumnWidth(n_col, wx.LIST_AUTOSIZE)
-        for n_col in range(6, df.shape[1]):
+        for n_col in range(6, len(table.columns)):
             self.results_data_view.SetColumnWidth(n_col, wx.LIST_AUTOSIZE_USEHEADER)
 
+    def live_results_enabled(self) -> bool:
+        return self.live_check.IsChecked()
+
+    def inference_started(self, out_dir: str):
+        self.inference_running = True
+        if not self.live_check.IsChecked():
+            return
+        self.compare_dirs = None
+        self.res_dir_picker.SetPath(out_dir)
+        self._clear_results()
+        self.search_gene_input.SetValue('')
+        self._reset_details()
+
+    def live_results_received(self, df_gene_level: pd.DataFrame, df_isoform_level: pd.DataFrame):
+        if df_gene_level.shape[0] == 0:
+            return
+        if not isinstance(self.result_store, FrameResult):
+            self.result_store = FrameResult(df_gene_level, df_isoform_level)
+            self._show_results()
+            return
+        self.result_store.append(df_gene_level, df_isoform_level)
+        self.results_data_view.replace_table(self.result_store.gene_level)
+
+    def inference_finished(self):
+        self.inference_running = False
+        self.plot_button.Enabled = self.results_data_view.GetFirstSelected() >= 0 and self.compare_dirs is None
+
+    def _clear_results(self):
+        """Clear results and release the result store."""
+        self.results_data_view.update_table(None)
+        self.result_store = None
+        if self.delegate is not None:
+            self.delegate.prefetch_plots(None, [])
+
     def _reset_details(self):
         """Reset details."""
         self.detail_data_view.update_df(None)
@@ -253,18 +366,35 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
     def on_res_dir_changed(self, event):
         """Result directory changed callback."""
         assert event
-        self.results_data_view.update_df(None)
+        self.compare_dirs = None
+        self._clear_results()
         self.search_gene_input.SetValue('')
         self._reset_details()
 
     def on_load_button(self, event):
         """Load button callback."""
         assert event
-        self.results_data_view.update_df(None)
+        self.compare_dirs = None
+        self._clear_results()
         self.res_load_button.Enabled = False
         self._reset_details()
         self.start_task()
 
+    def on_compare_button(self, event):
+        """Compare button callback."""
+        assert event
+        with wx.DirDialog(self, 'Select result directories to compare',
+                          style=wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST | wx.DD_MULTIPLE) as dir_dialog:
+            if dir_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            compare_dirs = dir_dialog.GetPaths()
+        if len(compare_dirs) == 0:
+            return
+        self.compare_dirs = compare_dirs
+        self._clear_results()
+        self._reset_details()
+        self.start_task()
+
     def handle_task_finished(self):
         super().handle_task_finished()
         self.res_load_button.Enabled = True
@@ -272,16 +402,77 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
     def on_results_item_selected(self, event: wx.ListEvent):
         """Results item selected callback."""
         n_row = event.GetIndex()
-        df = _get_detail_result(self.results_data_view.df, self.df_isoform_level, n_row)
+        row = self.results_data_view.get_row(n_row)
+        df_isoform_level = self.result_store.isoform_rows(self.results_data_view.source_row(n_row))
+        df = _get_detail_result(row, df_isoform_level)
         self.detail_data_view.update_df(df)
         for n_col in [1, 2]:
             self.detail_data_view.SetColumnWidth(n_col, wx.LIST_AUTOSIZE)
         for n_col in range(4, df.shape[1]):
             self.detail_data_view.SetColumnWidth(n_col, wx.LIST_AUTOSIZE_USEHEADER)
 
-        task_id = self.results_data_view.df.iloc[n_row, :]['Task ID']
+        task_id = row['Task ID']
         self.set_detail_label(task_id)
-        self.plot_button.Enabled = True
+        # Plotting needs a single result directory.
+        self.plot_button.Enabled = not self.inference_running and self.compare_dirs is None
+        if self.plot_button.Enabled:
+            self._prefetch_plots(n_row)
+
+    def _prefetch_plots(self, n_row: int):
+        """Prefetch plots of the selected row, and the next rows in the current order if enabled."""
+        stop = n_row + 1
+        if self.prefetch_check.IsChecked():
+            stop = min(n_row + 1 + _PREFETCH_AHEAD, self.results_data_view.row_count)
+        task_ids = [self.results_data_view.get_row(n)['Task ID'] for n in range(n_row, stop)]
+        self.delegate.prefetch_plots(self.res_dir_picker.GetPath(), task_ids)
+
+    def export_tasks(self, genes: Optional[List[str]]) -> Tuple[Optional[str], List[str], List[str]]:
+        view = self.results_data_view
+        if self.result_store is None or view.table is None or self.compare_dirs is not None:
+            return None, [], []
+
+        table = view.table
+        if genes is None:
+            rows = view.order
+        else:
+            # Listed genes in the order of the source table.
+            wanted = set(genes)
+            task_ids = table.column('Task ID')
+            gene_names = table.column('Gene Name')
+            rows = []
+            for start in range(0, table.n_rows, CHUNK_SIZE):
+                stop = min(start + CHUNK_SIZE, table.n_rows)
+                mask = pd.Series(task_ids[start:stop]).isin(wanted).values | \
+                    pd.Series(gene_names[start:stop]).isin(wanted).values
+                rows.append(np.flatnonzero(mask) + start)
+            rows = np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=np.int64)
+
+        task_ids = table.column('Task ID')[rows].tolist()
+        gene_names = table.column('Gene Name')[rows].tolist()
+        return self.res_dir_picker.GetPath(), [str(x) for x in task_ids], [str(x) for x in gene_names]
+
+    def export_ploidy(self) -> Optional[int]:
+        if self.result_store is None:
+            return None
+        return len([col for col in self.result_store.gene_level.columns if 'Allele 1 &' in col]) + 1
+
+    def overview_table(self) -> Tuple[Optional[Union[ColumnStore, FrameTable]], Optional[str]]:
+        if self.result_store is None:
+            return None, None
+        table = self.result_store.gene_level
+        return table, table.store_dir if isinstance(table, ColumnStore) else None
+
+    def filter_bins(self, filters: Dict[str, Optional[Callable]]):
+        # Filters of brushed bins replace the difference filters.
+        for check, input_ctrl, filter_func in [(self.filter_mean_check, self.filter_mean_input, self.filter_mean),
+                                               (self.filter_hpd_check, self.filter_hpd_input, self.filter_hpd)]:
+            if check.IsChecked():
+                check.SetValue(False)
+                input_ctrl.Enabled = False
+                filter_func(False)
+        self.results_data_view.Select(self.results_data_view.GetFirstSelected(), on=0)
+        for col, filter_func in filters.items():
+            self.results_data_view.set_filter(col, filter_func)
 
     def on_results_item_deselected(self, event: wx.ListEvent):
         """"Results item deselected callback."""
@@ -293,15 +484,13 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
     def on_search_gene_text_changed(self, event):
         """Search gene text changed callback."""
         assert event
-        if self.results_data_view.df is None:
+        if self.results_data_view.table is None:
             return
         text = self.search_gene_input.GetValue()
-        gene_names = self.results_data_view.df['Gene Name']
-        for i, gene_name in enumerate(gene_names):
-            if isinstance(gene_name, str) and (text in gene_name):
-                self.results_data_view.Select(i)
-                self.results_data_view.EnsureVisible(i)
-                break
+        i = self.results_data_view.find_row('Gene Name', lambda x: isinstance(x, str) and (text in x))
+        if i is not None:
+            self.results_data_view.Select(i)
+            self.results_data_view.EnsureVisible(i)
 
     def on_filter_mean_checked(self, event):
         """Filter mean checked callback."""
@@ -331,7 +520,7 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         """Filter by mean or toggle off filtering."""
         self.results_data_view.Select(self.results_data_view.GetFirstSelected(), on=0)
         val = self.filter_mean_input.GetValue()
-        for col in self.results_data_view.df.columns:
+        for col in self.results_data_view.column_names():
             if 'Mean' in col:
                 self.results_data_view.set_filter(col, (lambda x: x > val) if toggle_on else None)
 
@@ -339,13 +528,77 @@ class ResultPanel(LongRunningTaskIndicatorPanel):
         """Filter by HPD or toggle off filtering."""
         self.results_data_view.Select(self.results_data_view.GetFirstSelected(), on=0)
         val = self.filter_hpd_input.GetValue()
-        for col in self.results_data_view.df.columns:
+        for col in self.results_data_view.column_names():
             if 'HPD' in col:
                 self.results_data_view.set_filter(col, (lambda x: x < val) if toggle_on else None)
 
+    def on_export_button(self, event):
+        """Export button callback, the displayed rows are exported in a thread."""
+        assert event
+        view = self.results_data_view
+        if view.table is None or self.export_progress_dialog is not None:
+            return
+        wildcard = '|'.join('{} files (*{})|*{}'.format(name, ext, ext) for name, ext in EXPORT_FORMATS)
+        with wx.FileDialog(self, 'Export results', wildcard=wildcard,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = file_dialog.GetPath()
+            fmt, ext = EXPORT_FORMATS[file_dialog.GetFilterIndex()]
+        if not path.endswith(ext):
+            path += ext
+
+        isoforms = None
+        if self.export_isoforms_check.IsChecked():
+            store = self.result_store
+            isoforms = (store.isoform_level, store.isoform_start, store.isoform_stop)
+
+        # The order is replaced rather than changed by filtering and sorting, it stays as it is for the export.
+        rows = view.order
+        self.export_cancel_event = threading.Event()
+        self.export_progress_dialog = wx.ProgressDialog(
+            'Export Results', 'Exporting {} rows to {}...'.format(rows.shape[0], os.path.basename(path)),
+            maximum=max(1, rows.shape[0]), parent=self,
+            style=wx.PD_CAN_ABORT | wx.PD_AUTO_HIDE | wx.PD_ELAPSED_TIME | wx.PD_REMAINING_TIME)
+        self.export_button.Enabled = False
+        thread = threading.Thread(target=self._export_results, args=(view.table, rows, path, fmt, isoforms),
+                                  daemon=True)
+        thread.start()
+
+    def _export_results(self, table, rows, path: str, fmt: str, isoforms):
+        """Export results, in the export thread."""
+        try:
+            paths = export_results(table, rows, path, fmt, isoforms,
+                                   on_progress=lambda n: wx.CallAfter(self._export_progress, n),
+                                   cancel_event=self.export_cancel_event)
+        except ExportCancelledError:
+            msg = 'Export of results is cancelled.'
+        except Exception as e:
+            msg = 'Fail to export results: {}'.format(e)
+        else:
+            msg = 'Exported {} rows to {}.'.format(rows.shape[0], ', '.join(paths))
+        wx.CallAfter(self._export_finished, msg)
+
+    def _export_progress(self, n: int):
+        """Show progress of the export, and cancel it if requested."""
+        if self.export_progress_dialog is None:
+            return
+        cont, _ = self.export_progress_dialog.Update(n)
+        if not cont:
+            self.export_cancel_event.set()
+
+    def _export_finished(self, msg: str):
+        """When the export is finished."""
+        self.export_progress_dialog.Destroy()
+        self.export_progress_dialog = None
+        self.export_cancel_event = None
+        self.export_button.Enabled = True
+        self.log_text_field.AppendText(msg + '\n')
+
     def on_plot_button(self, event):
         """Plot button callback."""
         assert event
         task_id = self.detail_label.GetLabel().split(' ')[-1]
-        self.GetParent().SetSelection(3)
+        notebook = self.GetParent()  # type: wx.Notebook
+        notebook.SetSelection(notebook.FindPage(self.delegate))
         self.delegate.plot_task(self.res_dir_picker.GetPath(), task_id, self.detail_data_view.df)
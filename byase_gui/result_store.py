@@ -0,0 +1,443 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import json
+import shutil
+import tempfile
+from typing import List, Dict, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+from .result_dir import file_fingerprint
+
+
+_STORE_DIR_NAME = 'store'
+# Stores are built in temporary siblings with this prefix, then moved into place.
+_TMP_STORE_PREFIX = '.store-tmp-'
+_GENE_LEVEL_DIR_NAME = 'gene'
+_ISOFORM_LEVEL_DIR_NAME = 'isoform'
+_META_FILENAME = 'meta.json'
+_ISOFORM_START_FILENAME = 'isoform_start.bin'
+_ISOFORM_STOP_FILENAME = 'isoform_stop.bin'
+_STORE_VERSION = 1
+
+CHUNK_SIZE = 65536
+
+# Identifier columns are always stored as strings, even if they look like numbers.
+_STR_COLUMNS = ['Task ID', 'Gene ID', 'Gene Name', 'Isoform ID', 'Isoform Name', 'Location']
+
+
+class ResultStoreError(Exception):
+    """Result store error."""
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+def _memmap(path: str, dtype) -> np.ndarray:
+    """Memory-map a column file."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class _StringColumn:
+    """Memory-mapped string column, stored as concatenated UTF-8 bytes with offsets.
+
+    Attributes:
+        data: The bytes of all cells.
+        offsets: The offsets of cells, with n + 1 items.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def cell(self, n: int) -> str:
+        """Get the n-th cell."""
+        s, e = self.offsets[n], self.offsets[n + 1]
+        return self.data[s:e].tobytes().decode()
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, slice):
+            rows = np.arange(len(self))[rows]
+        rows = np.asarray(rows)
+        return np.array([self.cell(n) for n in rows], dtype=object)
+
+
+class ColumnStore:
+    """Read-only, memory-mapped column store of a data frame.
+
+    Every column is stored in its own file, numeric columns as raw arrays and string columns as
+    concatenated bytes with offsets, so that only the touched pages are loaded into memory.
+
+    Attributes:
+        store_dir: The directory of the store.
+        columns: Column names.
+        n_rows: The count of rows.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, _META_FILENAME)) as f:
+            self._meta = json.load(f)
+        self.columns = [col['name'] for col in self._meta['columns']]
+        self.n_rows = self._meta['n_rows']
+        self._data = []
+        for n, col in enumerate(self._meta['columns']):
+            if col['kind'] == 'str':
+                data = _memmap(os.path.join(store_dir, '{}.dat'.format(n)), np.uint8)
+                offsets = _memmap(os.path.join(store_dir, '{}.off'.format(n)), np.int64)
+                self._data.append(_StringColumn(data, offsets))
+            else:
+                self._data.append(_memmap(os.path.join(store_dir, '{}.bin'.format(n)), np.dtype(col['dtype'])))
+
+    @property
+    def shape(self):
+        """The shape of the table."""
+        return self.n_rows, len(self.columns)
+
+    @property
+    def source(self) -> Optional[tuple]:
+        """The fingerprint of the stats file the store is built from."""
+        source = self._meta.get('source')
+        return None if source is None else tuple(source)
+
+    def column(self, col_name: str):
+        """Get column data."""
+        return self._data[self.columns.index(col_name)]
+
+    def column_at(self, n_col: int):
+        """Get column data by position."""
+        return self._data[n_col]
+
+    def cell(self, row: int, n_col: int):
+        """Get a cell."""
+        data = self._data[n_col]
+        if isinstance(data, _StringColumn):
+            return data.cell(row)
+        return data[row].item()
+
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        """Take rows as a data frame."""
+        rows = np.asarray(rows, dtype=np.int64)
+        df = pd.DataFrame({n: data[rows] for n, data in enumerate(self._data)})
+        df.columns = self.columns
+        return df
+
+    def slice(self, start: int, stop: int) -> pd.DataFrame:
+        """Take a range of rows as a data frame."""
+        return self.take(np.arange(start, stop))
+
+
+class FrameTable:
+    """In-memory table with the same interface as ColumnStore.
+
+    Attributes:
+        df: The data frame.
+        columns: Column names.
+        n_rows: The count of rows.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.columns = self.df.columns.tolist()
+        self.n_rows = self.df.shape[0]
+
+    @property
+    def shape(self):
+        """The shape of the table."""
+        return self.df.shape
+
+    def column(self, col_name: str):
+        """Get column data."""
+        return self.column_at(self.columns.index(col_name))
+
+    def column_at(self, n_col: int):
+        """Get column data by position."""
+        return self.df.iloc[:, n_col].values
+
+    def cell(self, row: int, n_col: int):
+        """Get a cell."""
+        cell = self.df.iat[row, n_col]
+        return cell.item() if isinstance(cell, np.generic) else cell
+
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        """Take rows as a data frame."""
+        return self.df.iloc[np.asarray(rows, dtype=np.int64), :].reset_index(drop=True)
+
+    def slice(self, start: int, stop: int) -> pd.DataFrame:
+        """Take a range of rows as a data frame."""
+        return self.df.iloc[start:stop, :].reset_index(drop=True)
+
+
+class _ColumnWriter:
+    """Append-only writer of a column store."""
+
+    def __init__(self, store_dir: str, columns: List[str]):
+        self.store_dir = store_dir
+        self.columns = columns
+        self.kinds = None  # type: Optional[List[str]]
+        self.dtypes = None  # type: Optional[List[str]]
+        self.n_rows = 0
+        self._files = []
+        self._str_sizes = []
+
+    def _open(self, chunk: pd.DataFrame):
+        """Open column files according to the dtypes of the first chunk."""
+        self.kinds = []
+        self.dtypes = []
+        for n, col in enumerate(self.columns):
+            dtype = chunk.iloc[:, n].dtype
+            if dtype.kind in 'biuf':
+                self.kinds.append('num')
+                self.dtypes.append('float64' if dtype.kind == 'f' else 'int64')
+                self._files.append((open(os.path.join(self.store_dir, '{}.bin'.format(n)), 'wb'), ))
+            else:
+                self.kinds.append('str')
+                self.dtypes.append('str')
+                dat = open(os.path.join(self.store_dir, '{}.dat'.format(n)), 'wb')
+                off = open(os.path.join(self.store_dir, '{}.off'.format(n)), 'wb')
+                off.write(np.zeros(1, dtype=np.int64).tobytes())
+                self._files.append((dat, off))
+            self._str_sizes.append(0)
+
+    def write(self, chunk: pd.DataFrame):
+        """Append a chunk of rows."""
+        if self.kinds is None:
+            self._open(chunk)
+        for n, col in enumerate(self.columns):
+            values = chunk.iloc[:, n]
+            if self.kinds[n] == 'num':
+                if values.dtype.kind not in 'biuf' or (self.dtypes[n] == 'int64' and values.dtype.kind == 'f'):
+                    raise ResultStoreError('Column "{}" changed type while writing store.'.format(col))
+                self._files[n][0].write(values.values.astype(self.dtypes[n]).tobytes())
+            else:
+                dat, off = self._files[n]
+                encoded = [('' if pd.isnull(v) else str(v)).encode() for v in values]
+                sizes = np.cumsum([len(b) for b in encoded], dtype=np.int64) + self._str_sizes[n]
+                if len(encoded) > 0:
+                    self._str_sizes[n] = int(sizes[-1])
+                dat.write(b''.join(encoded))
+                off.write(sizes.tobytes())
+        self.n_rows += chunk.shape[0]
+
+    def close(self, extra_meta: dict):
+        """Close the writer and store meta data."""
+        for files in self._files:
+            for f in files:
+                f.close()
+        if self.kinds is None:
+            # Empty table, store all columns as strings.
+            self._open(pd.DataFrame({n: pd.Series([], dtype=object) for n in range(len(self.columns))}))
+            for files in self._files:
+                for f in files:
+                    f.close()
+        meta = {'version': _STORE_VERSION,
+                'n_rows': self.n_rows,
+                'columns': [{'name': col, 'kind': self.kinds[n], 'dtype': self.dtypes[n]}
+                            for n, col in enumerate(self.columns)]}
+        meta.update(extra_meta)
+        with open(os.path.join(self.store_dir, _META_FILENAME), 'w') as f:
+            json.dump(meta, f)
+
+
+def _read_meta(store_dir: str) -> Optional[dict]:
+    """Read meta data of a column store."""
+    path = os.path.join(store_dir, _META_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _build_column_store(csv_path: str, store_dir: str, rename: Callable[[str], str],
+                        on_chunk: Optional[Callable[[pd.DataFrame, int], None]] = None):
+    """Build column store from CSV file, chunk by chunk."""
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir)
+
+    writer = None
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    dtype = {col: str for col in header if col in _STR_COLUMNS}
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_SIZE, dtype=dtype):
+        chunk = chunk.rename(columns={col: rename(col) for col in chunk.columns})
+        if writer is None:
+            writer = _ColumnWriter(store_dir, chunk.columns.tolist())
+        if on_chunk is not None:
+            on_chunk(chunk, writer.n_rows)
+        writer.write(chunk)
+    if writer is None:
+        columns = [rename(col) for col in header]
+        writer = _ColumnWriter(store_dir, columns)
+    writer.close({'source': file_fingerprint(csv_path)})
+
+
+def read_stats_table(csv_path: str, rename: Callable[[str], str]) -> pd.DataFrame:
+    """Read a stats file into memory, with renamed columns."""
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    df = pd.read_csv(csv_path, dtype={col: str for col in header if col in _STR_COLUMNS})
+    df.columns = [rename(col) for col in header]
+    return df
+
+
+def _store_is_fresh(store_dir: str, csv_path: str) -> bool:
+    """If the column store is built from the current CSV file."""
+    meta = _read_meta(store_dir)
+    if meta is None or meta.get('version') != _STORE_VERSION:
+        return False
+    return meta.get('source') == file_fingerprint(csv_path)
+
+
+class ResultStore:
+    """On-disk result store with gene-level and isoform-level tables.
+
+    The isoform-level rows of the n-th gene-level row are indexed by
+    isoform_start[n] and isoform_stop[n].
+
+    Attributes:
+        store_dir: The directory of the store.
+        gene_level: Gene-level table.
+        isoform_level: Isoform-level table.
+        isoform_start: The first isoform-level row of each gene-level row.
+        isoform_stop: The end isoform-level row of each gene-level row.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.gene_level = ColumnStore(os.path.join(store_dir, _GENE_LEVEL_DIR_NAME))
+        self.isoform_level = ColumnStore(os.path.join(store_dir, _ISOFORM_LEVEL_DIR_NAME))
+        self.isoform_start = _memmap(os.path.join(store_dir, _ISOFORM_START_FILENAME), np.int64)
+        self.isoform_stop = _memmap(os.path.join(store_dir, _ISOFORM_STOP_FILENAME), np.int64)
+
+    def isoform_rows(self, gene_row: int) -> pd.DataFrame:
+        """Get isoform-level rows of a gene-level row."""
+        return self.isoform_level.slice(int(self.isoform_start[gene_row]), int(self.isoform_stop[gene_row]))
+
+
+class FrameResult:
+    """In-memory result with the same interface as ResultStore, which grows as task results arrive.
+
+    Attributes:
+        gene_level: Gene-level table.
+        isoform_level: Isoform-level table.
+        isoform_start: The first isoform-level row of each gene-level row.
+        isoform_stop: The end isoform-level row of each gene-level row.
+    """
+
+    def __init__(self, df_gene_level: pd.DataFrame, df_isoform_level: pd.DataFrame,
+                 isoform_counts: Optional[np.ndarray] = None):
+        self.gene_level = FrameTable(df_gene_level.iloc[:0, :])
+        self.isoform_level = FrameTable(df_isoform_level.iloc[:0, :])
+        self.isoform_start = np.zeros(0, dtype=np.int64)
+        self.isoform_stop = np.zeros(0, dtype=np.int64)
+        self.append(df_gene_level, df_isoform_level, isoform_counts)
+
+    def append(self, df_gene_level: pd.DataFrame, df_isoform_level: pd.DataFrame,
+               isoform_counts: Optional[np.ndarray] = None):
+        """Append gene-level rows and their isoform-level rows, which are in the same order.
+
+        The count of isoform-level rows of each gene-level row defaults to its "Isoforms" column.
+        """
+        if isoform_counts is None:
+            isoform_counts = df_gene_level['Isoforms'].values
+        isoform_counts = np.asarray(isoform_counts, dtype=np.int64)
+        stop = np.cumsum(isoform_counts) + self.isoform_level.n_rows
+        start = stop - isoform_counts
+        self.isoform_start = np.concatenate([self.isoform_start, start])
+        self.isoform_stop = np.concatenate([self.isoform_stop, stop])
+        self.gene_level = FrameTable(pd.concat([self.gene_level.df, df_gene_level]))
+        self.isoform_level = FrameTable(pd.concat([self.isoform_level.df, df_isoform_level]))
+
+    def isoform_rows(self, gene_row: int) -> pd.DataFrame:
+        """Get isoform-level rows of a gene-level row."""
+        return self.isoform_level.slice(int(self.isoform_start[gene_row]), int(self.isoform_stop[gene_row]))
+
+
+def _remove_tmp_stores(parent_dir: str):
+    """Remove temporary stores left by interrupted builds."""
+    for name in os.listdir(parent_dir):
+        if name.startswith(_TMP_STORE_PREFIX):
+            shutil.rmtree(os.path.join(parent_dir, name), ignore_errors=True)
+
+
+def build_result_store(stats_path: dict, gene_level_rename: Callable[[str], str],
+                       isoform_level_rename: Callable[[str], str]) -> str:
+    """Build (or reuse) the result store next to the stats files.
+
+    Args:
+        stats_path: The paths of gene-level and isoform-level stats files.
+        gene_level_rename: Column rename function of gene-level table.
+        isoform_level_rename: Column rename function of isoform-level table.
+
+    Returns:
+        The directory of the result store.
+    """
+    gene_csv = stats_path['gene-level path']
+    isoform_csv = stats_path['isoform-level path']
+    store_dir = os.path.join(os.path.dirname(gene_csv), _STORE_DIR_NAME)
+    gene_dir = os.path.join(store_dir, _GENE_LEVEL_DIR_NAME)
+    isoform_dir = os.path.join(store_dir, _ISOFORM_LEVEL_DIR_NAME)
+
+    if _store_is_fresh(gene_dir, gene_csv) and _store_is_fresh(isoform_dir, isoform_csv):
+        return store_dir
+
+    # Isoform-level rows of a task are contiguous, record their ranges.
+    ranges = {}  # type: Dict[str, List[int]]
+
+    def _index_isoforms(_chunk: pd.DataFrame, _offset: int):
+        for _i, _task_id in enumerate(_chunk['Task ID'].tolist()):
+            if _task_id in ranges:
+                ranges[_task_id][1] = _offset + _i + 1
+            else:
+                ranges[_task_id] = [_offset + _i, _offset + _i + 1]
+
+    starts = []
+    stops = []
+
+    def _align_genes(_chunk: pd.DataFrame, _offset: int):
+        for _task_id in _chunk['Task ID'].tolist():
+            _start, _stop = ranges.get(_task_id, (0, 0))
+            starts.append(_start)
+            stops.append(_stop)
+
+    # Build in a temporary directory and move it into place when complete, so an interrupted
+    # build never leaves a store which looks fresh.
+    parent_dir = os.path.dirname(store_dir)
+    _remove_tmp_stores(parent_dir)
+    tmp_dir = tempfile.mkdtemp(prefix=_TMP_STORE_PREFIX, dir=parent_dir)
+    try:
+        _build_column_store(isoform_csv, os.path.join(tmp_dir, _ISOFORM_LEVEL_DIR_NAME), isoform_level_rename,
+                            _index_isoforms)
+        _build_column_store(gene_csv, os.path.join(tmp_dir, _GENE_LEVEL_DIR_NAME), gene_level_rename,
+                            _align_genes)
+        for filename, data in [(_ISOFORM_START_FILENAME, starts), (_ISOFORM_STOP_FILENAME, stops)]:
+            with open(os.path.join(tmp_dir, filename), 'wb') as f:
+                f.write(np.array(data, dtype=np.int64).tobytes())
+        if os.path.exists(store_dir):
+            shutil.rmtree(store_dir)
+        os.replace(tmp_dir, store_dir)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+    return store_dir
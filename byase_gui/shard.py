@@ -0,0 +1,201 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import json
+import heapq
+import shutil
+from typing import List, Tuple, Dict
+
+import pandas as pd
+
+from byase.message import MessageCenter
+from byase.annotation import AnnotationDB
+from byase.result import ResultDB
+from byase.db import DB
+
+from .cost import task_costs
+from .result_dir import is_resumable, param_path, result_path, read_params, write_params, annotation_path
+
+
+_SHARD_FILENAME = 'shard.json'
+_SHARED_DB_FILENAMES = ['segment.db', 'isoform.db', 'snp.db']
+_TASK_DB_FILENAME = 'task.db'
+
+
+class ShardError(Exception):
+    """Shard error."""
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+def _balance(costs: List[float], n_shards: int) -> List[List[int]]:
+    """Partition items into shards of balanced total cost, the largest items first to the lightest shard."""
+    heap = [(0.0, n) for n in range(n_shards)]
+    shards = [[] for _ in range(n_shards)]
+    for i in sorted(range(len(costs)), key=lambda x: -costs[x]):
+        load, n = heapq.heappop(heap)
+        shards[n].append(i)
+        heapq.heappush(heap, (load + costs[i], n))
+    return [sorted(shard) for shard in shards]
+
+
+def _param_key(params: Dict[str, str]) -> Tuple:
+    """Comparable inference params of a result directory, with BAM files by name.
+
+    Shards may run on different hosts, where the BAM files are at different paths.
+    """
+    bam_names = tuple(os.path.basename(path) for path in params.get('BAM', '').split(';'))
+    return (bam_names, params.get('Read-len'), params.get('Paired-end'), params.get('MCMC-samples'),
+            params.get('Tune-samples'))
+
+
+def record_shard(anno_path: str, out_dir: str):
+    """Record the shard of a task directory in the result directory of its inference, if it is a shard.
+
+    Results of a shard can then be merged on another host, where the task directory of the shard is missing.
+    """
+    shard_path = os.path.join(anno_path, _SHARD_FILENAME)
+    if os.path.exists(shard_path):
+        shutil.copyfile(shard_path, os.path.join(out_dir, _SHARD_FILENAME))
+
+
+def _load_shard(result_dir: str) -> dict:
+    """The shard record of a result directory, or else of its task directory on this host."""
+    paths = [os.path.join(result_dir, _SHARD_FILENAME)]
+    anno_path = annotation_path(result_dir)
+    if anno_path is not None:
+        paths.append(os.path.join(anno_path, _SHARD_FILENAME))
+    for path in paths:
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+    raise ShardError('The results are not of a shard: {}'.format(result_dir))
+
+
+def split_tasks(args):
+    """Split a task directory into task directories of balanced shards."""
+    task_dir = os.path.abspath(args['task_dir'])
+    out_dir = args['out_dir']
+    n_shards = args['shards']
+    mc = args['mc']  # type: MessageCenter
+
+    mc.log_debug('task_dir: {}'.format(task_dir))
+    mc.log_debug('out_dir: {}'.format(out_dir))
+    mc.log_debug('shards: {}'.format(n_shards))
+
+    mc.handle_progress('Reading tasks...')
+    # The task database of shards is created with the schema of the source.
+    with DB(os.path.join(task_dir, _TASK_DB_FILENAME)) as task_db:
+        task_schema = task_db.schema
+    items = []
+    isoforms = []
+    snps = []
+    with AnnotationDB(task_dir) as anno_db:
+        for fields in anno_db.tasks_db_fields_iterator():
+            items.append([fields[field.name] for field in task_schema])
+            isoforms.append(anno_db.get_segment_basic_info(fields['segment'])['isoforms_count'])
+            snps.append(fields['snps_count'])
+    if n_shards < 1 or n_shards > len(items):
+        raise ShardError('The count of shards should be from 1 to the count of tasks ({}).'.format(len(items)))
+
+    costs = task_costs(pd.DataFrame({'Isoforms': isoforms, 'SNPs': snps})).tolist()
+    shards = _balance(costs, n_shards)
+
+    width = len(str(n_shards))
+    for n, shard in enumerate(shards):
+        shard_dir = os.path.join(out_dir, 'shard_{}'.format(str(n + 1).zfill(width)))
+        mc.handle_progress('Writing shard {} of {}...'.format(n + 1, n_shards))
+        if os.path.exists(shard_dir):
+            raise ShardError('The shard directory already exists: {}'.format(shard_dir))
+        os.makedirs(shard_dir)
+
+        # Segments, isoforms and SNPs are copied to every shard, only tasks are partitioned. Copies keep
+        # shards independent, where links would fail across file systems and share writes.
+        for filename in _SHARED_DB_FILENAMES:
+            for path in [filename, filename + '.idx']:
+                shutil.copyfile(os.path.join(task_dir, path), os.path.join(shard_dir, path))
+        with DB(os.path.join(shard_dir, _TASK_DB_FILENAME), task_schema, read_only=False) as db:
+            for i in shard:
+                db.store_item(items[i])
+
+        with open(os.path.join(shard_dir, _SHARD_FILENAME), 'w') as f:
+            json.dump({'source': task_dir, 'shard': n + 1, 'shards': n_shards,
+                       'tasks': len(shard), 'cost': sum(costs[i] for i in shard)}, f, indent=2)
+        mc.log_info('Shard {}: {} tasks, cost {:.0f}.'.format(n + 1, len(shard), sum(costs[i] for i in shard)))
+
+
+def merge_results(args):
+    """Merge result directories of shards into a result directory of the source task directory.
+
+    Shards are identified by the shard records in their result directories, so neither the task
+    directories of shards nor the BAM files need to exist on this host.
+    """
+    shard_dirs = args['result_dirs']
+    out_dir = args['out_dir']
+    mc = args['mc']  # type: MessageCenter
+
+    mc.log_debug('result_dirs: {}'.format(shard_dirs))
+    mc.log_debug('out_dir: {}'.format(out_dir))
+
+    for path in [param_path(out_dir), result_path(out_dir)]:
+        if os.path.exists(path):
+            raise ShardError('The output directory already has results: {}'.format(path))
+
+    source = None
+    n_shards = None
+    params = None
+    first_dir = None
+    merged_shards = {}
+    for shard_dir in shard_dirs:
+        if not is_resumable(shard_dir):
+            raise ShardError('Not a result directory: {}'.format(shard_dir))
+        shard = _load_shard(shard_dir)
+        shard_params = read_params(shard_dir)
+
+        if source is None:
+            source, n_shards, params, first_dir = shard['source'], shard['shards'], shard_params, shard_dir
+        elif shard['source'] != source:
+            raise ShardError('Shards of different task directories: {}, {}'.format(source, shard['source']))
+        elif _param_key(shard_params) != _param_key(params):
+            raise ShardError('Shards of different inference parameters: {}'.format(shard_dir))
+        if shard['shard'] in merged_shards:
+            raise ShardError('Results of shard {} are given twice: {}, {}'.format(
+                shard['shard'], merged_shards[shard['shard']], shard_dir))
+        merged_shards[shard['shard']] = shard_dir
+
+    if source is None:
+        raise ShardError('No result directories of shards.')
+    if len(merged_shards) < n_shards:
+        mc.log_warning('Merging results of {} of {} shards.'.format(len(merged_shards), n_shards))
+
+    # The merged results refer to the source task directory, and to the BAM files of the first shard.
+    bam_paths = [os.path.normpath(os.path.join(first_dir, path)) for path in params['BAM'].split(';')]
+    for path in [source] + bam_paths:
+        if not os.path.exists(path):
+            mc.log_warning('Not found on this host, please update the params of the merged results: {}'.format(path))
+    os.makedirs(out_dir, exist_ok=True)
+    params = dict(params)
+    params['Annotation'] = os.path.relpath(source, out_dir)
+    params['BAM'] = ';'.join([os.path.relpath(path, out_dir) for path in bam_paths])
+    write_params(out_dir, params)
+
+    with ResultDB(result_path(out_dir), initialize=True, read_only=False) as result_db:
+        for n, shard_dir in enumerate(shard_dirs):
+            mc.handle_progress('Merging results of shard {} of {}...'.format(n + 1, len(shard_dirs)))
+            result_db.merge([result_path(shard_dir)])
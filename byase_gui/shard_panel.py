@@ -0,0 +1,175 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import wx
+from wx.lib.intctrl import IntCtrl
+
+from .message import QueueMessageCenter
+from .long_running import LongRunningTaskProgressPanel
+
+
+class ShardPanel(LongRunningTaskProgressPanel):
+    """Panel to split a task directory into shards, and merge results of shards.
+
+    Attributes:
+        action_box: Split or merge action selector.
+        split_panel: Split config panel.
+        task_dir_picker: Task directory picker.
+        shards_input: The count of shards input.
+        split_out_dir_picker: Output directory picker of shards.
+        merge_panel: Merge config panel.
+        result_dirs_list: Result directories of shards.
+        add_button: Add result directories button.
+        remove_button: Remove selected result directories button.
+        merge_out_dir_picker: Output directory picker of merged results.
+    """
+
+    def __init__(self, parent, mc: QueueMessageCenter, log_text_field: wx.TextCtrl):
+        super().__init__(parent, False, mc, log_text_field)
+
+        self.action_box = wx.RadioBox(self, label='Action', choices=['Split Tasks', 'Merge Results'])
+        self.action_box.Bind(wx.EVT_RADIOBOX, self.action_changed)
+
+        # Split config.
+        self.split_panel = wx.Panel(self)
+
+        task_dir_label = wx.StaticText(self.split_panel, label='Task Directory:')
+        self.task_dir_picker = wx.DirPickerCtrl(self.split_panel)
+
+        shards_label = wx.StaticText(self.split_panel, label='Shards:')
+        shards_tip = wx.ToolTip('Tasks are partitioned into shards of balanced isoform/SNP cost.')
+        shards_label.SetToolTip(shards_tip)
+        self.shards_input = IntCtrl(self.split_panel, value=2, min=1)
+
+        split_out_label = wx.StaticText(self.split_panel, label='Output Directory:')
+        self.split_out_dir_picker = wx.DirPickerCtrl(self.split_panel)
+
+        split_sizer = wx.GridBagSizer(hgap=5, vgap=5)
+        split_sizer.Add(task_dir_label, pos=(0, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        split_sizer.Add(self.task_dir_picker, pos=(0, 1), flag=wx.EXPAND)
+        split_sizer.Add(shards_label, pos=(1, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        split_sizer.Add(self.shards_input, pos=(1, 1), flag=wx.EXPAND)
+        split_sizer.Add(split_out_label, pos=(2, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        split_sizer.Add(self.split_out_dir_picker, pos=(2, 1), flag=wx.EXPAND)
+        split_sizer.AddGrowableCol(1)
+        split_panel_sizer = wx.BoxSizer()
+        split_panel_sizer.Add(split_sizer, 1, wx.ALL | wx.EXPAND, 5)
+        self.split_panel.SetSizerAndFit(split_panel_sizer)
+
+        # Merge config.
+        self.merge_panel = wx.Panel(self)
+
+        result_dirs_label = wx.StaticText(self.merge_panel, label='Result Directories of Shards:')
+        self.result_dirs_list = wx.ListBox(self.merge_panel, style=wx.LB_EXTENDED)
+
+        self.add_button = wx.Button(self.merge_panel, label='Add...')
+        self.add_button.Bind(wx.EVT_BUTTON, self.on_add_button)
+        self.remove_button = wx.Button(self.merge_panel, label='Remove')
+        self.remove_button.Bind(wx.EVT_BUTTON, self.on_remove_button)
+
+        merge_out_label = wx.StaticText(self.merge_panel, label='Output Directory:')
+        self.merge_out_dir_picker = wx.DirPickerCtrl(self.merge_panel)
+
+        list_button_sizer = wx.BoxSizer(wx.VERTICAL)
+        list_button_sizer.Add(self.add_button, 0, wx.BOTTOM | wx.EXPAND, 5)
+        list_button_sizer.Add(self.remove_button, 0, wx.EXPAND, 0)
+
+        merge_sizer = wx.GridBagSizer(hgap=5, vgap=5)
+        merge_sizer.Add(result_dirs_label, pos=(0, 0), span=(1, 2), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_LEFT)
+        merge_sizer.Add(self.result_dirs_list, pos=(1, 0), flag=wx.EXPAND)
+        merge_sizer.Add(list_button_sizer, pos=(1, 1))
+        merge_sizer.Add(merge_out_label, pos=(2, 0), span=(1, 2), flag=wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_LEFT)
+        merge_sizer.Add(self.merge_out_dir_picker, pos=(3, 0), span=(1, 2), flag=wx.EXPAND)
+        merge_sizer.AddGrowableCol(0)
+        merge_sizer.AddGrowableRow(1)
+        merge_panel_sizer = wx.BoxSizer()
+        merge_panel_sizer.Add(merge_sizer, 1, wx.ALL | wx.EXPAND, 5)
+        self.merge_panel.SetSizerAndFit(merge_panel_sizer)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        button_sizer.AddStretchSpacer(1)
+        button_sizer.Add(self.start_button, 0, wx.ALL | wx.EXPAND, 5)
+        button_sizer.Add(self.stop_button, 0, wx.ALL | wx.EXPAND, 5)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.action_box, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(self.split_panel, 0, wx.ALL | wx.EXPAND, 0)
+        sizer.Add(wx.StaticLine(self), 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 5)
+        sizer.Add(self.merge_panel, 1, wx.ALL | wx.EXPAND, 0)
+        sizer.Add(button_sizer, 0, wx.ALL | wx.EXPAND, 0)
+        sizer.Add(self.progress_bar, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(self.progress_label, 0, wx.ALL | wx.EXPAND, 5)
+        self.SetSizerAndFit(sizer)
+
+        self.add_disabling_elements([self.action_box, self.split_panel, self.merge_panel])
+
+        self.update_action()
+
+    @property
+    def merging(self) -> bool:
+        """If the merge action is selected."""
+        return self.action_box.GetSelection() == 1
+
+    def update_action(self):
+        """Enable the config of the selected action only."""
+        self.split_panel.Enabled = not self.merging
+        self.merge_panel.Enabled = self.merging
+
+    def action_changed(self, event):
+        """Action selector callback."""
+        assert event
+        self.update_action()
+
+    def on_add_button(self, event):
+        """Add result directories button callback."""
+        assert event
+        with wx.DirDialog(self, 'Select result directories of shards',
+                          style=wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST | wx.DD_MULTIPLE) as dir_dialog:
+            if dir_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            paths = dir_dialog.GetPaths()
+        existing = set(self.result_dirs_list.GetItems())
+        for path in paths:
+            if path not in existing:
+                self.result_dirs_list.Append(path)
+
+    def on_remove_button(self, event):
+        """Remove selected result directories button callback."""
+        assert event
+        for n in sorted(self.result_dirs_list.GetSelections(), reverse=True):
+            self.result_dirs_list.Delete(n)
+
+    def provide_tool(self):
+        if self.merging:
+            tool = 'merge-results'
+            params = {
+                'result_dirs': self.result_dirs_list.GetItems(),
+                'out_dir': self.merge_out_dir_picker.GetPath()
+            }
+        else:
+            tool = 'split-task'
+            params = {
+                'task_dir': self.task_dir_picker.GetPath(),
+                'shards': self.shards_input.GetValue(),
+                'out_dir': self.split_out_dir_picker.GetPath()
+            }
+        return tool, params
+
+    def handle_task_finished(self):
+        super().handle_task_finished()
+        self.update_action()
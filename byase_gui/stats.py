@@ -0,0 +1,390 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import io
+import json
+import math
+from multiprocessing import Pool
+from typing import List, Dict, Tuple, Optional, Iterable
+
+import pandas as pd
+
+from byase.message import MessageCenter
+from byase.annotation import AnnotationDB
+from byase.inference import InferenceTool
+from byase.result import ResultRecord
+from byase.db import DB
+from byase.task import Task
+from byase.task.result import TaskResultMeta
+
+from .result_dir import file_fingerprint, read_record_offsets, result_identity
+
+
+_STATS_DIR_NAME = 'stats'
+_CACHE_DIR_NAME = 'cache'
+_MANIFEST_FILENAME = 'manifest.json'
+_GENE_LEVEL_CACHE_FILENAME = 'gene_level.parquet'
+_ISOFORM_LEVEL_CACHE_FILENAME = 'isoform_level.parquet'
+_CACHE_VERSION = 2
+
+_SHARD_MIN_SIZE = 100
+_SHARDS_PER_PROCESS = 4
+
+_GENE_COLS = ['Task ID', 'Gene ID', 'Gene Name', 'Location', 'Isoform Count', 'SNP Count']
+_ISOFORM_COLS = ['Task ID', 'Isoform ID', 'Gene ID', 'Gene Name', 'Isoform Number', 'Isoform Name', 'Location',
+                 'SNP Count']
+_HEAD_MEAN = 'Mean'
+_HEAD_HPD_WIDTH = '95% HPD Width'
+
+
+def rename_isoform_level_col(col: str) -> str:
+    """Shorten the name of difference column for display."""
+    if 'Difference' in col:
+        new_col = col.replace('Difference ', '')
+        if 'HPD' in col:
+            new_col = col.split(') ')[-1]
+        return new_col
+    return col
+
+
+def rename_gene_level_col(col: str) -> str:
+    """Rename gene-level column for display."""
+    return {'Isoform Count': 'Isoforms', 'SNP Count': 'SNPs'}.get(col, rename_isoform_level_col(col))
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate data frames, skipping empty ones to keep column dtypes."""
+    non_empty = [df for df in frames if df.shape[0] > 0]
+    if len(non_empty) == 0:
+        return frames[0]
+    return pd.concat(non_empty)
+
+
+def _read_record(db: DB, offset: int) -> ResultRecord:
+    """Read the result record at an offset, without the index, and without decoding the trace."""
+    task_id, success, error_msg, fragments_count, _, trace_stats = db.get_item_by_offset(offset)
+    if success == 0:
+        return ResultRecord(task_id=task_id, success=False, error_msg=error_msg, fragments_count=None,
+                            trace=None, trace_stats=None)
+    return ResultRecord(task_id=task_id, success=True, error_msg=None, fragments_count=fragments_count,
+                        trace=None, trace_stats=pd.read_parquet(io.BytesIO(trace_stats)))
+
+
+class _StatsMeta(TaskResultMeta):
+    """Stats meta, shared by the stats tools."""
+
+    @classmethod
+    def columns(cls, ploidy: Optional[int]) -> Tuple[List[str], List[str]]:
+        """Columns of gene-level and isoform-level stats."""
+        gene_cols = list(_GENE_COLS)
+        iso_cols = list(_ISOFORM_COLS)
+        if ploidy is None:
+            return gene_cols, iso_cols
+        for i in range(ploidy):
+            for cols in [gene_cols, iso_cols]:
+                cols.append('Allele {} Expression Mean'.format(i + 1))
+        for i, j in cls.delta_iterator(ploidy):
+            for cols in [gene_cols, iso_cols]:
+                for measure in [_HEAD_MEAN, _HEAD_HPD_WIDTH]:
+                    cols.append('Difference (Allele {} & {}) {}'.format(i + 1, j + 1, measure))
+        return gene_cols, iso_cols
+
+    def task_rows(self, task: Task, record: ResultRecord) -> Tuple[list, List[list]]:
+        """Gene-level row and isoform-level rows of a task."""
+        stats = record.trace_stats
+
+        def _add_mean(_row: list, _var_name: str):
+            _row.append(stats.loc[_var_name]['mean'])
+
+        def _add_mean_and_hpd_width(_row: list, _var_name: str):
+            _var_stats = stats.loc[_var_name]
+            _row.append(_var_stats['mean'])
+            _row.append(_var_stats['hpd_97.5'] - _var_stats['hpd_2.5'])
+
+        ploidy = task.ploidy
+        seg = task.segment
+        location = '{}:{}-{}'.format(seg.iv.chrom, seg.iv.start, seg.iv.end)
+        gene_row = [task.id, seg.id, seg.gene_name, location, seg.isoforms_count, len(task.snps)]
+        for i in range(ploidy):
+            _add_mean(gene_row, self.get_var_expression(allele_num=i))
+        for i, j in self.delta_iterator(ploidy):
+            _add_mean_and_hpd_width(gene_row, self.get_var_diff_expression(allele_num1=i, allele_num2=j))
+
+        iso_rows = []
+        for iso_num, iso in enumerate(seg.isoforms):
+            location = '{}:{}-{}'.format(iso.iv.chrom, iso.iv.start, iso.iv.end)
+            iso_row = [task.id, iso.id, seg.id, seg.gene_name, iso_num + 1, iso.name,
+                       location, len(task.isoform_snps(iso_num))]
+            for i in range(ploidy):
+                _add_mean(iso_row, self.get_var_expression(allele_num=i, iso_num=iso_num))
+            for i, j in self.delta_iterator(ploidy):
+                _add_mean_and_hpd_width(iso_row,
+                                        self.get_var_diff_expression(allele_num1=i, allele_num2=j, iso_num=iso_num))
+            iso_rows.append(iso_row)
+        return gene_row, iso_rows
+
+
+def _stats_rows(anno_db: AnnotationDB, records: Iterable[ResultRecord]) \
+        -> Tuple[Optional[int], List[list], List[list]]:
+    """Stats rows of successful task records, return (ploidy, gene-level rows, isoform-level rows)."""
+    meta = _StatsMeta()
+    ploidy = None
+    gene_rows = []
+    iso_rows = []
+    for record in records:
+        if not record.success:
+            continue
+        task = anno_db.get_task(record.task_id)
+        if ploidy is None:
+            ploidy = task.ploidy
+        assert ploidy == task.ploidy
+        gene_row, rows = meta.task_rows(task, record)
+        gene_rows.append(gene_row)
+        iso_rows += rows
+    return ploidy, gene_rows, iso_rows
+
+
+def records_stats(anno_db: AnnotationDB, records: List[ResultRecord]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Gene-level and isoform-level stats of task records, with columns renamed for display."""
+    ploidy, gene_rows, iso_rows = _stats_rows(anno_db, records)
+    gene_cols, iso_cols = _StatsMeta.columns(ploidy)
+    gene_df = pd.DataFrame(gene_rows, columns=gene_cols)
+    iso_df = pd.DataFrame(iso_rows, columns=iso_cols)
+    gene_df.columns = [rename_gene_level_col(col) for col in gene_cols]
+    iso_df.columns = [rename_isoform_level_col(col) for col in iso_cols]
+    return gene_df, iso_df
+
+
+def _compute_shard(anno_path: str, result_path: str, offsets: List[int]) \
+        -> Tuple[Optional[int], List[list], List[list]]:
+    """Compute stats of a shard of tasks by the offsets of their records, return (ploidy, gene-level rows,
+    isoform-level rows).
+
+    Records are read at the offsets looked up once by the parent, so no shard scans the result index.
+    """
+    with AnnotationDB(anno_path) as anno_db, DB(result_path) as result_db:
+        return _stats_rows(anno_db, (_read_record(result_db, offset) for offset in offsets))
+
+
+def _compute_shard_args(args):
+    """Compute stats of a shard of tasks, with packed arguments."""
+    return _compute_shard(*args)
+
+
+class IncrementalStatsTool(_StatsMeta):
+    """Stats tool which only computes stats for new or changed tasks.
+
+    Stats of every task are cached in the stats directory together with a manifest, which
+    records the identity of the result database and the offset of each task record. On reload, cached rows of unchanged tasks are
+    reused, and the merged tables are stored as the usual gene-level and isoform-level files.
+
+    New or changed tasks are partitioned into contiguous shards, which are computed in a
+    process pool when more than one process is given.
+
+    Attributes:
+        anno_path: The path of annotation.
+        result_path: The path of result.
+        out_dir: The path of output directory.
+        n_process: The count of processes.
+        mc: Message center.
+    """
+
+    def __init__(self, anno_path: str, result_path: str, out_dir: str, n_process: int, mc: MessageCenter):
+        self.anno_path = anno_path
+        self.result_path = result_path
+        self.out_dir = out_dir
+        self.n_process = n_process
+        self.mc = mc
+
+    @property
+    def _ase_gene_level_stats_path(self):
+        """Gene level ASE stats file path."""
+        return os.path.join(self.out_dir, 'ASE_geneLevel.csv')
+
+    @property
+    def _ase_isoform_level_stats_path(self):
+        """Isoform level ASE stats file path."""
+        return os.path.join(self.out_dir, 'ASE_isoformLevel.csv')
+
+    @property
+    def _cache_dir(self):
+        """The path of cache directory."""
+        return os.path.join(self.out_dir, _CACHE_DIR_NAME)
+
+    @property
+    def _manifest_path(self):
+        """The path of manifest."""
+        return os.path.join(self._cache_dir, _MANIFEST_FILENAME)
+
+    @property
+    def _gene_level_cache_path(self):
+        """The path of cached gene-level stats."""
+        return os.path.join(self._cache_dir, _GENE_LEVEL_CACHE_FILENAME)
+
+    @property
+    def _isoform_level_cache_path(self):
+        """The path of cached isoform-level stats."""
+        return os.path.join(self._cache_dir, _ISOFORM_LEVEL_CACHE_FILENAME)
+
+    @property
+    def _result_dir(self):
+        """The result directory of the result database."""
+        return os.path.dirname(os.path.abspath(self.result_path))
+
+    @property
+    def _task_db_path(self):
+        """The path of task database of the annotation."""
+        return os.path.join(self.anno_path, 'task.db')
+
+    def _load_cache(self) -> Tuple[Dict[str, int], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """Load cached stats, return (task fingerprints, gene-level stats, isoform-level stats)."""
+        empty = {}, None, None
+        paths = [self._manifest_path, self._gene_level_cache_path, self._isoform_level_cache_path]
+        if not all(os.path.exists(path) for path in paths):
+            return empty
+        with open(self._manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != _CACHE_VERSION:
+            return empty
+        if manifest.get('annotation') != file_fingerprint(self._task_db_path):
+            return empty
+        # Offsets of records only identify task results within the same result database.
+        if manifest.get('result') != result_identity(self._result_dir):
+            return empty
+        # The result database is append-only, a smaller one has been replaced.
+        if manifest.get('result_size', 0) > os.path.getsize(self.result_path):
+            return empty
+        return manifest['tasks'], pd.read_parquet(self._gene_level_cache_path), \
+            pd.read_parquet(self._isoform_level_cache_path)
+
+    def _store_cache(self, fingerprints: Dict[str, int], gene_df: pd.DataFrame, iso_df: pd.DataFrame):
+        """Store stats cache."""
+        if not os.path.exists(self._cache_dir):
+            os.mkdir(self._cache_dir)
+        gene_df.to_parquet(self._gene_level_cache_path, index=False)
+        iso_df.to_parquet(self._isoform_level_cache_path, index=False)
+        manifest = {'version': _CACHE_VERSION,
+                    'annotation': file_fingerprint(self._task_db_path),
+                    'result': result_identity(self._result_dir),
+                    'result_size': os.path.getsize(self.result_path),
+                    'tasks': fingerprints}
+        with open(self._manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+    def _compute(self, task_ids: List[str], offsets: Dict[str, int]) -> Tuple[Optional[int], List[list], List[list]]:
+        """Compute stats of tasks, with the offsets of their records, return (ploidy, gene-level rows,
+        isoform-level rows)."""
+        # Contiguous shards, merged in the shard order to be identical to the serial computation.
+        shard_size = max(_SHARD_MIN_SIZE, math.ceil(len(task_ids) / (self.n_process * _SHARDS_PER_PROCESS)))
+        shards = [task_ids[i:i + shard_size] for i in range(0, len(task_ids), shard_size)]
+        args = [(self.anno_path, self.result_path, [offsets[task_id] for task_id in shard]) for shard in shards]
+
+        pool = Pool(min(self.n_process, len(shards))) if self.n_process > 1 and len(shards) > 1 else None
+        results = map(_compute_shard_args, args) if pool is None else pool.imap(_compute_shard_args, args)
+
+        ploidy = None
+        gene_rows = []
+        iso_rows = []
+        n = 0
+        try:
+            for shard, (shard_ploidy, shard_gene_rows, shard_iso_rows) in zip(shards, results):
+                n += len(shard)
+                self.mc.handle_progress('Stats: {} of {} tasks processed...'.format(n, len(task_ids)))
+                if shard_ploidy is None:
+                    continue
+                if ploidy is None:
+                    ploidy = shard_ploidy
+                assert ploidy == shard_ploidy
+                gene_rows += shard_gene_rows
+                iso_rows += shard_iso_rows
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return ploidy, gene_rows, iso_rows
+
+    def stats(self) -> dict:
+        """Generate stats, only for new or changed tasks."""
+        fingerprints = read_record_offsets(self.result_path)
+        cached, gene_cache, iso_cache = self._load_cache()
+
+        pending = [task_id for task_id, offset in fingerprints.items() if cached.get(task_id) != offset]
+        outdated = set(pending) | (set(cached.keys()) - set(fingerprints.keys()))
+
+        outputs = [self._ase_gene_level_stats_path, self._ase_isoform_level_stats_path]
+        if len(outdated) == 0 and all(os.path.exists(path) for path in outputs):
+            self.mc.handle_progress('Stats are up to date.')
+            return self._paths
+
+        self.mc.handle_progress('Stats: {} new or changed tasks, {} cached tasks...'.format(
+            len(pending), len(fingerprints) - len(pending)))
+        ploidy, gene_rows, iso_rows = self._compute(pending, fingerprints)
+        gene_df, iso_df = self._merge(ploidy, gene_rows, iso_rows, gene_cache, iso_cache, outdated)
+
+        gene_df.to_csv(self._ase_gene_level_stats_path, index=False)
+        iso_df.to_csv(self._ase_isoform_level_stats_path, index=False)
+        self._store_cache(fingerprints, gene_df, iso_df)
+        return self._paths
+
+    def _merge(self, ploidy: Optional[int], gene_rows: List[list], iso_rows: List[list],
+               gene_cache: Optional[pd.DataFrame], iso_cache: Optional[pd.DataFrame], outdated: set):
+        """Merge computed rows into cached stats, in the order of tasks in the annotation."""
+        if ploidy is None and gene_cache is not None:
+            gene_cols, iso_cols = gene_cache.columns.tolist(), iso_cache.columns.tolist()
+        else:
+            gene_cols, iso_cols = self.columns(ploidy)
+        gene_df = pd.DataFrame(gene_rows, columns=gene_cols)
+        iso_df = pd.DataFrame(iso_rows, columns=iso_cols)
+
+        if gene_cache is not None:
+            assert gene_cache.columns.tolist() == gene_cols
+            gene_df = _concat([gene_cache[~gene_cache['Task ID'].isin(outdated)], gene_df])
+            iso_df = _concat([iso_cache[~iso_cache['Task ID'].isin(outdated)], iso_df])
+
+        with AnnotationDB(self.anno_path) as anno_db:
+            rank = {task_id: n for n, task_id in enumerate(anno_db.get_all_task_ids())}
+        gene_df = gene_df.iloc[gene_df['Task ID'].map(rank).argsort(kind='stable').values, :]
+        iso_df = iso_df.iloc[iso_df['Task ID'].map(rank).argsort(kind='stable').values, :]
+        return gene_df.reset_index(drop=True), iso_df.reset_index(drop=True)
+
+    @property
+    def _paths(self) -> dict:
+        """The paths of stats files."""
+        return {'gene-level path': self._ase_gene_level_stats_path,
+                'isoform-level path': self._ase_isoform_level_stats_path}
+
+
+def stats(args) -> dict:
+    """Generate stats incrementally."""
+    result_dir = args['result_dir']
+    n_process = args.get('process') or os.cpu_count() or 1
+
+    mc = args['mc']  # type: MessageCenter
+
+    mc.log_debug('result_dir: {}'.format(result_dir))
+    mc.log_debug('n_process: {}'.format(n_process))
+
+    inference_tool = InferenceTool(result_dir, n_process=1, param=None, mc=mc)
+
+    stats_dir = os.path.join(result_dir, _STATS_DIR_NAME)
+    if not os.path.exists(stats_dir):
+        os.mkdir(stats_dir)
+
+    stats_tool = IncrementalStatsTool(anno_path=inference_tool.anno_path, result_path=inference_tool.result_path,
+                                      out_dir=stats_dir, n_process=n_process, mc=mc)
+    return stats_tool.stats()
@@ -17,6 +17,7 @@
 #
 
 import traceback
+from typing import Optional
 from multiprocessing import Process
 import time
 import psutil
@@ -24,11 +25,17 @@ import psutil
 import pandas as pd
 
 from .message import QueueMessageCenter, Instruction
+from .result_store import build_result_store
+from .stats import stats, rename_gene_level_col, rename_isoform_level_col
+from .compare import compare_stats
+from .preflight import bam_preflight
+from .shard import split_tasks, merge_results
+from .plot_cache import plot_task, prefetch_plots
+from .plot_export import export_plots
+from .overview import load_overview
 from byase.annotation import generate_annotation
 from byase.annotation import AnnotationDB
-from byase.inference import inference, inference_resume
-from byase.stats import stats
-from byase.plot import plot_task
+from .inference import inference, inference_resume
 
 
 def _load_task(args):
@@ -66,25 +73,9 @@ def _load_task(args):
 
 
 def _load_stats(stats_path: dict, mc: QueueMessageCenter):
-    ase_gene_level_stats_path = stats_path['gene-level path']
-    ase_isoform_level_stats_path = stats_path['isoform-level path']
-    df_gene_level = pd.read_csv(ase_gene_level_stats_path)
-    df_isoform_level = pd.read_csv(ase_isoform_level_stats_path)
-
-    def _rename_diff_cols(df: pd.DataFrame):
-        rename_dict = {}
-        for col in df.columns:
-            if 'Difference' in col:
-                new_col = col.replace('Difference ', '')
-                if 'HPD' in col:
-                    new_col = col.split(') ')[-1]
-                rename_dict[col] = new_col
-        return df.rename(columns=rename_dict)
-
-    df_gene_level = _rename_diff_cols(df_gene_level)
-    df_isoform_level = _rename_diff_cols(df_isoform_level)
-
-    mc.handle_data((df_gene_level, df_isoform_level))
+    mc.handle_progress('Building result store...')
+    store_dir = build_result_store(stats_path, rename_gene_level_col, rename_isoform_level_col)
+    mc.handle_data(('result store', store_dir))
 
 
 def work(tool: str, params: dict):
@@ -101,9 +92,21 @@ def work(tool: str, params: dict):
         elif tool == 'stats':
             stats_path = stats(params)
             _load_stats(stats_path, mc)
+        elif tool == 'bam-preflight':
+            mc.handle_data(('bam layout', bam_preflight(params)))
+        elif tool == 'compare-stats':
+            mc.handle_data(('compare result', compare_stats(params)))
+        elif tool == 'split-task':
+            split_tasks(params)
+        elif tool == 'merge-results':
+            merge_results(params)
         elif tool == 'plot':
-            html_path = plot_task(params)
-            mc.handle_data(('html path', html_path))
+            payload_path = plot_task(params)
+            mc.handle_data(('plot payload', payload_path))
+        elif tool == 'export-plots':
+            export_plots(params)
+        elif tool == 'overview':
+            mc.handle_data(('overview', load_overview(params)))
     except Exception as e:
         mc.handle_progress('Error occurred!')
         mc.log_error(e)
@@ -112,12 +115,49 @@ def work(tool: str, params: dict):
         mc.handle_progress('Process completed!')
 
 
+def background_work(tool: str, params: dict):
+    try:
+        if tool == 'prefetch-plots':
+            prefetch_plots(params)
+    except Exception:
+        traceback.print_exc()
+
+
+def _kill(process: Process):
+    """Kill a process and its children."""
+    for child in psutil.Process(process.pid).children(recursive=True):
+        child.kill()
+    process.terminate()
+    process.join()
+
+
 def task(mc: QueueMessageCenter):
-    """Backend task."""
+    """Backend task.
+
+    Background work runs when no task is running, and is cancelled as soon as a task arrives.
+    """
+    background_process = None  # type: Optional[Process]
     while True:
-        tool, params = mc.receive_input()
+        background_input = mc.receive_background_input()
+        if background_input is not None:
+            if background_process is not None:
+                _kill(background_process)
+            background_process = Process(target=background_work, args=background_input)
+            background_process.start()
+        elif background_process is not None and not background_process.is_alive():
+            background_process.join()
+            background_process = None
+
+        received = mc.poll_input(0.2)
+        if received is None:
+            continue
+        tool, params = received
         params['mc'] = mc
 
+        if background_process is not None:
+            _kill(background_process)
+            background_process = None
+
         # Inform work has been started.
         mc.signal_task_started()
 
@@ -20,8 +20,11 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.6',
+    # The plot viewer uses internals of the BYASE task plot, see byase_gui/byase_plot.py.
+    install_requires=['byase==1.0.2'],
     entry_points={
         'console_scripts': [
-            'byase-gui=byase_gui.gui:main'],
+            'byase-gui=byase_gui.gui:main',
+            'byase-gui-worker=byase_gui.remote:worker_main'],
     },
 )
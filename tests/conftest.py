@@ -0,0 +1,120 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from byase.message import MessageCenter, ERROR
+from byase.annotation import generate_annotation, AnnotationDB
+from byase.result import ResultDB, ResultRecord
+from byase.task.result import TaskResultMeta
+
+from byase_gui.result_dir import result_path, write_params
+
+
+_GFF = [
+    ('G1', 'gene', 100, 2000), ('T1', 'transcript', 100, 1500), ('T1', 'exon', 100, 300), ('T1', 'exon', 1000, 1500),
+    ('T2', 'transcript', 100, 2000), ('T2', 'exon', 100, 300), ('T2', 'exon', 1800, 2000),
+    ('G2', 'gene', 5000, 6000), ('T3', 'transcript', 5000, 6000), ('T3', 'exon', 5000, 6000),
+    ('G3', 'gene', 8000, 9000), ('T4', 'transcript', 8000, 9000), ('T4', 'exon', 8000, 9000),
+]
+_PARENTS = {'T1': 'G1', 'T2': 'G1', 'T3': 'G2', 'T4': 'G3'}
+_SNPS = [(150, 'A', 'G', '0|1'), (1200, 'C', 'T', '0/1'), (5500, 'A', 'G', '1|0'), (8500, 'A', 'G', '0|1')]
+
+
+def _write_gff(path: str):
+    with open(path, 'w') as f:
+        for name, feature, start, end in _GFF:
+            if feature == 'gene':
+                attrs = 'ID={}'.format(name)
+            elif feature == 'transcript':
+                attrs = 'ID={};Parent={}'.format(name, _PARENTS[name])
+            else:
+                attrs = 'Parent={}'.format(name)
+            f.write('\t'.join(['chr1', 't', feature, str(start), str(end), '.', '+', '.', attrs]) + '\n')
+
+
+def _write_vcf(path: str):
+    with open(path, 'w') as f:
+        f.write('##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\n')
+        for pos, ref, alt, gt in _SNPS:
+            f.write('\t'.join(['chr1', str(pos), '.', ref, alt, '.', 'PASS', '.', 'GT', gt]) + '\n')
+
+
+@pytest.fixture(scope='session')
+def task_dir(tmp_path_factory) -> str:
+    """A task directory of 4 tasks in 3 genes, of diploid SNPs."""
+    src_dir = str(tmp_path_factory.mktemp('annotation'))
+    gff_path = os.path.join(src_dir, 'anno.gff')
+    vcf_path = os.path.join(src_dir, 'snps.vcf')
+    _write_gff(gff_path)
+    _write_vcf(vcf_path)
+    out_dir = os.path.join(src_dir, 'task')
+    os.makedirs(out_dir)
+    generate_annotation({'gff': gff_path, 'gene_feature': 'gene', 'isoform_feature': 'transcript',
+                         'gene_name_attr': 'ID', 'isoform_name_attr': 'ID', 'vcf': vcf_path, 'sample': 'S1',
+                         'ploidy': 2, 'add_chrom_prefix': False, 'out_dir': out_dir,
+                         'mc': MessageCenter(level=ERROR)})
+    return out_dir
+
+
+def _record(task, seed: int) -> ResultRecord:
+    """A successful result record of a task, with random stats."""
+    meta = TaskResultMeta()
+    names = []
+    for allele_num in range(task.ploidy):
+        names.append(meta.get_var_expression(allele_num))
+        names += [meta.get_var_expression(allele_num, iso_num) for iso_num in range(task.isoforms_count)]
+    names.append(meta.get_var_diff_expression(0, 1))
+    names += [meta.get_var_diff_expression(0, 1, iso_num) for iso_num in range(task.isoforms_count)]
+    rng = np.random.default_rng(seed)
+    trace_stats = pd.DataFrame({'mean': rng.random(len(names)), 'sd': rng.random(len(names)),
+                                'hpd_2.5': rng.random(len(names)) * 0.1,
+                                'hpd_97.5': 0.5 + rng.random(len(names)) * 0.5}, index=names)
+    trace = pd.DataFrame({'RAW_I0_A0': rng.random(5)})
+    return ResultRecord(task_id=task.id, success=True, error_msg=None, fragments_count=10, trace=trace,
+                        trace_stats=trace_stats)
+
+
+@pytest.fixture
+def store_results():
+    """Store random results of tasks into a result directory, created if missing.
+
+    Returns:
+        A function of (task directory, result directory, task IDs or None for all, random seed, read length).
+    """
+    def _store(anno_dir: str, out_dir: str, task_ids: Optional[List[str]] = None, seed: int = 0,
+               read_len: int = 100):
+        os.makedirs(out_dir, exist_ok=True)
+        if not os.path.exists(result_path(out_dir)):
+            bam_path = os.path.join(out_dir, 'sample.bam')
+            open(bam_path, 'w').close()
+            write_params(out_dir, {'Annotation': os.path.relpath(anno_dir, out_dir),
+                                   'BAM': os.path.relpath(bam_path, out_dir),
+                                   'MCMC-samples': '500', 'Tune-samples': '500', 'Read-len': str(read_len)})
+            with ResultDB(result_path(out_dir), initialize=True, read_only=False):
+                pass
+        with AnnotationDB(anno_dir) as anno_db, ResultDB(result_path(out_dir), read_only=False) as result_db:
+            for n, task in enumerate(anno_db.tasks_iterator()):
+                if task_ids is None or task.id in task_ids:
+                    result_db.store_record(_record(task, seed + n))
+    return _store
@@ -0,0 +1,74 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import numpy as np
+import pandas as pd
+
+from byase_gui.cost import task_costs, refined_task_costs, dispatch_order, makespan, load_durations, \
+    store_durations, store_task_dir_durations
+
+
+def _tasks() -> pd.DataFrame:
+    return pd.DataFrame({'Task ID': ['A', 'B', 'C', 'D'], 'Isoforms': [1, 3, 2, 1], 'SNPs': [1, 1, 4, 0]})
+
+
+def test_dispatch_order_is_longest_first():
+    df_tasks = _tasks()
+    costs = task_costs(df_tasks)
+    np.testing.assert_array_equal(costs, [2, 6, 10, 1])
+    assert dispatch_order(df_tasks, costs) == ['C', 'B', 'A', 'D']
+
+
+def test_dispatch_order_keeps_ties_in_database_order():
+    df_tasks = _tasks()
+    assert dispatch_order(df_tasks, np.ones(4)) == ['A', 'B', 'C', 'D']
+
+
+def test_makespan():
+    assert makespan([], 2) == 0
+    assert makespan([3, 1, 1, 1], 1) == 6
+    # The long task last leaves one process busy alone.
+    assert makespan([1, 1, 1, 3], 2) == 4
+    assert makespan([3, 1, 1, 1], 2) == 3
+    assert makespan([3, 1], 0) == 4
+
+
+def test_refined_costs_are_scaled_to_measurements():
+    df_tasks = _tasks()
+    np.testing.assert_array_equal(refined_task_costs(df_tasks, {}), task_costs(df_tasks))
+    # Measured tasks take 3 seconds per unit of proxy cost.
+    costs = refined_task_costs(df_tasks, {'A': 6.0, 'C': 30.0})
+    np.testing.assert_allclose(costs, [6, 18, 30, 3])
+
+
+def test_durations_of_other_result_dirs_are_loaded(tmp_path):
+    task_dir, first_dir, second_dir = [tmp_path / name for name in ['task', 'first', 'second']]
+    for path in [task_dir, first_dir, second_dir]:
+        path.mkdir()
+    df_tasks = _tasks()
+
+    run_path = store_durations(str(first_dir), df_tasks, {'A': 1.0, 'B': 2.0})
+    store_task_dir_durations(str(task_dir), run_path)
+    run_path = store_durations(str(second_dir), df_tasks, {'B': 5.0})
+    store_task_dir_durations(str(task_dir), run_path)
+
+    assert load_durations(str(second_dir)) == {'B': 5.0}
+    assert load_durations(str(second_dir), str(task_dir)) == {'A': 1.0, 'B': 5.0}
+    # The task directory holds the latest measurements.
+    assert load_durations(str(first_dir), str(task_dir)) == {'A': 1.0, 'B': 5.0}
+    assert load_durations(str(tmp_path / 'new'), str(task_dir)) == {'A': 1.0, 'B': 5.0}
@@ -0,0 +1,74 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import numpy as np
+import pandas as pd
+
+from byase_gui.overview import histogram2d, bin_filter, overview_pairs
+from byase_gui.result_store import FrameTable
+
+
+def _table(mean, hpd) -> FrameTable:
+    return FrameTable(pd.DataFrame({'Task ID': ['T{}'.format(n) for n in range(len(mean))],
+                                    '(Allele 1 & 2) Mean': mean, '95% HPD Width': hpd}))
+
+
+def test_histogram_counts_edge_values():
+    table = _table([0.0, 0.5, 1.0, 1.0], [0.0, 0.0, 2.0, 1.0])
+    histogram = histogram2d(table, 1, 2, 2)
+    np.testing.assert_allclose(histogram.mean_edges, [0.0, 0.5, 1.0])
+    np.testing.assert_allclose(histogram.hpd_edges, [0.0, 1.0, 2.0])
+    # The upper edge belongs to the last bin, other edges to the bin above them.
+    np.testing.assert_array_equal(histogram.counts, [[1, 0], [1, 2]])
+    assert histogram.label == '(Allele 1 & 2)'
+
+
+def test_histogram_skips_missing_values():
+    table = _table([0.0, np.nan, 1.0, 0.5], [0.0, 1.0, np.inf, 1.0])
+    histogram = histogram2d(table, 1, 2, 4)
+    assert histogram.counts.sum() == 2
+
+
+def test_histogram_of_constant_values():
+    table = _table([2.0, 2.0], [np.nan, np.nan])
+    histogram = histogram2d(table, 1, 2, 4)
+    np.testing.assert_allclose(histogram.mean_edges[[0, -1]], [2.0, 3.0])
+    np.testing.assert_allclose(histogram.hpd_edges[[0, -1]], [0.0, 1.0])
+    assert histogram.counts.sum() == 0
+
+
+def test_bin_filter_matches_histogram_bins():
+    values = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+    edges = np.linspace(0, 1, 5)
+    np.testing.assert_array_equal(bin_filter(edges, 0, 1)(values), [True, False, False, False, False])
+    np.testing.assert_array_equal(bin_filter(edges, 1, 3)(values), [False, True, True, False, False])
+    # The last bin includes its upper edge.
+    np.testing.assert_array_equal(bin_filter(edges, 3, 4)(values), [False, False, False, True, True])
+    np.testing.assert_array_equal(bin_filter(edges, 0, 4)(values), [True] * 5)
+
+
+def test_pairs_by_allele_pair_label():
+    columns = ['Task ID', 'Difference (Allele 1 & 3) 95% HPD Width', 'Difference (Allele 1 & 2) Mean',
+               'Difference (Allele 1 & 3) Mean', 'Difference (Allele 1 & 2) 95% HPD Width']
+    assert overview_pairs(columns) == [(2, 4), (3, 1)]
+
+
+def test_pairs_of_renamed_columns():
+    columns = ['Task ID', 'Allele 1 Expression Mean', '(Allele 1 & 2) Mean', '95% HPD Width',
+               '(Allele 1 & 3) Mean', '95% HPD Width', '(Allele 2 & 3) Mean']
+    assert overview_pairs(columns) == [(2, 3), (4, 5)]
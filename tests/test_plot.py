@@ -0,0 +1,47 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import numpy as np
+
+from byase_gui.plot import bin_coverage
+
+
+def test_bin_per_coord_is_the_coverage():
+    dense = np.array([0, 3, 1, 4, 1, 5])
+    edges, cov_min, cov_max = bin_coverage(dense, 10, 6)
+    np.testing.assert_array_equal(edges, np.arange(7) + 9.5)
+    np.testing.assert_array_equal(cov_min, dense)
+    np.testing.assert_array_equal(cov_max, dense)
+
+
+def test_bins_hold_min_and_max():
+    dense = np.array([0, 3, 1, 4, 1, 5, 9, 2, 6])
+    edges, cov_min, cov_max = bin_coverage(dense, 0, 3)
+    np.testing.assert_array_equal(edges, [-0.5, 2.5, 5.5, 8.5])
+    np.testing.assert_array_equal(cov_min, [0, 1, 2])
+    np.testing.assert_array_equal(cov_max, [3, 5, 9])
+
+
+def test_uneven_bins_cover_every_coord():
+    dense = np.arange(10)
+    edges, cov_min, cov_max = bin_coverage(dense, 100, 3)
+    assert edges[0] == 99.5 and edges[-1] == 109.5
+    assert cov_min[0] == 0 and cov_max[-1] == 9
+    assert np.all(np.diff(edges) > 0)
+    # Every coord is in exactly one bin.
+    np.testing.assert_array_equal(np.diff(edges), [3, 3, 4])
@@ -0,0 +1,84 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import time
+
+from byase_gui.plot import PAYLOAD_FILENAME
+from byase_gui.plot_cache import PlotCache
+
+
+_ENTRY_SIZE = 1000
+
+
+def _store(cache: PlotCache, key: str) -> str:
+    """Store a plot of the entry size."""
+    plot_dir = cache.tmp_dir()
+    with open(os.path.join(plot_dir, PAYLOAD_FILENAME), 'w') as f:
+        f.write('x' * _ENTRY_SIZE)
+    return cache.store(key, plot_dir)
+
+
+def _set_last_use(cache: PlotCache, key: str, seconds_ago: float):
+    t = time.time() - seconds_ago
+    os.utime(os.path.join(cache.cache_dir, key), (t, t))
+
+
+def test_store_and_lookup(tmp_path):
+    cache = PlotCache(str(tmp_path))
+    assert cache.lookup('a') is None
+    payload_path = _store(cache, 'a')
+    assert cache.lookup('a') == payload_path
+    # Temporary directories are moved into place.
+    assert os.listdir(str(tmp_path)) == ['a']
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PlotCache(str(tmp_path), size_limit=_ENTRY_SIZE * 2)
+    _store(cache, 'a')
+    _set_last_use(cache, 'a', 30)
+    _store(cache, 'b')
+    _set_last_use(cache, 'b', 20)
+
+    # A lookup is a use, so "b" is now the least recently used entry.
+    cache.lookup('a')
+    _store(cache, 'c')
+    assert cache.lookup('a') is not None
+    assert cache.lookup('b') is None
+    assert cache.lookup('c') is not None
+
+
+def test_new_entry_is_kept_beyond_limit(tmp_path):
+    cache = PlotCache(str(tmp_path), size_limit=_ENTRY_SIZE // 2)
+    _store(cache, 'a')
+    _set_last_use(cache, 'a', 30)
+    _store(cache, 'b')
+    assert cache.lookup('a') is None
+    assert cache.lookup('b') is not None
+
+
+def test_stale_temporary_directories_are_removed(tmp_path):
+    cache = PlotCache(str(tmp_path))
+    fresh_dir = cache.tmp_dir()
+    stale_dir = cache.tmp_dir()
+    t = time.time() - 2 * 60 * 60
+    os.utime(stale_dir, (t, t))
+
+    cache.evict()
+    assert os.path.exists(fresh_dir)
+    assert not os.path.exists(stale_dir)
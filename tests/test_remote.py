@@ -0,0 +1,123 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import sys
+import time
+import threading
+import subprocess
+import multiprocessing as mp
+from multiprocessing.connection import Client
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from byase_gui import remote
+from byase_gui.remote import SocketMessageCenter, ProtocolError, parse_address
+from byase_gui.result_store import build_result_store, ResultStore
+from byase_gui.stats import rename_gene_level_col, rename_isoform_level_col
+
+
+_TOKEN = 'test-token'
+_TIMEOUT = 60
+
+
+@pytest.fixture(scope='module')
+def worker():
+    """A worker listening on an ephemeral loopback port, yields its address."""
+    env = dict(os.environ, BYASE_GUI_TOKEN=_TOKEN)
+    proc = subprocess.Popen([sys.executable, '-c', 'from byase_gui.remote import worker_main; worker_main()',
+                             '--listen', '127.0.0.1:0'], env=env, stderr=subprocess.PIPE, text=True)
+    try:
+        line = proc.stderr.readline()
+        assert line.startswith('Listening on '), line
+        # Drain the log of the worker, so it never blocks on a full pipe.
+        threading.Thread(target=proc.stderr.read, daemon=True).start()
+        yield line[len('Listening on '):].strip().rstrip('.')
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def _store_dir(tmp_dir: str) -> str:
+    """A small result store of one allele pair, return the directory of its gene-level table."""
+    rng = np.random.default_rng(0)
+    n = 50
+    gene_df = pd.DataFrame({'Task ID': ['T{}'.format(i) for i in range(n)],
+                            'Difference (Allele 1 & 2) Mean': rng.normal(size=n),
+                            'Difference (Allele 1 & 2) 95% HPD Width': rng.random(n)})
+    iso_df = pd.DataFrame({'Task ID': gene_df['Task ID'], 'Isoform Number': 1})
+    paths = {'gene-level path': os.path.join(tmp_dir, 'ASE_geneLevel.csv'),
+             'isoform-level path': os.path.join(tmp_dir, 'ASE_isoformLevel.csv')}
+    gene_df.to_csv(paths['gene-level path'], index=False)
+    iso_df.to_csv(paths['isoform-level path'], index=False)
+    store_dir = build_result_store(paths, rename_gene_level_col, rename_isoform_level_col)
+    return ResultStore(store_dir).gene_level.store_dir
+
+
+def _wait_finished(mc: SocketMessageCenter) -> list:
+    """Output items of the worker until the task is finished."""
+    items = []
+    deadline = time.time() + _TIMEOUT
+    while time.time() < deadline:
+        item = mc.poll_output(0.5)
+        if item is None:
+            continue
+        items.append(item)
+        if item.task_finished:
+            return items
+    raise AssertionError('The task is not finished in time.')
+
+
+def test_wrong_token_is_refused(worker):
+    with pytest.raises(mp.AuthenticationError):
+        SocketMessageCenter(worker, b'wrong-token')
+
+
+def test_protocol_mismatch_is_refused(worker, monkeypatch):
+    # The worker closes a connection of another protocol after replying with its own version.
+    with Client(parse_address(worker), authkey=_TOKEN.encode()) as conn:
+        conn.send(('byase-gui', remote.PROTOCOL_VERSION + 1))
+        assert conn.recv() == ('byase-gui', remote.PROTOCOL_VERSION)
+        with pytest.raises(EOFError):
+            conn.recv()
+
+    monkeypatch.setattr(remote, 'PROTOCOL_VERSION', remote.PROTOCOL_VERSION + 1)
+    with pytest.raises(ProtocolError):
+        SocketMessageCenter(worker, _TOKEN.encode())
+
+
+def test_tool_round_trip(worker, tmp_path):
+    store_dir = _store_dir(str(tmp_path))
+    mc = SocketMessageCenter(worker, _TOKEN.encode())
+    try:
+        mc.send_input('overview', {'store_dir': store_dir, 'bins': 8})
+        items = _wait_finished(mc)
+    finally:
+        mc.close()
+
+    assert any(item.task_started for item in items)
+    data = [item.data for item in items if item.data is not None]
+    assert len(data) == 1
+    name, histograms = data[0]
+    assert name == 'overview'
+    assert len(histograms) == 1
+    assert histograms[0].counts.shape == (8, 8)
+    assert histograms[0].counts.sum() == 50
+    assert any(item.progress_msg == 'Process completed!' for item in items)
@@ -0,0 +1,83 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from byase_gui import result_export
+from byase_gui.result_export import export_results, isoform_export_path, ExportCancelledError, _isoform_rows
+from byase_gui.result_store import FrameResult
+
+
+def _result() -> FrameResult:
+    """Result of 4 genes with 2, 0, 1 and 3 isoforms."""
+    isoforms = [2, 0, 1, 3]
+    gene_df = pd.DataFrame({'Task ID': ['T0', 'T1', 'T2', 'T3'], 'Isoforms': isoforms,
+                            'Mean': [0.1, 0.2, 0.3, 0.4]})
+    iso_df = pd.DataFrame({'Task ID': np.repeat(gene_df['Task ID'].values, isoforms),
+                           'Isoform ID': ['I{}'.format(n) for n in range(sum(isoforms))]})
+    return FrameResult(gene_df, iso_df)
+
+
+def test_isoform_rows():
+    start = np.array([3, 0, 5, 2])
+    stop = np.array([5, 0, 6, 2])
+    np.testing.assert_array_equal(_isoform_rows(start, stop), [3, 4, 5])
+    assert _isoform_rows(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)).shape == (0,)
+
+
+def test_export_in_row_order(tmp_path):
+    result = _result()
+    path = str(tmp_path / 'genes.csv')
+    paths = export_results(result.gene_level, np.array([3, 0, 1]), path, 'CSV',
+                           (result.isoform_level, result.isoform_start, result.isoform_stop))
+    assert paths == [path, isoform_export_path(path)]
+
+    assert pd.read_csv(paths[0])['Task ID'].tolist() == ['T3', 'T0', 'T1']
+    assert pd.read_csv(paths[1])['Isoform ID'].tolist() == ['I3', 'I4', 'I5', 'I0', 'I1']
+
+
+def test_export_of_no_rows_writes_header(tmp_path):
+    result = _result()
+    path = str(tmp_path / 'genes.tsv')
+    export_results(result.gene_level, np.zeros(0, dtype=np.int64), path, 'TSV')
+    df = pd.read_csv(path, sep='\t')
+    assert df.shape == (0, 3)
+    assert df.columns.tolist() == ['Task ID', 'Isoforms', 'Mean']
+
+
+def test_cancelled_export_leaves_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_export, '_EXPORT_CHUNK_SIZE', 1)
+    result = _result()
+    cancel_event = threading.Event()
+    progress = []
+
+    def _on_progress(n: int):
+        progress.append(n)
+        if n == 2:
+            cancel_event.set()
+
+    with pytest.raises(ExportCancelledError):
+        export_results(result.gene_level, np.arange(4), str(tmp_path / 'genes.csv'), 'CSV',
+                       (result.isoform_level, result.isoform_start, result.isoform_stop), _on_progress, cancel_event)
+    assert progress == [1, 2]
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,125 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from byase_gui import result_store
+from byase_gui.result_store import build_result_store, ResultStore, ColumnStore
+from byase_gui.stats import rename_gene_level_col, rename_isoform_level_col
+
+
+def _write_stats(tmp_dir: str, n_genes: int = 5, mean_offset: float = 0.0) -> dict:
+    """Stats files of genes with 1 to 3 isoforms, with a missing gene name."""
+    isoforms = [n % 3 + 1 for n in range(n_genes)]
+    gene_df = pd.DataFrame({'Task ID': ['T{}'.format(n) for n in range(n_genes)],
+                            'Gene Name': [None if n == 0 else 'G{}'.format(n) for n in range(n_genes)],
+                            'Isoform Count': isoforms,
+                            'Difference (Allele 1 & 2) Mean': np.arange(n_genes) * 0.5 + mean_offset})
+    iso_df = pd.DataFrame({'Task ID': np.repeat(gene_df['Task ID'].values, isoforms),
+                           'Isoform ID': ['I{}'.format(n) for n in range(sum(isoforms))]})
+    paths = {'gene-level path': os.path.join(tmp_dir, 'ASE_geneLevel.csv'),
+             'isoform-level path': os.path.join(tmp_dir, 'ASE_isoformLevel.csv')}
+    gene_df.to_csv(paths['gene-level path'], index=False)
+    iso_df.to_csv(paths['isoform-level path'], index=False)
+    return paths
+
+
+def _build(paths: dict) -> str:
+    return build_result_store(paths, rename_gene_level_col, rename_isoform_level_col)
+
+
+def test_round_trip(tmp_path):
+    paths = _write_stats(str(tmp_path))
+    store = ResultStore(_build(paths))
+
+    gene = store.gene_level
+    assert gene.columns == ['Task ID', 'Gene Name', 'Isoforms', '(Allele 1 & 2) Mean']
+    assert gene.n_rows == 5
+    assert gene.cell(0, 1) == ''
+    assert gene.cell(2, 1) == 'G2'
+    assert gene.cell(3, 2) == 1
+    np.testing.assert_allclose(gene.column('(Allele 1 & 2) Mean'), np.arange(5) * 0.5)
+    assert gene.take(np.array([4, 0]))['Task ID'].tolist() == ['T4', 'T0']
+
+    # Isoform rows of each gene are found by the isoform ranges.
+    for row in range(gene.n_rows):
+        isoform_rows = store.isoform_rows(row)
+        assert isoform_rows.shape[0] == gene.cell(row, 2)
+        assert set(isoform_rows['Task ID']) == {gene.cell(row, 0)}
+
+
+def test_empty_stats(tmp_path):
+    paths = _write_stats(str(tmp_path), n_genes=0)
+    store = ResultStore(_build(paths))
+    assert store.gene_level.shape == (0, 4)
+    assert store.isoform_start.shape == (0,)
+
+
+def test_fresh_store_is_reused(tmp_path):
+    paths = _write_stats(str(tmp_path))
+    store_dir = _build(paths)
+    meta_path = os.path.join(store_dir, 'gene', 'meta.json')
+    mtime = os.stat(meta_path).st_mtime_ns
+
+    assert _build(paths) == store_dir
+    assert os.stat(meta_path).st_mtime_ns == mtime
+
+
+def test_changed_stats_are_rebuilt(tmp_path):
+    paths = _write_stats(str(tmp_path))
+    store_dir = _build(paths)
+    source = ColumnStore(os.path.join(store_dir, 'gene')).source
+
+    _write_stats(str(tmp_path), n_genes=6, mean_offset=1.0)
+    store = ResultStore(_build(paths))
+    assert store.gene_level.source != source
+    assert store.gene_level.n_rows == 6
+    assert store.gene_level.cell(0, 3) == 1.0
+
+
+def test_interrupted_build_leaves_no_store(tmp_path, monkeypatch):
+    paths = _write_stats(str(tmp_path))
+    build_column_store = result_store._build_column_store
+
+    def _fail_on_gene_level(csv_path, *args):
+        if csv_path == paths['gene-level path']:
+            raise KeyboardInterrupt()
+        build_column_store(csv_path, *args)
+
+    monkeypatch.setattr(result_store, '_build_column_store', _fail_on_gene_level)
+    with pytest.raises(KeyboardInterrupt):
+        _build(paths)
+    # Neither the store nor its temporary directory is left behind.
+    assert sorted(os.listdir(str(tmp_path))) == ['ASE_geneLevel.csv', 'ASE_isoformLevel.csv']
+
+    monkeypatch.setattr(result_store, '_build_column_store', build_column_store)
+    assert ResultStore(_build(paths)).gene_level.n_rows == 5
+
+
+def test_stale_temporary_stores_are_removed(tmp_path):
+    paths = _write_stats(str(tmp_path))
+    stale_dir = tmp_path / '.store-tmp-stale'
+    stale_dir.mkdir()
+    (stale_dir / 'meta.json').write_text('{}')
+
+    _build(paths)
+    assert not stale_dir.exists()
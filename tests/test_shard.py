@@ -0,0 +1,121 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import json
+from typing import List
+
+import pytest
+
+from byase.message import MessageCenter, ERROR
+from byase.annotation import AnnotationDB
+from byase.result import ResultDB
+
+from byase_gui.result_dir import result_path, read_params
+from byase_gui.shard import split_tasks, merge_results, ShardError, _balance
+
+
+def _split(task_dir: str, out_dir: str, n_shards: int) -> List[str]:
+    """Split the task directory, return the shard directories."""
+    split_tasks({'task_dir': task_dir, 'out_dir': out_dir, 'shards': n_shards, 'mc': MessageCenter(level=ERROR)})
+    return [os.path.join(out_dir, name) for name in sorted(os.listdir(out_dir))]
+
+
+def _merge(result_dirs: List[str], out_dir: str):
+    merge_results({'result_dirs': result_dirs, 'out_dir': out_dir, 'mc': MessageCenter(level=ERROR)})
+
+
+def test_balance():
+    shards = _balance([5, 4, 3, 3, 2, 1], 2)
+    assert sorted(sum(shards, [])) == list(range(6))
+    assert sorted(sum([5, 4, 3, 3, 2, 1][i] for i in shard) for shard in shards) == [9, 9]
+
+
+def test_balance_more_shards_than_heavy_items():
+    costs = [10, 1, 1, 1, 1]
+    loads = sorted(sum(costs[i] for i in shard) for shard in _balance(costs, 3))
+    assert loads == [2, 2, 10]
+
+
+def test_split_partitions_tasks(task_dir, tmp_path):
+    shard_dirs = _split(task_dir, str(tmp_path), 2)
+    assert len(shard_dirs) == 2
+
+    with AnnotationDB(task_dir) as anno_db:
+        task_ids = anno_db.get_all_task_ids()
+    shard_task_ids = []
+    for n, shard_dir in enumerate(shard_dirs):
+        with AnnotationDB(shard_dir) as anno_db:
+            ids = anno_db.get_all_task_ids()
+            # Tasks of a shard are complete, with their segments and SNPs.
+            assert all(anno_db.get_task(task_id).id == task_id for task_id in ids)
+        shard_task_ids += ids
+        with open(os.path.join(shard_dir, 'shard.json')) as f:
+            shard = json.load(f)
+        assert shard['shard'] == n + 1 and shard['shards'] == 2 and shard['tasks'] == len(ids)
+        # Shared databases are copies, which are not changed through other shards.
+        assert os.stat(os.path.join(shard_dir, 'segment.db')).st_nlink == 1
+    assert sorted(shard_task_ids) == sorted(task_ids)
+
+
+def test_split_checks_shard_count(task_dir, tmp_path):
+    with pytest.raises(ShardError):
+        _split(task_dir, str(tmp_path), 5)
+
+
+def test_merge(task_dir, store_results, tmp_path):
+    shard_dirs = _split(task_dir, str(tmp_path / 'shards'), 2)
+    result_dirs = [str(tmp_path / 'result_{}'.format(n)) for n in range(2)]
+    for shard_dir, result_dir in zip(shard_dirs, result_dirs):
+        store_results(shard_dir, result_dir)
+
+    out_dir = str(tmp_path / 'merged')
+    _merge(result_dirs, out_dir)
+    with ResultDB(result_path(out_dir)) as result_db, AnnotationDB(task_dir) as anno_db:
+        assert sorted(result_db.get_all_task_ids()) == sorted(anno_db.get_all_task_ids())
+    assert os.path.normpath(os.path.join(out_dir, read_params(out_dir)['Annotation'])) == task_dir
+
+
+def test_merge_refuses_duplicate_shards(task_dir, store_results, tmp_path):
+    shard_dirs = _split(task_dir, str(tmp_path / 'shards'), 2)
+    result_dir = str(tmp_path / 'result')
+    store_results(shard_dirs[0], result_dir)
+
+    out_dir = str(tmp_path / 'merged')
+    with pytest.raises(ShardError, match='given twice'):
+        _merge([result_dir, result_dir], out_dir)
+    assert not os.path.exists(result_path(out_dir))
+
+
+def test_merge_refuses_different_params(task_dir, store_results, tmp_path):
+    shard_dirs = _split(task_dir, str(tmp_path / 'shards'), 2)
+    result_dirs = [str(tmp_path / 'result_{}'.format(n)) for n in range(2)]
+    store_results(shard_dirs[0], result_dirs[0], read_len=100)
+    store_results(shard_dirs[1], result_dirs[1], read_len=150)
+
+    with pytest.raises(ShardError, match='different inference parameters'):
+        _merge(result_dirs, str(tmp_path / 'merged'))
+
+
+def test_merge_refuses_output_with_results(task_dir, store_results, tmp_path):
+    shard_dirs = _split(task_dir, str(tmp_path / 'shards'), 1)
+    result_dir = str(tmp_path / 'result')
+    store_results(shard_dirs[0], result_dir)
+
+    with pytest.raises(ShardError, match='already has results'):
+        _merge([result_dir], result_dir)
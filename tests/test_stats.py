@@ -0,0 +1,123 @@
+# This file is part of BYASE-GUI.
+#
+# BYASE-GUI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BYASE-GUI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BYASE-GUI.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Author: Lili Dong
+#
+
+import os
+import shutil
+from typing import List
+
+import pandas as pd
+import pytest
+
+from byase.annotation import AnnotationDB
+
+from byase_gui.result_dir import result_path
+from byase_gui import stats
+from byase_gui.stats import IncrementalStatsTool
+
+
+class _ProgressRecorder:
+    """Message center which records progress messages."""
+
+    def __init__(self):
+        self.progress = []  # type: List[str]
+
+    def handle_progress(self, msg: str):
+        self.progress.append(msg)
+
+
+def _stats(task_dir: str, result_dir: str, n_process: int = 1) -> _ProgressRecorder:
+    """Generate stats of a result directory into its stats directory."""
+    mc = _ProgressRecorder()
+    stats_dir = os.path.join(result_dir, 'stats')
+    os.makedirs(stats_dir, exist_ok=True)
+    IncrementalStatsTool(task_dir, result_path(result_dir), stats_dir, n_process, mc).stats()
+    return mc
+
+
+def _read_stats(result_dir: str):
+    stats_dir = os.path.join(result_dir, 'stats')
+    return (pd.read_csv(os.path.join(stats_dir, 'ASE_geneLevel.csv')),
+            pd.read_csv(os.path.join(stats_dir, 'ASE_isoformLevel.csv')))
+
+
+def _assert_same_stats(result_dir: str, expected_dir: str):
+    for df, expected in zip(_read_stats(result_dir), _read_stats(expected_dir)):
+        pd.testing.assert_frame_equal(df, expected)
+
+
+@pytest.fixture
+def task_ids(task_dir) -> List[str]:
+    with AnnotationDB(task_dir) as anno_db:
+        return anno_db.get_all_task_ids()
+
+
+def test_new_tasks_are_merged(task_dir, task_ids, store_results, tmp_path):
+    result_dir = str(tmp_path / 'result')
+    store_results(task_dir, result_dir, task_ids[:2])
+    _stats(task_dir, result_dir)
+    store_results(task_dir, result_dir, task_ids[2:])
+    mc = _stats(task_dir, result_dir)
+    assert mc.progress[0] == 'Stats: 2 new or changed tasks, 2 cached tasks...'
+
+    # The merged stats are the stats computed at once, in the order of the annotation.
+    expected_dir = str(tmp_path / 'expected')
+    shutil.copytree(result_dir, expected_dir, ignore=shutil.ignore_patterns('stats'))
+    _stats(task_dir, expected_dir)
+    _assert_same_stats(result_dir, expected_dir)
+    assert _read_stats(result_dir)[0]['Task ID'].tolist() == task_ids
+
+
+def test_up_to_date_stats_are_kept(task_dir, store_results, tmp_path):
+    result_dir = str(tmp_path / 'result')
+    store_results(task_dir, result_dir)
+    _stats(task_dir, result_dir)
+    mc = _stats(task_dir, result_dir)
+    assert mc.progress == ['Stats are up to date.']
+
+
+def test_sharded_stats_are_serial_stats(task_dir, store_results, tmp_path, monkeypatch):
+    result_dir = str(tmp_path / 'result')
+    store_results(task_dir, result_dir)
+    # A shard of every task, computed in a process pool.
+    monkeypatch.setattr(stats, '_SHARD_MIN_SIZE', 1)
+    _stats(task_dir, result_dir, n_process=2)
+    gene_df, iso_df = _read_stats(result_dir)
+
+    shutil.rmtree(os.path.join(result_dir, 'stats'))
+    _stats(task_dir, result_dir, n_process=1)
+    pd.testing.assert_frame_equal(_read_stats(result_dir)[0], gene_df)
+    pd.testing.assert_frame_equal(_read_stats(result_dir)[1], iso_df)
+
+
+def test_replaced_result_database_is_recomputed(task_dir, store_results, tmp_path):
+    result_dir = str(tmp_path / 'result')
+    store_results(task_dir, result_dir, seed=0)
+    _stats(task_dir, result_dir)
+
+    # Results of another inference have the same record offsets, but other stats.
+    other_dir = str(tmp_path / 'other')
+    store_results(task_dir, other_dir, seed=100)
+    for filename in ['result.db', 'result.db.idx']:
+        new_path = os.path.join(result_dir, filename + '.new')
+        shutil.copy(os.path.join(other_dir, filename), new_path)
+        os.replace(new_path, os.path.join(result_dir, filename))
+    mc = _stats(task_dir, result_dir)
+    assert mc.progress[0] == 'Stats: 4 new or changed tasks, 0 cached tasks...'
+
+    _stats(task_dir, other_dir)
+    _assert_same_stats(result_dir, other_dir)